@@ -0,0 +1,180 @@
+"""
+Semantic cache for tutor answers.
+
+Answers are scoped by corpus key, student name and model settings (the prompt
+depends on all three) and matched by the cosine similarity of the question's
+embedding. A question at or above the threshold reuses the stored answer, plus
+the speech clips recorded for the current voice, instead of running
+retrieval and a full generation. A whitespace/case-normalized exact match is
+checked first, which needs no embedding call.
+
+Entries expire after a TTL, and the cache as a whole is an LRU bounded by
+entry count. Corpus keys are content hashes, so an edited corpus gets a new
+key and never sees answers for the old one; `invalidate(corpus_key)` frees
+those entries right away. Every hit logs the generation time it saved.
+"""
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ANSWER_CACHE_ENABLED = os.getenv("SERA_ANSWER_CACHE", "1") == "1"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("SERA_ANSWER_CACHE_THRESHOLD", "0.95"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("SERA_ANSWER_CACHE_TTL_SECONDS", "86400"))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("SERA_ANSWER_CACHE_MAX_ENTRIES", "2000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Result of a lookup: the matching entry (None on a miss), the question's unit vector and the best similarity
+AnswerLookup = namedtuple("AnswerLookup", ["entry", "vector", "similarity"])
+
+
+def normalize_question(text):
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+
+def answer_scope(corpus_key, user_name, model, temperature):
+    return (corpus_key, user_name, model, temperature)
+
+
+class AnswerEntry:
+    def __init__(self, scope, question, vector, answer, latency):
+        self.scope = scope
+        self.question = question
+        self.vector = vector
+        self.answer = answer
+        self.latency = latency
+        self.created = time.monotonic()
+        # voice id -> list of mp3 clips, in playback order
+        self.audio = {}
+
+
+class AnswerCache:
+    def __init__(self, threshold=ANSWER_CACHE_THRESHOLD, ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+                 max_entries=ANSWER_CACHE_MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # id(entry) -> entry, least recently used first
+        self._scopes = {}  # scope -> list of entries
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _expired(self, entry, now):
+        return now - entry.created > self.ttl
+
+    def _drop_locked(self, entry):
+        self._entries.pop(id(entry), None)
+        entries = self._scopes.get(entry.scope)
+        if entries is not None:
+            entries.remove(entry)
+            if not entries:
+                del self._scopes[entry.scope]
+
+    def _best_match_locked(self, scope, question, vector, now):
+        entries = self._scopes.get(scope, [])
+        for entry in [entry for entry in entries if self._expired(entry, now)]:
+            self._drop_locked(entry)
+        entries = self._scopes.get(scope, [])
+        if not entries:
+            return None, 0.0
+        if vector is None:
+            for entry in entries:
+                if entry.question == question:
+                    return entry, 1.0
+            return None, 0.0
+        similarities = np.stack([entry.vector for entry in entries]) @ vector
+        best = int(np.argmax(similarities))
+        return entries[best], float(similarities[best])
+
+    def _record(self, entry, similarity):
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            self.saved_seconds += entry.latency
+            if id(entry) in self._entries:
+                self._entries.move_to_end(id(entry))
+        logger.info("Answer cache hit (similarity %.3f) saved %.2fs; hit rate %.0f%%",
+                    similarity, entry.latency, 100 * self.stats()["hit_rate"])
+
+    # Find a cached answer for question; embed(text) is only called if there is no exact match
+    def lookup(self, scope, question, embed):
+        text, question = question, normalize_question(question)
+        now = time.monotonic()
+        with self._lock:
+            entry, similarity = self._best_match_locked(scope, question, None, now)
+        if entry is not None:
+            self._record(entry, similarity)
+            return AnswerLookup(entry, entry.vector, similarity)
+
+        try:
+            # Embed the text as asked so the retriever's identical query embedding is a cache hit
+            vector = np.asarray(embed(text), dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+        except Exception as e:
+            logger.warning("Could not embed question for the answer cache: %s", e)
+            self._record(None, 0.0)
+            return AnswerLookup(None, None, 0.0)
+
+        with self._lock:
+            entry, similarity = self._best_match_locked(scope, question, vector, now)
+        if similarity < self.threshold:
+            entry = None
+        self._record(entry, similarity)
+        return AnswerLookup(entry, vector, similarity)
+
+    # Remember an answer; latency is how long generating it took
+    def put(self, scope, question, vector, answer, latency):
+        entry = AnswerEntry(scope, normalize_question(question), vector, answer, latency)
+        with self._lock:
+            self._entries[id(entry)] = entry
+            self._scopes.setdefault(scope, []).append(entry)
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop_locked(evicted)
+        return entry
+
+    def attach_audio(self, entry, voice_id, clips):
+        clips = [clip for clip in clips if clip]
+        if clips:
+            entry.audio[voice_id] = clips
+
+    # Forget every answer for one corpus, for all students
+    def invalidate(self, corpus_key):
+        with self._lock:
+            for scope in [scope for scope in self._scopes if scope[0] == corpus_key]:
+                for entry in list(self._scopes[scope]):
+                    self._drop_locked(entry)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "saved_seconds": self.saved_seconds,
+            }
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = AnswerCache()
+        return _answer_cache
@@ -1,20 +1,24 @@
 import os
-import tempfile
 import streamlit as st
-import speech_recognition as sr
 from io import BytesIO
 import time
-import requests
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
 from dotenv import load_dotenv
 import streamlit.components.v1 as components
 import random
+import base64
+# Only light modules are imported up front so the welcome screen renders fast.
+# LangChain, FAISS, pypdf, speech_recognition and requests are imported where
+# they are first used, and warmup pre-imports them in the background.
+from index_cache import IndexCache, cache_key_from_digests, content_digest
+from speech_pipeline import SpeechPipeline
+from answer_cache import ANSWER_CACHE_ENABLED, answer_scope, get_answer_cache
+from audio_cache import audio_cache_key, get_audio_cache
+from tts_hedge import TTS_HEDGE_ENABLED, get_hedged_synthesizer
+from index_registry import IndexRegistry, SharedIndex
+from tracing import (
+    SpanRecorder, bind_context, get_metrics_registry, set_current_recorder, span, start_metrics_server
+)
+from warmup import WARMUP_ENABLED, start_warmup, warm_pdf_workers, warm_tts_client
 
 # Load environment variables
 load_dotenv()
@@ -31,6 +35,65 @@ if not os.getenv("ELEVENLABS_API_KEY"):
 else:
     USE_ELEVENLABS = True
 
+# How often the indexing progress bar refreshes while a background ingest runs
+INGEST_PROGRESS_REFRESH_SECONDS = 2
+
+# Process-wide on-disk index cache, shared by every session
+@st.cache_resource
+def get_index_cache():
+    return IndexCache()
+
+# Process-wide registry of in-memory indexes shared between sessions
+@st.cache_resource
+def get_index_registry():
+    return IndexRegistry()
+
+# Retrieval chain shared across reruns and sessions. The vectorstore itself is
+# not hashed; corpus_key (the index cache key) identifies its contents.
+# _lock guards an index that a progressive ingest is still appending to.
+@st.cache_resource(max_entries=16, ttl=3600)
+def get_retrieval_chain(_vectorstore, _lexical_index, corpus_key, user_name, pdf_info, model, temperature, _lock=None):
+    from tutor_chain import build_retrieval_chain
+    return build_retrieval_chain(
+        _vectorstore, user_name, pdf_info, model, temperature,
+        lexical_index=_lexical_index, query_embedder=get_query_embedder(), lock=_lock
+    )
+
+# Process-wide embeddings client; chunk vectors are cached on disk across sessions
+@st.cache_resource
+def get_embeddings():
+    from embedding_backends import create_embeddings
+    from embedding_cache import CachedEmbeddings, EmbeddingStore
+    embeddings, model_name = create_embeddings()
+    return CachedEmbeddings(embeddings, model_name, EmbeddingStore())
+
+# Query embeddings with a deadline, shared by the answer cache and the hybrid retriever
+@st.cache_resource
+def get_query_embedder():
+    from hybrid_retrieval import QueryEmbedder
+    return QueryEmbedder(get_embeddings().embed_query)
+
+# Background import and client initialization, once per process
+@st.cache_resource
+def get_warmup():
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+    initializers = [
+        ("embeddings", get_embeddings),
+        ("query embedder", get_query_embedder),
+        ("pdf workers", warm_pdf_workers),
+    ]
+    if USE_ELEVENLABS:
+        initializers.append(("tts client", warm_tts_client))
+    # The script context lets the cached initializers run outside the script thread
+    return start_warmup(initializers, thread_hook=add_script_run_ctx)
+
+# Prometheus/JSON metrics endpoint, started once per process when SERA_METRICS_PORT is set
+@st.cache_resource
+def get_metrics_server():
+    return start_metrics_server()
+
+get_metrics_server()
+
 # Initialize session state variables
 if 'history' not in st.session_state:
     st.session_state.history = []
@@ -53,6 +116,35 @@ if 'theme_color' not in st.session_state:
     st.session_state.theme_color = "#A0D8EF"  # Default sky blue
 if 'character' not in st.session_state:
     st.session_state.character = "owl"  # Default character
+if 'stream_answers' not in st.session_state:
+    st.session_state.stream_answers = True
+if 'pipelined_speech' not in st.session_state:
+    st.session_state.pipelined_speech = True
+if 'corpus_key' not in st.session_state:
+    st.session_state.corpus_key = None
+if 'index_lease' not in st.session_state:
+    st.session_state.index_lease = None
+if 'corpus' not in st.session_state:
+    st.session_state.corpus = None
+if 'upload_round' not in st.session_state:
+    st.session_state.upload_round = 0
+if 'trace_recorder' not in st.session_state:
+    st.session_state.trace_recorder = SpanRecorder()
+if 'debug_panel' not in st.session_state:
+    st.session_state.debug_panel = False
+if 'ingest_job' not in st.session_state:
+    st.session_state.ingest_job = None
+if 'ingest_lease' not in st.session_state:
+    st.session_state.ingest_lease = None
+if 'upload_digests' not in st.session_state:
+    st.session_state.upload_digests = {}
+
+# Spans finished during this run also go to the session's debug panel
+set_current_recorder(st.session_state.trace_recorder)
+
+# Load the ingestion and chat stack while the student is still on the welcome and upload screens
+if WARMUP_ENABLED and not st.session_state.setup_complete:
+    get_warmup()
 
 # Custom CSS and JavaScript for animations
 def load_css_and_js():
@@ -338,6 +430,7 @@ def load_character(character="owl"):
 
 # Function to convert speech to text
 def speech_to_text():
+    import speech_recognition as sr
     r = sr.Recognizer()
     with st.spinner("Listening..."):
         with sr.Microphone() as source:
@@ -347,8 +440,10 @@ def speech_to_text():
             st.success("Recording complete!")
         
         try:
-            with st.spinner("Processing your speech..."):
+            with st.spinner("Processing your speech..."), \
+                    span("speech_recognition", audio_bytes=len(audio.frame_data)) as trace:
                 text = r.recognize_google(audio)
+                trace.set(chars=len(text))
                 return text
         except sr.UnknownValueError:
             st.error("Sorry, I couldn't understand what you said.")
@@ -357,11 +452,32 @@ def speech_to_text():
             st.error("Could not request results; check your network connection")
             return None
 
+# ElevenLabs voice parameters; they are part of the audio cache key
+ELEVENLABS_MODEL_ID = "eleven_monolingual_v1"
+ELEVENLABS_VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.25,  # Slightly more expressive
+    "use_speaker_boost": True
+}
+
 # ElevenLabs TTS function
-def elevenlabs_tts(text, voice_id=None):
+# Pass show_errors=False when calling from a worker thread, where st.* is unavailable
+def elevenlabs_tts(text, voice_id=None, show_errors=True):
     if voice_id is None:
         voice_id = st.session_state.voice_id
-        
+    
+    audio = get_audio_cache().get_or_create(
+        elevenlabs_cache_key(text, voice_id), lambda: _elevenlabs_request(text, voice_id, show_errors)
+    )
+    return BytesIO(audio) if audio else None
+
+def elevenlabs_cache_key(text, voice_id):
+    return audio_cache_key("elevenlabs", voice_id, ELEVENLABS_MODEL_ID, ELEVENLABS_VOICE_SETTINGS, text)
+
+def _elevenlabs_request(text, voice_id, show_errors):
+    from tts_client import CircuitOpenError, get_tts_client
+    
     # Define the API endpoint
     url = f"https://api.elevenlabs.io/v1/text-to-speech/{voice_id}"
     
@@ -375,42 +491,64 @@ def elevenlabs_tts(text, voice_id=None):
     # Define the data to be sent in the request
     data = {
         "text": text,
-        "model_id": "eleven_monolingual_v1",
-        "voice_settings": {
-            "stability": 0.5,
-            "similarity_boost": 0.75,
-            "style": 0.25,  # Slightly more expressive
-            "use_speaker_boost": True
-        }
+        "model_id": ELEVENLABS_MODEL_ID,
+        "voice_settings": ELEVENLABS_VOICE_SETTINGS
     }
     
     try:
-        # Make the request
-        response = requests.post(url, json=data, headers=headers)
+        # Make the request over the shared keep-alive session (timeouts, retries, circuit breaker)
+        with span("elevenlabs_tts", chars=len(text)) as trace:
+            response = get_tts_client().post(url, json=data, headers=headers)
+            trace.set(status=response.status_code, audio_bytes=len(response.content))
         
         # Check if the request was successful
         if response.status_code == 200:
-            return BytesIO(response.content)
+            return response.content
         else:
-            st.error(f"Error with ElevenLabs API: {response.status_code}")
+            if show_errors:
+                st.error(f"Error with ElevenLabs API: {response.status_code}")
             return None
+    except CircuitOpenError:
+        # ElevenLabs has been failing; go straight to the fallback voice
+        return None
     except Exception as e:
-        st.error(f"Error with ElevenLabs API: {str(e)}")
+        if show_errors:
+            st.error(f"Error with ElevenLabs API: {str(e)}")
         return None
 
 # Fallback to gTTS if ElevenLabs is not available
 def fallback_tts(text):
+    cache_key = audio_cache_key("gtts", "en", None, {"slow": False}, text)
+    return BytesIO(get_audio_cache().get_or_create(cache_key, lambda: _gtts_request(text)))
+
+def _gtts_request(text):
     from gtts import gTTS
-    tts = gTTS(text=text, lang='en', slow=False)
-    fp = BytesIO()
-    tts.write_to_fp(fp)
-    fp.seek(0)
-    return fp
+    with span("gtts_tts", chars=len(text)) as trace:
+        tts = gTTS(text=text, lang='en', slow=False)
+        fp = BytesIO()
+        tts.write_to_fp(fp)
+        trace.set(audio_bytes=fp.tell())
+    return fp.getvalue()
 
 # Unified text to speech function
-def text_to_speech(text):
+def text_to_speech(text, voice_id=None, show_errors=True):
+    with span("tts", chars=len(text)) as trace:
+        audio_data = _text_to_speech(text, voice_id, show_errors)
+        trace.set(audio_bytes=audio_data.getbuffer().nbytes if audio_data is not None else 0)
+    return audio_data
+
+def _text_to_speech(text, voice_id, show_errors):
     if USE_ELEVENLABS:
-        audio_data = elevenlabs_tts(text)
+        if voice_id is None:
+            voice_id = st.session_state.voice_id
+        if TTS_HEDGE_ENABLED and not get_audio_cache().contains(elevenlabs_cache_key(text, voice_id)):
+            # Start gTTS in parallel if ElevenLabs is slower than the hedge deadline; the
+            # hedge always tries gTTS, so None means both failed and there is nothing to retry
+            return get_hedged_synthesizer().synthesize(
+                bind_context(lambda: elevenlabs_tts(text, voice_id, show_errors=False)),
+                bind_context(lambda: fallback_tts(text))
+            )
+        audio_data = elevenlabs_tts(text, voice_id, show_errors)
         if audio_data is not None:
             return audio_data
         
@@ -418,7 +556,13 @@ def text_to_speech(text):
     return fallback_tts(text)
 
 # Preprocess AI response to be more conversational for speech
-def prepare_for_tts(text, user_name):
+def prepare_for_tts(text, user_name, allow_interjection=True):
+    with span("prepare_for_tts", chars=len(text)) as trace:
+        text = _prepare_for_tts(text, user_name, allow_interjection)
+        trace.set(spoken_chars=len(text))
+    return text
+
+def _prepare_for_tts(text, user_name, allow_interjection):
     # Simple preprocessing to make the response more conversational
     # Remove markdown formatting and unnecessary punctuation
     text = text.replace('*', '')
@@ -438,27 +582,270 @@ def prepare_for_tts(text, user_name):
         f"Here's the thing {user_name}, "
     ]
     
-    if random.random() > 0.7:  # Randomly add interjections (30% chance)
+    if allow_interjection and random.random() > 0.7:  # Randomly add interjections (30% chance)
         text = random.choice(interjections) + text
     
     return text
 
-# Function to extract and summarize PDF content
-def extract_pdf_summary(all_pages, pdf_names):
-    total_pages = len(all_pages)
-    pdf_summary = f"I've processed {total_pages} pages from {len(pdf_names)} document(s): {', '.join(pdf_names)}."
+# Hand uploads to the PDF loader as in-memory buffers; nothing is written to disk
+def upload_buffers(uploaded_files):
+    from pdf_loader import PdfBuffer
+    return [PdfBuffer(uploaded_file.name, uploaded_file.getbuffer()) for uploaded_file in uploaded_files]
+
+# Load an index from the disk cache, or parse, split and embed the uploaded files
+def load_or_build_index(uploaded_files, cache_key, progress_bar):
+    from index_store import build_lexical_index
+    from ingest import build_index
+    from pdf_loader import load_pdfs
+    
+    # Reuse a previously built index for the same PDFs and settings
+    index_cache = get_index_cache()
+    embeddings = get_embeddings()
+    cached = index_cache.load(cache_key, embeddings)
+    
+    if cached is not None:
+        vectorstore, cache_meta = cached
+        st.info("These materials were processed before, so I loaded them from the cache.")
+        return SharedIndex(vectorstore, cache_meta, index_cache.load_lexical(cache_key))
     
-    # Get a sample of content to confirm processing
-    sample_texts = []
-    for i, page in enumerate(all_pages[:5]):  # Just look at first 5 pages
-        # Extract just the first 100 chars from each page
-        sample = page.page_content[:100].replace('\n', ' ').strip()
-        if sample:
-            sample_texts.append(sample + "...")
+    # Parse all PDFs straight from the upload buffers in parallel, updating progress as page ranges finish
+    all_pages, load_errors = load_pdfs(
+        upload_buffers(uploaded_files),
+        on_progress=lambda done, total: progress_bar.progress(done / (total * 2))
+    )
+    for name, error in load_errors.items():
+        st.error(f"Error loading PDF {name}: {error}")
+    
+    if not all_pages:
+        st.error("Could not extract any content from the PDFs. Please check the files and try again.")
+        st.stop()
+    
+    # Split and embed; previously seen chunks come from the embedding cache,
+    # the rest are embedded in rate-limited concurrent batches
+    stats_before = embeddings.stats()
+    try:
+        vectorstore, meta, scheduler = build_index(
+            all_pages,
+            embeddings,
+            on_progress=lambda done, total: progress_bar.progress(0.5 + done / (total * 2))
+        )
+    except ValueError:
+        # Pages without any text, such as scanned PDFs
+        st.error("Could not extract any content from the PDFs. Please check the files and try again.")
+        st.stop()
+    stats_after = embeddings.stats()
+    embed_report = scheduler.report()
+    st.caption(
+        f"Embedded {stats_after['misses'] - stats_before['misses']} new chunks, "
+        f"reused {stats_after['hits'] - stats_before['hits']} from the embedding cache "
+        f"({embed_report['chunks_per_second']:.0f} chunks/s over {embed_report['batches']} batches, "
+        f"p95 batch latency {embed_report['batch_latency_p95']:.2f}s)."
+    )
+    if index_cache.store(cache_key, vectorstore, meta):
+        # Reopen from disk so the index is memory-mapped (when enabled) rather than on the heap
+        cached = index_cache.load(cache_key, embeddings)
+        if cached is not None:
+            return SharedIndex(cached[0], meta, index_cache.load_lexical(cache_key))
+    return SharedIndex(vectorstore, meta, build_lexical_index(vectorstore))
+
+# Point the session at a shared index from the registry
+def attach_shared_index(lease, cache_key, pdf_names):
+    from ingest import ingest_settings
+    from session_corpus import SessionCorpus
+    
+    st.session_state.index_lease = lease
+    st.session_state.pdf_info = format_pdf_summary(
+        lease.meta["total_pages"], pdf_names, lease.meta["sample_texts"]
+    )
+    st.session_state.vectorstore = lease.vectorstore
+    st.session_state.corpus_key = cache_key
+    st.session_state.corpus = SessionCorpus.from_shared(
+        lease.vectorstore, lease.meta, st.session_state.upload_digests, ingest_settings(), lexical=lease.lexical
+    )
+
+# Index the uploads in the background, or follow the session already doing so, and
+# return once the first chunks are searchable; False if the index is already in memory
+def start_progressive_session(uploaded_files, cache_key, progress_bar):
+    from streamlit.runtime.scriptrunner import add_script_run_ctx
+    from progressive_ingest import start_progressive_ingest
+    
+    sources = upload_buffers(uploaded_files)
+    embeddings = get_embeddings()
+    ingest_lease = get_index_registry().join_ingest(
+        cache_key,
+        lambda: start_progressive_ingest(
+            cache_key, sources, embeddings, get_index_cache(), thread_hook=add_script_run_ctx
+        )
+    )
+    if ingest_lease is None:
+        return False
+    job = ingest_lease.job
+    while not job.wait_searchable(timeout=0.25):
+        progress_bar.progress(min(1.0, job.chunks_indexed / job.min_chunks))
+    for name, error in job.errors.items():
+        st.error(f"Error loading PDF {name}: {error}")
+    if job.vectorstore is None:
+        ingest_lease.release()
+        st.error("Could not extract any content from the PDFs. Please check the files and try again.")
+        st.stop()
+    
+    st.session_state.ingest_lease = ingest_lease
+    st.session_state.ingest_job = job
+    st.session_state.vectorstore = job.vectorstore
+    st.session_state.corpus_key = cache_key
+    st.session_state.corpus = None
+    st.session_state.pdf_info = format_pdf_summary(job.total_pages, st.session_state.pdf_names, job.sample_texts)
+    return True
+
+# Move a session off its finished (or failed) background ingest onto the complete index
+def finish_progressive_session():
+    from ingest import ingest_settings
+    from session_corpus import SessionCorpus
     
-    content_sample = "\n\nSample content includes: " + " ".join(sample_texts[:2])
+    job = st.session_state.ingest_job
+    ingest_lease = st.session_state.ingest_lease
+    st.session_state.ingest_job = None
+    st.session_state.ingest_lease = None
+    if job.failed:
+        # Failed or cancelled part-way: keep studying what did get indexed, in this session only
+        st.error(f"I couldn't finish reading your materials ({job.error or 'stopped'}); "
+                 f"I'll answer from the {job.pages_indexed} of {job.total_pages} pages I did get through.")
+        corpus = SessionCorpus.from_shared(
+            job.vectorstore, {"sample_texts": job.sample_texts}, st.session_state.upload_digests,
+            ingest_settings(), lexical=job.lexical
+        )
+        # A private copy under its own key, so neither cached answers nor chains mix it up with the full corpus
+        corpus.detach()
+        st.session_state.corpus = corpus
+        st.session_state.vectorstore = corpus.vectorstore
+        st.session_state.corpus_key = corpus.corpus_key()
+        ingest_lease.release()
+        return
+    lease = get_index_registry().acquire(job.cache_key, job.shared_index)
+    ingest_lease.release()
+    attach_shared_index(lease, job.cache_key, st.session_state.pdf_names)
+
+# Point the session at its (possibly edited) corpus and refresh the summary the tutor sees
+def sync_session_corpus(corpus):
+    if corpus.private and st.session_state.index_lease is not None:
+        # The session has its own copy now; let the shared index go
+        st.session_state.index_lease.release()
+        st.session_state.index_lease = None
+    old_key = st.session_state.corpus_key
+    if old_key != corpus.corpus_key() and not get_index_registry().in_use(old_key):
+        # Nobody is studying the old document set any more; drop its cached answers
+        get_answer_cache().invalidate(old_key)
+    st.session_state.vectorstore = corpus.vectorstore
+    st.session_state.corpus_key = corpus.corpus_key()
+    st.session_state.pdf_names = corpus.pdf_names
+    st.session_state.pdf_info = format_pdf_summary(corpus.total_pages, corpus.pdf_names, corpus.sample_texts())
+
+# Parse, split and embed only the new files and append them to the session's index
+def add_documents_to_session(uploaded_files, progress_bar):
+    from chunk_dedup import create_deduplicator
+    from embedding_scheduler import EmbeddingScheduler
+    from ingest import split_pages
+    from pdf_loader import load_pdfs
+    
+    corpus = st.session_state.corpus
+    digests = {uploaded_file.name: content_digest(uploaded_file.getbuffer()) for uploaded_file in uploaded_files}
+    new_files = [f for f in uploaded_files if not corpus.contains(f.name, digests[f.name])]
+    if not new_files:
+        return []
+    
+    pages, load_errors = load_pdfs(
+        upload_buffers(new_files),
+        on_progress=lambda done, total: progress_bar.progress(done / (total * 2))
+    )
+    for name, error in load_errors.items():
+        st.error(f"Error loading PDF {name}: {error}")
+    
+    scheduler = EmbeddingScheduler(get_embeddings())
+    added = []
+    for i, uploaded_file in enumerate(new_files):
+        file_pages = [page for page in pages if page.metadata["source"] == uploaded_file.name]
+        if not file_pages:
+            continue
+        try:
+            corpus.add(
+                uploaded_file.name,
+                digests[uploaded_file.name],
+                split_pages(file_pages, create_deduplicator()),
+                len(file_pages),
+                scheduler
+            )
+        except Exception as e:
+            # The corpus has rolled the file back; keep the ones already added
+            st.error(f"Error adding {uploaded_file.name}: {e}")
+            continue
+        added.append(uploaded_file.name)
+        progress_bar.progress(0.5 + (i + 1) / (len(new_files) * 2))
+    sync_session_corpus(corpus)
+    return added
+
+# Drop one document's chunks from the session's index
+def remove_document_from_session(pdf_name):
+    corpus = st.session_state.corpus
+    corpus.remove(pdf_name)
+    sync_session_corpus(corpus)
+
+# Stream the chain's answer into a placeholder and return the full text
+def stream_answer(retrieval_chain, user_query, placeholder, on_token=None):
+    answer = ""
+    for chunk in retrieval_chain.stream({"input": user_query}):
+        token = chunk.get("answer")
+        if token:
+            answer += token
+            placeholder.markdown(answer + "▌")
+            if on_token is not None:
+                on_token(token)
+    placeholder.markdown(answer)
+    return answer
+
+# Summarize the processed PDFs for the tutor's prompt
+def format_pdf_summary(total_pages, pdf_names, sample_texts):
+    pdf_summary = f"I've processed {total_pages} pages from {len(pdf_names)} document(s): {', '.join(pdf_names)}."
+    content_sample = "\n\nSample content includes: " + " ".join(sample_texts)
     return pdf_summary + content_sample
 
+# How much of the corpus a background ingest has indexed; reruns the app once it is done
+@st.fragment(run_every=INGEST_PROGRESS_REFRESH_SECONDS)
+def render_ingest_progress():
+    job = st.session_state.ingest_job
+    if job is None:
+        return
+    progress = job.progress()
+    if progress.done:
+        st.rerun()
+    st.progress(
+        progress.fraction,
+        text=f"Indexed {progress.fraction:.0%} of your materials ({progress.pages_indexed} of "
+             f"{progress.total_pages} pages). Answers use what's indexed so far."
+    )
+
+# Per-stage timings of this session, the latest spans, and the process-wide metrics for download
+def render_debug_panel(recorder):
+    summary = recorder.summary()
+    if not summary:
+        st.caption("No timings recorded in this session yet.")
+    else:
+        st.dataframe(
+            [
+                {"stage": stage, "count": stats["count"], "p50 ms": round(stats["p50"] * 1000),
+                 "p95 ms": round(stats["p95"] * 1000), "total s": round(stats["total_seconds"], 2)}
+                for stage, stats in summary.items()
+            ],
+            hide_index=True
+        )
+        st.caption("Latest spans")
+        for record in reversed(recorder.spans()[-10:]):
+            sizes = ", ".join(f"{name}={value}" for name, value in record.sizes.items())
+            error = f" ({record.error})" if record.error else ""
+            st.caption(f"{record.stage}: {record.seconds * 1000:.0f} ms{error} {sizes}")
+    registry = get_metrics_registry()
+    st.download_button("Download metrics (JSON)", registry.to_json(), "sera-metrics.json", "application/json")
+    st.download_button("Download metrics (Prometheus)", registry.to_prometheus(), "sera-metrics.prom", "text/plain")
+
 # Add confetti animation
 def show_confetti():
     components.html("""
@@ -472,6 +859,65 @@ def show_confetti():
     </script>
     """, height=0)
 
+# Browser-side speech queue. It lives in the parent window (defined through
+# the parent's Function constructor) so it survives the component iframes
+# being replaced on rerun, and plays queued clips back to back.
+SPEECH_QUEUE_JS = """
+<script>
+const host = window.parent;
+if (!host.seraSpeech) {
+    host.seraSpeech = new host.Function(`
+        const queue = { clips: [], current: null };
+        function playNext() {
+            if (queue.current || queue.clips.length === 0) return;
+            const clip = queue.clips.shift();
+            queue.current = clip;
+            const done = () => { if (queue.current === clip) { queue.current = null; playNext(); } };
+            clip.onended = done;
+            clip.onerror = done;
+            clip.play().catch(done);
+        }
+        return {
+            push(src) {
+                const clip = new Audio(src);
+                clip.preload = "auto";
+                queue.clips.push(clip);
+                playNext();
+            },
+            reset() {
+                if (queue.current) queue.current.pause();
+                queue.current = null;
+                queue.clips = [];
+            }
+        };
+    `)();
+}
+if (RESET) host.seraSpeech.reset();
+host.seraSpeech.push("data:audio/mpeg;base64,AUDIO_B64");
+</script>
+"""
+
+# Queue an audio clip for sequential playback; reset=True stops the previous answer
+def enqueue_audio(audio_data, reset=False):
+    audio_b64 = base64.b64encode(audio_data.getvalue()).decode()
+    components.html(
+        SPEECH_QUEUE_JS.replace("RESET", "true" if reset else "false").replace("AUDIO_B64", audio_b64),
+        height=0
+    )
+
+# Queue a pipeline's clips in order; its first clip interrupts any previous answer.
+# Played clips are appended to `played` (as bytes) when given.
+def play_speech_clips(speech, clips, played=None):
+    for clip in clips:
+        enqueue_audio(clip, reset=speech.delivered == 1)
+        if played is not None:
+            played.append(clip.getvalue())
+
+# Replay clips stored with a cached answer
+def play_cached_clips(clips):
+    for i, clip in enumerate(clips):
+        enqueue_audio(BytesIO(clip), reset=i == 0)
+
 # Load CSS and JS
 load_css_and_js()
 
@@ -589,56 +1035,33 @@ if st.session_state.user_name and not st.session_state.setup_complete:
     if uploaded_files:
         if st.button("🚀 Process PDFs and Start Learning!", help="Click to analyze your documents and begin learning"):
             with st.spinner("Processing your documents... This might take a minute."):
+                from ingest import ingest_settings
+                from progressive_ingest import PROGRESSIVE_INGEST
+                
                 # Create progress bar
                 progress_bar = st.progress(0)
                 
-                # Save uploaded files to temp directory
-                temp_dir = tempfile.mkdtemp()
-                file_paths = []
-                pdf_names = []
-                
-                for i, uploaded_file in enumerate(uploaded_files):
-                    file_path = os.path.join(temp_dir, uploaded_file.name)
-                    with open(file_path, "wb") as f:
-                        f.write(uploaded_file.getbuffer())
-                    file_paths.append(file_path)
-                    pdf_names.append(uploaded_file.name)
-                    # Update progress
-                    progress_bar.progress((i + 1) / (len(uploaded_files) * 2))
-                
+                pdf_names = [uploaded_file.name for uploaded_file in uploaded_files]
                 st.session_state.pdf_names = pdf_names
                 
-                # Load all PDFs
-                all_pages = []
-                for i, path in enumerate(file_paths):
-                    try:
-                        loader = PyPDFLoader(path)
-                        pages = loader.load()
-                        all_pages.extend(pages)
-                    except Exception as e:
-                        st.error(f"Error loading PDF {path}: {str(e)}")
-                    # Update progress
-                    progress_bar.progress(0.5 + (i + 1) / (len(file_paths) * 2))
-                
-                if not all_pages:
-                    st.error("Could not extract any content from the PDFs. Please check the files and try again.")
-                    st.stop()
-                
-                # Extract summary of PDF content
-                pdf_summary = extract_pdf_summary(all_pages, pdf_names)
-                st.session_state.pdf_info = pdf_summary
-                
-                # Split text into chunks
-                text_splitter = RecursiveCharacterTextSplitter(
-                    chunk_size=1000,
-                    chunk_overlap=200
-                )
-                splits = text_splitter.split_documents(all_pages)
+                digests = {
+                    uploaded_file.name: content_digest(uploaded_file.getbuffer())
+                    for uploaded_file in uploaded_files
+                }
+                st.session_state.upload_digests = digests
+                cache_key = cache_key_from_digests(digests.values(), ingest_settings())
                 
-                # Create embeddings and vectorstore
-                embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
-                vectorstore = FAISS.from_documents(splits, embeddings)
-                st.session_state.vectorstore = vectorstore
+                progressive = False
+                if PROGRESSIVE_INGEST and not get_index_cache().contains(cache_key):
+                    # New materials: index them in the background (or join the session already
+                    # doing so) and start chatting once the first chunks are in
+                    progressive = start_progressive_session(uploaded_files, cache_key, progress_bar)
+                if not progressive:
+                    # Attach to the shared index for these PDFs; only the first session builds it
+                    lease = get_index_registry().acquire(
+                        cache_key, lambda: load_or_build_index(uploaded_files, cache_key, progress_bar)
+                    )
+                    attach_shared_index(lease, cache_key, pdf_names)
                 st.session_state.setup_complete = True
                 
                 # Complete the progress bar
@@ -646,7 +1069,10 @@ if st.session_state.user_name and not st.session_state.setup_complete:
                 time.sleep(1)  # Pause to show completion
                 
                 # Add initial greeting to history
-                greeting = f"Hello {st.session_state.user_name}! I'm your AI tutor. I've processed your learning materials: {', '.join(pdf_names)}. I have full access to the content and I'm ready to help you understand the material better. What would you like to learn about today?"
+                if st.session_state.ingest_job is not None:
+                    greeting = f"Hello {st.session_state.user_name}! I'm your AI tutor. I've started reading your learning materials: {', '.join(pdf_names)}. You can ask me questions right away; I'll answer from what I've read so far, and the bar above the chat shows how far along I am. What would you like to learn about today?"
+                else:
+                    greeting = f"Hello {st.session_state.user_name}! I'm your AI tutor. I've processed your learning materials: {', '.join(pdf_names)}. I have full access to the content and I'm ready to help you understand the material better. What would you like to learn about today?"
                 st.session_state.history.append({"role": "assistant", "content": greeting})
                 
                 # Show confetti for completion
@@ -661,6 +1087,10 @@ if st.session_state.user_name and not st.session_state.setup_complete:
 
 # Chat interface with animated bubbles
 if st.session_state.setup_complete:
+    # A background ingest that has finished hands the session over to the complete index
+    if st.session_state.ingest_job is not None and st.session_state.ingest_job.done:
+        finish_progressive_session()
+    
     # Apply theme color
     load_css_and_js()
     
@@ -680,6 +1110,8 @@ if st.session_state.setup_complete:
     </div>
     """, unsafe_allow_html=True)
     
+    render_ingest_progress()
+    
     # Voice mode toggle with animation
     voice_col1, voice_col2 = st.columns([3, 1])
     
@@ -709,21 +1141,60 @@ if st.session_state.setup_complete:
         """, unsafe_allow_html=True)
         
         for pdf_name in st.session_state.pdf_names:
-            st.markdown(f"""
-            <div style="
-                background: linear-gradient(45deg, {st.session_state.theme_color}33, #ffffff99);
-                padding: 8px 12px;
-                border-radius: 10px;
-                margin-bottom: 8px;
-                font-size: 0.9rem;
-                display: flex;
-                align-items: center;
-            ">
-                <span>📄 {pdf_name}</span>
-            </div>
-            """, unsafe_allow_html=True)
+            name_col, remove_col = st.columns([5, 1])
+            with name_col:
+                st.markdown(f"""
+                <div style="
+                    background: linear-gradient(45deg, {st.session_state.theme_color}33, #ffffff99);
+                    padding: 8px 12px;
+                    border-radius: 10px;
+                    margin-bottom: 8px;
+                    font-size: 0.9rem;
+                    display: flex;
+                    align-items: center;
+                ">
+                    <span>📄 {pdf_name}</span>
+                </div>
+                """, unsafe_allow_html=True)
+            with remove_col:
+                # The last document can't be removed; start a new session instead
+                if st.button("✖", key=f"remove_{pdf_name}", help=f"Remove {pdf_name} from this session",
+                             disabled=len(st.session_state.pdf_names) == 1 or st.session_state.ingest_job is not None):
+                    with st.spinner(f"Removing {pdf_name}..."):
+                        remove_document_from_session(pdf_name)
+                    st.session_state.history.append({
+                        "role": "assistant",
+                        "content": f"Okay, I've set {pdf_name} aside. We'll stick to the remaining materials from here on."
+                    })
+                    st.rerun()
         
         st.markdown("</div>", unsafe_allow_html=True)
+        
+        # Add more PDFs without losing the conversation; only the new files are processed
+        with st.expander("➕ Add more materials"):
+            more_files = None
+            if st.session_state.ingest_job is not None:
+                st.caption("You can add or remove materials once I've finished reading the current ones.")
+            else:
+                more_files = st.file_uploader(
+                    "Upload more PDF files", type="pdf", accept_multiple_files=True,
+                    key=f"more_pdfs_{st.session_state.upload_round}"
+                )
+            if more_files and st.button("Add to this session", help="Process just these files and keep our conversation"):
+                with st.spinner("Processing your new documents..."):
+                    progress_bar = st.progress(0)
+                    added = add_documents_to_session(more_files, progress_bar)
+                    progress_bar.progress(1.0)
+                if added:
+                    st.session_state.history.append({
+                        "role": "assistant",
+                        "content": f"Great, I've added {', '.join(added)} to our study materials. Feel free to ask me about them!"
+                    })
+                    # A fresh uploader key clears the file list
+                    st.session_state.upload_round += 1
+                    st.rerun()
+                else:
+                    st.info("Those documents are already part of this session.")
     
     # Display chat container with styled background
     chat_container = st.container()
@@ -776,75 +1247,121 @@ if st.session_state.setup_complete:
                 </div>
                 """, height=50)
                 
-                # Create Gemini model instance
-                llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0.7)
+                from tutor_chain import TUTOR_MODEL, TUTOR_TEMPERATURE
                 
-                # Create retriever
-                retriever = st.session_state.vectorstore.as_retriever(
-                    search_type="similarity",
-                    search_kwargs={"k": 5}
+                # Near-duplicates of earlier questions about the same materials are answered from the cache,
+                # except while the materials are still being indexed
+                ingest_job = st.session_state.ingest_job
+                answer_cache = get_answer_cache() if ANSWER_CACHE_ENABLED and ingest_job is None else None
+                scope = answer_scope(
+                    st.session_state.corpus_key, st.session_state.user_name, TUTOR_MODEL, TUTOR_TEMPERATURE
                 )
+                cached = None
+                if answer_cache is not None:
+                    cached = answer_cache.lookup(scope, user_query, get_query_embedder().embed)
                 
-                # Create prompt template with explicit PDF info
-                system_template = """You are a friendly and helpful tutor who speaks naturally like a real teacher.
-                
-                PDF INFORMATION: {pdf_info}
-                
-                Use the following context from the PDFs to answer the student's question:  
-                {context}
-                
-                You ALWAYS have access to the PDFs that were uploaded. If you don't find the exact answer in the context, 
-                try to provide information based on what you do see in the context. Only if you truly can't find anything 
-                related should you politely say so and offer to discuss related concepts.
-                
-                Your tone should be warm, encouraging, and conversational - like a supportive teacher who wants to see their students succeed.
-                Use examples, analogies, and a touch of humor where appropriate to make complex concepts easier to understand.
-                
-                Keep your responses fairly concise so they can be comfortably spoken back to the user.
-                Use contractions (don't, can't, etc.) and casual phrases like a real teacher would use.
-                Break up long sentences into shorter ones. Vary your sentence structure.
-                
-                Sometimes use interjections like "Hmm," "Well," "You know," "So," etc. to sound more natural.
-                Occasionally refer to the student by name.
-                
-                Remember that you're speaking to {user_name}, so address them personally and be encouraging.
-                """
-                
-                user_template = "{input}"
-                
-                prompt = ChatPromptTemplate.from_messages([
-                    ("system", system_template),
-                    ("human", user_template)
-                ])
-                
-                prompt = prompt.partial(user_name=st.session_state.user_name, pdf_info=st.session_state.pdf_info)
-                
-                # Create document chain
-                document_chain = create_stuff_documents_chain(llm, prompt)
-                
-                # Create retrieval chain
-                retrieval_chain = create_retrieval_chain(retriever, document_chain)
-                
-                # Run the chain
-                response = retrieval_chain.invoke({"input": user_query})
-                answer = response["answer"]
-                
-                # Display text response with animation
-                st.markdown(f"""
-                <div style="animation: fadeIn 0.5s ease-in-out;">
-                    {answer}
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Add response to history
-                st.session_state.history.append({"role": "assistant", "content": answer})
-                
-                # If voice mode is enabled, speak the response
-                if st.session_state.voice_mode:
-                    # Prepare the text for more natural speech
-                    speech_text = prepare_for_tts(answer, st.session_state.user_name)
-                    audio_bytes = text_to_speech(speech_text)
-                    st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                if cached is not None and cached.entry is not None:
+                    answer = cached.entry.answer
+                    st.markdown(f"""
+                    <div style="animation: fadeIn 0.5s ease-in-out;">
+                        {answer}
+                    </div>
+                    """, unsafe_allow_html=True)
+                    st.session_state.history.append({"role": "assistant", "content": answer})
+                    
+                    if st.session_state.voice_mode:
+                        clips = cached.entry.audio.get(st.session_state.voice_id)
+                        if clips:
+                            play_cached_clips(clips)
+                        else:
+                            speech_text = prepare_for_tts(answer, st.session_state.user_name)
+                            audio_bytes = text_to_speech(speech_text)
+                            st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                            if audio_bytes is not None:
+                                answer_cache.attach_audio(cached.entry, st.session_state.voice_id, [audio_bytes.getvalue()])
+                else:
+                    # Reuse the chain built for this corpus, student and model settings
+                    if ingest_job is not None:
+                        # Search the index as it grows
+                        retrieval_chain = get_retrieval_chain(
+                            ingest_job.vectorstore,
+                            ingest_job.lexical,
+                            ingest_job.chain_key(),
+                            st.session_state.user_name,
+                            st.session_state.pdf_info,
+                            TUTOR_MODEL,
+                            TUTOR_TEMPERATURE,
+                            ingest_job.lock
+                        )
+                    else:
+                        retrieval_chain = get_retrieval_chain(
+                            st.session_state.vectorstore,
+                            st.session_state.corpus.lexical,
+                            st.session_state.corpus.chain_key(),
+                            st.session_state.user_name,
+                            st.session_state.pdf_info,
+                            TUTOR_MODEL,
+                            TUTOR_TEMPERATURE
+                        )
+                    
+                    # Pipelined speech: sentences are synthesized while the answer is still being written
+                    speech = None
+                    spoken = []
+                    if st.session_state.voice_mode and st.session_state.pipelined_speech:
+                        voice_id = st.session_state.voice_id
+                        user_name = st.session_state.user_name
+                        speech = SpeechPipeline(
+                            bind_context(lambda sentence: text_to_speech(sentence, voice_id, show_errors=False)),
+                            prepare=lambda sentence, index: prepare_for_tts(sentence, user_name, allow_interjection=index == 0)
+                        )
+                    
+                        def on_token(token):
+                            speech.feed(token)
+                            play_speech_clips(speech, speech.ready_clips(), spoken)
+                    else:
+                        on_token = None
+                    
+                    started = time.perf_counter()
+                    if st.session_state.stream_answers:
+                        # Render tokens into the bubble as they arrive
+                        answer = stream_answer(retrieval_chain, user_query, st.empty(), on_token=on_token)
+                    else:
+                        # Run the chain
+                        response = retrieval_chain.invoke({"input": user_query})
+                        answer = response["answer"]
+                    
+                        # Display text response with animation
+                        st.markdown(f"""
+                        <div style="animation: fadeIn 0.5s ease-in-out;">
+                            {answer}
+                        </div>
+                        """, unsafe_allow_html=True)
+                        if speech is not None:
+                            speech.feed(answer)
+                    
+                    generation_seconds = time.perf_counter() - started
+                    
+                    # Add response to history
+                    st.session_state.history.append({"role": "assistant", "content": answer})
+                    
+                    # If voice mode is enabled, speak the response
+                    if speech is not None:
+                        # Queue the remaining sentences in order as they finish
+                        speech.finish()
+                        play_speech_clips(speech, speech.drain(), spoken)
+                        speech.close()
+                    elif st.session_state.voice_mode:
+                        # Prepare the text for more natural speech
+                        speech_text = prepare_for_tts(answer, st.session_state.user_name)
+                        audio_bytes = text_to_speech(speech_text)
+                        st.audio(audio_bytes, format="audio/mp3", autoplay=True)
+                        if audio_bytes is not None:
+                            spoken.append(audio_bytes.getvalue())
+                    
+                    if cached is not None and cached.vector is not None:
+                        entry = answer_cache.put(scope, user_query, cached.vector, answer, generation_seconds)
+                        if st.session_state.voice_mode:
+                            answer_cache.attach_audio(entry, st.session_state.voice_id, spoken)
 
 # Add a reset button with animation
 if st.session_state.setup_complete:
@@ -855,6 +1372,64 @@ if st.session_state.setup_complete:
         </div>
         """, unsafe_allow_html=True)
         
+        st.session_state.stream_answers = st.toggle(
+            "Stream answers", st.session_state.stream_answers,
+            help="Show the tutor's answer word by word as it is generated"
+        )
+        
+        st.session_state.pipelined_speech = st.toggle(
+            "Pipelined speech", st.session_state.pipelined_speech,
+            help="Start speaking the first sentence while the rest of the answer is still being prepared"
+        )
+        
+        embeddings = get_embeddings()
+        embedding_stats = embeddings.stats()
+        st.caption(
+            f"Embedding cache: {embedding_stats['hits']} hits / {embedding_stats['misses']} misses "
+            f"({embedding_stats['hit_rate']:.0%} hit rate), "
+            f"{embeddings.store.count(embeddings.model_name)} vectors stored for this model"
+        )
+        from hybrid_retrieval import retrieval_stats
+        query_embedder = get_query_embedder()
+        st.caption(
+            f"Retrieval: {retrieval_stats['hybrid']} hybrid / {retrieval_stats['lexical_only']} lexical-only "
+            f"(query embedding timeouts {query_embedder.timeouts}, failures {query_embedder.failures})"
+        )
+        lease = st.session_state.index_lease
+        if lease is not None and lease.meta.get("dedup"):
+            from ingest import format_dedup_report
+            st.caption(f"Ingest: {format_dedup_report(lease.meta['dedup'])}")
+        registry_stats = get_index_registry().stats()
+        st.caption(
+            f"Shared indexes: {registry_stats['indexes']} in memory, {registry_stats['sessions']} session lease(s), "
+            f"{registry_stats['bytes'] / 1e6:.1f} MB"
+        )
+        if ANSWER_CACHE_ENABLED:
+            answer_stats = get_answer_cache().stats()
+            st.caption(
+                f"Answer cache: {answer_stats['hits']} hits / {answer_stats['misses']} misses "
+                f"({answer_stats['hit_rate']:.0%} hit rate), saved {answer_stats['saved_seconds']:.1f}s of generation"
+            )
+        audio_stats = get_audio_cache().stats()
+        st.caption(
+            f"Audio cache: {audio_stats['memory_hits']} memory / {audio_stats['disk_hits']} disk hits, "
+            f"{audio_stats['misses']} misses ({audio_stats['hit_rate']:.0%} hit rate); "
+            f"{audio_stats['memory_bytes'] / 1e6:.1f} MB in memory, {audio_stats['disk_bytes'] / 1e6:.1f} MB on disk"
+        )
+        if USE_ELEVENLABS and TTS_HEDGE_ENABLED:
+            hedge_stats = get_hedged_synthesizer().stats()
+            st.caption(
+                f"Speech hedging: deadline {hedge_stats['deadline_ms']:.0f} ms, {hedge_stats['hedges']} hedges, "
+                f"wins ElevenLabs {hedge_stats['primary_wins']} / gTTS {hedge_stats['fallback_wins']}"
+            )
+        
+        st.session_state.debug_panel = st.toggle(
+            "Show timings", st.session_state.debug_panel,
+            help="Time spent per stage (parsing, embedding, retrieval, generation, speech) in this session"
+        )
+        if st.session_state.debug_panel:
+            render_debug_panel(st.session_state.trace_recorder)
+        
         if st.button("🔄 Start New Session", help="Clear current session and upload new materials"):
             # Show loading animation
             st.markdown("""
@@ -870,10 +1445,22 @@ if st.session_state.setup_complete:
             """, unsafe_allow_html=True)
             
             st.session_state.history = []
+            if st.session_state.ingest_lease is not None:
+                # Stop indexing in the background unless another session is waiting for the
+                # same materials; nothing half-built goes into the cache
+                st.session_state.ingest_lease.release()
+            st.session_state.ingest_lease = None
+            st.session_state.ingest_job = None
+            if st.session_state.index_lease is not None:
+                st.session_state.index_lease.release()
+            st.session_state.index_lease = None
             st.session_state.vectorstore = None
+            st.session_state.corpus_key = None
+            st.session_state.corpus = None
             st.session_state.setup_complete = False
             st.session_state.pdf_info = ""
             st.session_state.pdf_names = []
+            st.session_state.trace_recorder.clear()
             time.sleep(1)  # Brief pause for visual feedback
             st.rerun()
 
@@ -0,0 +1,177 @@
+"""
+Content-addressed cache for synthesized speech.
+
+Clips are keyed by (backend, voice_id, model_id, voice_settings, normalized
+text) and kept in two tiers: a small in-memory LRU for the hottest clips and
+a larger byte-budgeted directory on disk that survives restarts. Both
+elevenlabs_tts and fallback_tts go through it, so identical strings (the
+setup greeting, repeated answers) are only synthesized once.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+
+AUDIO_CACHE_DIR = os.getenv(
+    "SERA_AUDIO_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sera", "audio"),
+)
+AUDIO_CACHE_MEMORY_BYTES = int(os.getenv("SERA_AUDIO_CACHE_MEMORY_MB", "32")) * 1024 * 1024
+AUDIO_CACHE_DISK_BYTES = int(os.getenv("SERA_AUDIO_CACHE_DISK_MB", "512")) * 1024 * 1024
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Whitespace differences never change the spoken result
+def normalize_text(text):
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def audio_cache_key(backend, voice_id, model_id, voice_settings, text):
+    payload = json.dumps(
+        [backend, voice_id, model_id, voice_settings, normalize_text(text)],
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    def __init__(self, cache_dir=AUDIO_CACHE_DIR, memory_bytes=AUDIO_CACHE_MEMORY_BYTES,
+                 disk_bytes=AUDIO_CACHE_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.memory_budget = memory_bytes
+        self.disk_budget = disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".mp3")
+
+    def _disk_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".mp3"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.cache_dir, name))
+            except OSError:
+                continue
+            entries.append((name[:-len(".mp3")], stat.st_size, stat.st_mtime))
+        return entries
+
+    def _remember(self, key, audio):
+        if len(audio) > self.memory_budget:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_budget:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # Cheap presence check that doesn't count as a lookup
+    def contains(self, key):
+        with self._lock:
+            if key in self._memory:
+                return True
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                audio = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        with self._lock:
+            self._remember(key, audio)
+
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes += len(audio)
+            if self._disk_bytes > self.disk_budget:
+                self._evict_disk()
+
+    # Drop least recently used clips until the disk tier fits its budget
+    def _evict_disk(self):
+        entries = sorted(self._disk_entries(), key=lambda entry: entry[2])
+        self._disk_bytes = sum(size for _, size, _ in entries)
+        while entries and self._disk_bytes > self.disk_budget:
+            key, size, _ = entries.pop(0)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self._disk_bytes -= size
+
+    # Return cached audio or synthesize it with produce() and store the result
+    def get_or_create(self, key, produce):
+        audio = self.get(key)
+        if audio is not None:
+            return audio
+        audio = produce()
+        if audio:
+            self.put(key, audio)
+        return audio
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+# Process-wide cache; a plain singleton because TTS also runs on worker threads
+def get_audio_cache():
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = AudioCache()
+        return _default_cache
@@ -0,0 +1,66 @@
+"""
+Per-question chain construction cost, before and after caching.
+
+"before" repeats what appy.py used to do on every question: create the
+Gemini client, the retriever, parse the system template and build the
+stuff-documents and retrieval chains. "after" is the cached path, where a
+question only looks the chain up. No network calls are made; a dummy API
+key is used if GOOGLE_API_KEY is not set.
+
+    python benchmarks/bench_chain_construction.py --iterations 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_community.vectorstores import FAISS
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from fakes import FakeEmbeddings
+from tutor_chain import SYSTEM_TEMPLATE, TUTOR_MODEL, TUTOR_TEMPERATURE, USER_TEMPLATE, build_retrieval_chain
+
+
+def build_per_question(vectorstore, user_name, pdf_info):
+    llm = ChatGoogleGenerativeAI(model=TUTOR_MODEL, temperature=TUTOR_TEMPERATURE)
+    retriever = vectorstore.as_retriever(search_type="similarity", search_kwargs={"k": 5})
+    prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_TEMPLATE), ("human", USER_TEMPLATE)])
+    prompt = prompt.partial(user_name=user_name, pdf_info=pdf_info)
+    document_chain = create_stuff_documents_chain(llm, prompt)
+    return create_retrieval_chain(retriever, document_chain)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    vectorstore = FAISS.from_texts([f"chunk {i}" for i in range(100)], FakeEmbeddings(latency=0))
+    user_name, pdf_info = "Ada", "I've processed 120 pages from 1 document(s): biology.pdf."
+
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        build_per_question(vectorstore, user_name, pdf_info)
+    before = (time.perf_counter() - started) / args.iterations
+
+    cache = {}
+    started = time.perf_counter()
+    for _ in range(args.iterations):
+        key = ("corpus-key", user_name, pdf_info, TUTOR_MODEL, TUTOR_TEMPERATURE)
+        if key not in cache:
+            cache[key] = build_retrieval_chain(vectorstore, user_name, pdf_info)
+        cache[key]
+    after = (time.perf_counter() - started) / args.iterations
+
+    print(f"per-question construction (before): {before * 1000:8.3f} ms")
+    print(f"cached chain lookup (after):        {after * 1000:8.3f} ms  (first build included, amortized)")
+
+
+if __name__ == "__main__":
+    main()
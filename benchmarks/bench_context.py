@@ -0,0 +1,124 @@
+"""
+Prompt tokens per question with and without the context builder.
+
+Builds a hybrid index (hashed n-gram embeddings, so retrieval is meaningful
+offline, plus BM25) over synthetic PDFs from pdf_fixtures.py, asks questions
+quoting two neighbouring chunks of a page, and for each question compares
+the retrieved chunks stuffed verbatim with context_builder.ContextBuilder's passages:
+
+    context tokens  retrieved context, estimated at CHARS_PER_TOKEN
+    prompt tokens   the same plus the system template and the question
+    passages        passages per question after merging
+    cut             questions whose context had to be cut to the budget
+    assemble ms     p50/p99 time spent in the builder
+
+once per --budgets value (0 = merge and dedup only).
+
+    python benchmarks/bench_context.py
+    python benchmarks/bench_context.py --pages 500 --queries 500 --budgets 0 800 1000 1500 --json context.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+import numpy as np
+
+from context_builder import ContextBuilder, estimate_tokens
+from embedding_backends import HashedNgramEmbeddings
+from embedding_scheduler import EmbeddingScheduler
+from hybrid_retrieval import HybridRetriever, QueryEmbedder
+from index_store import build_lexical_index
+from ingest import split_pages
+from pdf_fixtures import make_fixture
+from pdf_loader import load_pdfs
+from tutor_chain import RETRIEVER_K, SYSTEM_TEMPLATE
+
+
+# Questions about a passage that runs across two neighbouring chunks of a page
+def _questions(chunks, count, seed):
+    rng = np.random.default_rng(seed)
+    neighbours = [i for i in range(len(chunks) - 1) if chunks[i].metadata == chunks[i + 1].metadata]
+    questions = []
+    for row in rng.choice(neighbours, size=min(count, len(neighbours)), replace=False):
+        phrases = []
+        for chunk in chunks[row:row + 2]:
+            words = chunk.page_content.split()
+            start = int(rng.integers(0, max(1, len(words) - 20)))
+            phrases.append(" ".join(words[start:start + 20]))
+        questions.append(f"How does {phrases[0]} relate to {phrases[1]}?")
+    return questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[0, 1000])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sera-bench-") as fixture_dir:
+        paths = [make_fixture(fixture_dir, "context", args.pages, seed=seed) for seed in range(args.files)]
+        pages, errors = load_pdfs(paths)
+    if errors:
+        raise RuntimeError(f"Could not load fixtures: {errors}")
+    chunks = split_pages(pages)
+    embeddings = HashedNgramEmbeddings()
+    vectorstore = EmbeddingScheduler(embeddings).build_faiss(chunks)
+    retriever = HybridRetriever(
+        vectorstore=vectorstore, lexical_index=build_lexical_index(vectorstore),
+        query_embedder=QueryEmbedder(embeddings.embed_query), k=RETRIEVER_K,
+    )
+    questions = _questions(chunks, args.queries, args.seed)
+    retrieved = [retriever.invoke(question) for question in questions]
+    template_tokens = estimate_tokens(SYSTEM_TEMPLATE)
+    print(f"{len(chunks)} chunks, {len(questions)} questions, k={RETRIEVER_K}, system template ~{template_tokens} tokens")
+
+    results = {"chunks": len(chunks), "questions": len(questions), "template_tokens": template_tokens, "budgets": {}}
+    for budget in args.budgets:
+        builder = ContextBuilder(token_budget=budget)
+        context_in, context_out, tokens_in, tokens_out, passages, seconds, cut = [], [], [], [], [], [], 0
+        for question, documents in zip(questions, retrieved):
+            started = time.perf_counter()
+            built, stats = builder.assemble(documents)
+            seconds.append(time.perf_counter() - started)
+            question_tokens = template_tokens + estimate_tokens(question)
+            context_in.append(stats.tokens_in)
+            context_out.append(stats.tokens_out)
+            tokens_in.append(stats.tokens_in + question_tokens)
+            tokens_out.append(stats.tokens_out + question_tokens)
+            passages.append(stats.passages)
+            cut += stats.cut_chars > 0
+        run = {
+            "context_tokens_in": float(np.mean(context_in)), "context_tokens_out": float(np.mean(context_out)),
+            "prompt_tokens_in": float(np.mean(tokens_in)), "prompt_tokens_out": float(np.mean(tokens_out)),
+            "prompt_tokens_saved": float(1 - np.mean(tokens_out) / np.mean(tokens_in)),
+            "passages": float(np.mean(passages)), "cut_fraction": cut / len(questions),
+            "assemble_p50_ms": float(np.percentile(seconds, 50) * 1000),
+            "assemble_p99_ms": float(np.percentile(seconds, 99) * 1000),
+        }
+        results["budgets"][str(budget)] = run
+        print(
+            f"budget {budget or 'none'}: context ~{run['context_tokens_in']:.0f} -> ~{run['context_tokens_out']:.0f} tokens, "
+            f"prompt ~{run['prompt_tokens_in']:.0f} -> ~{run['prompt_tokens_out']:.0f} "
+            f"({run['prompt_tokens_saved']:.1%} saved), {run['passages']:.1f} passages, "
+            f"{run['cut_fraction']:.0%} cut, assemble p50 {run['assemble_p50_ms']:.2f} ms / "
+            f"p99 {run['assemble_p99_ms']:.2f} ms"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+What boilerplate and duplicate-chunk removal (chunk_dedup) saves at ingest.
+
+Builds the same corpus twice through ingest.split_pages and the embedding
+scheduler, without and with a ChunkDeduplicator, and reports per run:
+
+    chunks        chunks embedded and stored
+    chars         characters sent to the embedding model
+    calls         embedding requests (FakeEmbeddings, no network)
+    index bytes   size of the saved index directory (FAISS, chunk store, BM25)
+    seconds       split + dedup time, and embed + FAISS build time
+
+The corpus is synthetic PDFs from pdf_fixtures.py with running headers,
+page-number footers, a copyright line and recurring summary boxes
+(boilerplate=True), or the PDFs given with --pdf.
+
+    python benchmarks/bench_dedup.py
+    python benchmarks/bench_dedup.py --files 4 --pages 300 --json dedup.json
+    python benchmarks/bench_dedup.py --pdf textbook.pdf
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from chunk_dedup import ChunkDeduplicator
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeEmbeddings
+from index_cache import _dir_size
+from index_store import save_index
+from ingest import format_dedup_report, split_pages
+from pdf_fixtures import make_fixture
+from pdf_loader import load_pdfs
+
+
+def build(pages, deduplicator, args, scratch):
+    started = time.perf_counter()
+    chunks = split_pages(pages, deduplicator)
+    split_seconds = time.perf_counter() - started
+
+    embeddings = FakeEmbeddings(size=args.dim, latency=0.0)
+    scheduler = EmbeddingScheduler(embeddings, requests_per_second=1e6)
+    started = time.perf_counter()
+    vectorstore = scheduler.build_faiss(chunks)
+    build_seconds = time.perf_counter() - started
+
+    path = tempfile.mkdtemp(dir=scratch)
+    save_index(vectorstore, path)
+    return {
+        "chunks": len(chunks),
+        "chars": sum(len(chunk.page_content) for chunk in chunks),
+        "calls": embeddings.calls,
+        "index_bytes": _dir_size(path),
+        "split_s": split_seconds,
+        "build_s": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="+", help="measure these PDFs instead of the synthetic fixtures")
+    parser.add_argument("--files", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=768, help="embedding size, as for Gemini embeddings")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sera-bench-") as scratch:
+        paths = args.pdf or [
+            make_fixture(scratch, "dedup", args.pages, seed=seed, boilerplate=True) for seed in range(args.files)
+        ]
+        pages, errors = load_pdfs(paths)
+        if errors:
+            raise RuntimeError(f"Could not load {errors}")
+
+        deduplicator = ChunkDeduplicator()
+        results = {"pages": len(pages), "without": build(pages, None, args, scratch),
+                   "with": build(pages, deduplicator, args, scratch), "dedup": deduplicator.report()}
+
+    before, after = results["without"], results["with"]
+    print(f"{len(paths)} PDFs, {len(pages)} pages")
+    for name in ("chunks", "chars", "calls", "index_bytes"):
+        saved = 1 - after[name] / before[name] if before[name] else 0.0
+        print(f"  {name:12s} {before[name]:>12,} -> {after[name]:>12,}  ({saved:.1%} less)")
+    print(f"  split        {before['split_s']:.2f}s -> {after['split_s']:.2f}s (dedup included)")
+    print(f"  embed+build  {before['build_s']:.2f}s -> {after['build_s']:.2f}s")
+    print(f"  {format_dedup_report(results['dedup'])}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
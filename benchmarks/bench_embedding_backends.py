@@ -0,0 +1,149 @@
+"""
+Ingest throughput and retrieval quality of the embedding backends, side by side.
+
+For each backend the corpus chunks are embedded through the EmbeddingScheduler
+(no embedding cache, so the numbers are raw backend cost) and put in a flat
+FAISS index. Quality is measured with held-out snippet queries: a ~30-word
+span from the middle of a sampled chunk must retrieve that chunk. The report
+shows recall@k and MRR, plus the top-k overlap with the Gemini results when
+Gemini is among the backends.
+
+    python benchmarks/bench_embedding_backends.py --pdf docs/ --backends hashed gemini
+    python benchmarks/bench_embedding_backends.py --backends hashed     # offline, repo sources as corpus
+
+Gemini needs GOOGLE_API_KEY. Without --pdf, the repository's own .py and .md
+files are used as the text corpus.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+
+from embedding_backends import create_embeddings
+from embedding_scheduler import EmbeddingScheduler
+
+
+def load_corpus(args):
+    if args.pdf:
+        from pdf_loader import load_pdfs
+        paths = []
+        for item in args.pdf:
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.pdf"))) if os.path.isdir(item) else [item])
+        pages, _ = load_pdfs(paths)
+    else:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(ROOT, "*.py")) + glob.glob(os.path.join(ROOT, "*.md"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(Document(page_content=f.read(), metadata={"source": path}))
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    return [doc.page_content for doc in splitter.split_documents(pages)]
+
+
+def snippet_queries(texts, count, seed):
+    rng = np.random.default_rng(seed)
+    candidates = [row for row, text in enumerate(texts) if len(text.split()) >= 60]
+    rows = rng.choice(candidates, size=min(count, len(candidates)), replace=False)
+    queries = []
+    for row in rows:
+        words = texts[row].split()
+        start = len(words) // 2 - 15
+        queries.append(" ".join(words[start:start + 30]))
+    return [int(row) for row in rows], queries
+
+
+def evaluate_backend(name, texts, rows, queries, k):
+    from langchain_community.vectorstores import FAISS
+
+    embeddings, model_name = create_embeddings(name)
+    scheduler = EmbeddingScheduler(embeddings)
+    vectors = [None] * len(texts)
+    started = time.perf_counter()
+    for start, batch in scheduler.embed_batches(texts):
+        vectors[start:start + len(batch)] = batch
+    embed_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectorstore = FAISS.from_embeddings(zip(texts, vectors), embeddings, metadatas=[{"row": i} for i in range(len(texts))])
+    build_seconds = time.perf_counter() - started
+
+    rankings, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results = vectorstore.similarity_search(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        rankings.append([doc.metadata["row"] for doc in results])
+
+    reciprocal_ranks = [1.0 / (ranking.index(row) + 1) if row in ranking else 0.0 for row, ranking in zip(rows, rankings)]
+    return {
+        "backend": name,
+        "model": model_name,
+        "dim": len(vectors[0]),
+        "chunks_per_second": len(texts) / embed_seconds,
+        "embed_s": embed_seconds,
+        "build_s": build_seconds,
+        "query_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "recall_at_k": float(np.mean([row in ranking for row, ranking in zip(rows, rankings)])),
+        "mrr": float(np.mean(reciprocal_ranks)),
+    }, rankings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", default=[], help="PDF files or directories to use as the corpus")
+    parser.add_argument("--backends", nargs="+", default=["hashed", "gemini"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    backends = list(args.backends)
+    if "gemini" in backends and not os.getenv("GOOGLE_API_KEY"):
+        print("GOOGLE_API_KEY is not set; skipping the gemini backend", file=sys.stderr)
+        backends.remove("gemini")
+
+    texts = load_corpus(args)
+    rows, queries = snippet_queries(texts, args.queries, args.seed)
+    print(f"corpus: {len(texts)} chunks, {len(queries)} snippet queries, k={args.k}")
+
+    results, rankings = [], {}
+    for name in backends:
+        try:
+            result, rankings[name] = evaluate_backend(name, texts, rows, queries, args.k)
+        except (ImportError, OSError) as e:
+            # Package not installed, or the local model can't be downloaded
+            print(f"Skipping the {name} backend: {e}", file=sys.stderr)
+            continue
+        results.append(result)
+    if "gemini" in rankings:
+        for result in results:
+            overlaps = [
+                len(set(ours) & set(theirs)) / args.k
+                for ours, theirs in zip(rankings[result["backend"]], rankings["gemini"])
+            ]
+            result["overlap_with_gemini"] = float(np.mean(overlaps))
+
+    print(f"{'backend':22} {'dim':>5} {'chunks/s':>10} {'build s':>8} {'query ms':>9} {'recall@k':>9} {'MRR':>6} {'vs gemini':>10}")
+    for result in results:
+        overlap = result.get("overlap_with_gemini")
+        print(f"{result['backend']:22} {result['dim']:5d} {result['chunks_per_second']:10.0f} {result['build_s']:8.2f} "
+              f"{result['query_p50_ms']:9.2f} {result['recall_at_k']:9.3f} {result['mrr']:6.3f} "
+              f"{'-' if overlap is None else f'{overlap:.3f}':>10}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"chunks": len(texts), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
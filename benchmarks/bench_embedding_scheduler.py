@@ -0,0 +1,61 @@
+"""
+Offline benchmark for the embedding scheduler.
+
+Compares a sequential FAISS.from_documents build against the batched,
+concurrent scheduler using a fake embedder with configurable latency and
+429 rate. Example:
+
+    python benchmarks/bench_embedding_scheduler.py --chunks 2000 --latency 0.2 --failure-rate 0.05
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeEmbeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.1, help="seconds per embedding request")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests that fail with a fake 429")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 100])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--rps", type=float, default=50.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    documents = [Document(page_content=f"chunk {i} " + "lorem ipsum " * 40, metadata={"page": i})
+                 for i in range(args.chunks)]
+
+    # GoogleGenerativeAIEmbeddings sends 100 texts per request by default
+    fake = FakeEmbeddings(latency=args.latency)
+    started = time.perf_counter()
+    for start in range(0, len(documents), 100):
+        FAISS.from_documents(documents[start:start + 100], fake)
+    baseline = time.perf_counter() - started
+    print(f"sequential baseline: {baseline:.2f}s ({args.chunks / baseline:.0f} chunks/s)")
+
+    print(f"{'batch':>6} {'conc':>5} {'seconds':>8} {'chunks/s':>9} {'p50':>7} {'p95':>7} {'retries':>8}")
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            fake = FakeEmbeddings(latency=args.latency, failure_rate=args.failure_rate)
+            scheduler = EmbeddingScheduler(fake, batch_size=batch_size, max_concurrency=concurrency,
+                                           requests_per_second=args.rps, base_backoff=0.05, max_backoff=1.0)
+            vectorstore = scheduler.build_faiss(documents)
+            assert vectorstore.index.ntotal == len(documents)
+            report = scheduler.report()
+            print(f"{batch_size:>6} {concurrency:>5} {report['seconds']:>8.2f} {report['chunks_per_second']:>9.0f} "
+                  f"{report['batch_latency_p50']:>7.3f} {report['batch_latency_p95']:>7.3f} {report['retries']:>8}")
+
+
+if __name__ == "__main__":
+    main()
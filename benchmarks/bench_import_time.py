@@ -0,0 +1,127 @@
+"""
+Cold-start cost of appy.py: what a fresh worker pays before the name prompt renders.
+
+Two measurements, each in fresh interpreters so nothing is already imported:
+
+    imports   appy.py's module-level import statements (extracted with ast)
+              run under `python -X importtime`; reports wall time and the
+              modules with the largest cumulative import time
+    render    wall time of the first AppTest run of appy.py, i.e. the welcome
+              screen, including Streamlit itself (--render)
+
+To compare before and after a change, point --trees at checkouts of both:
+
+    git worktree add /tmp/sera-before <old-revision>
+    python benchmarks/bench_import_time.py --trees /tmp/sera-before . --render
+
+GOOGLE_API_KEY is set to a dummy value if missing, and warm-up (SERA_WARMUP)
+is disabled so it doesn't compete with the measurement.
+"""
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The module-level import statements of a file, as source
+def module_imports(path):
+    with open(path, "r", encoding="utf-8") as f:
+        source = f.read()
+    tree = ast.parse(source)
+    return "\n".join(
+        ast.get_source_segment(source, node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))
+    )
+
+
+def _env():
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+    env["SERA_WARMUP"] = "0"
+    return env
+
+
+def _run(tree, code, importtime=False):
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(command, cwd=tree, env=_env(), capture_output=True, text=True, timeout=600)
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark subprocess failed in {tree}:\n{result.stderr[-2000:]}")
+    return result
+
+
+def measure_imports(tree, runs, top):
+    imports = module_imports(os.path.join(tree, "appy.py"))
+    code = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {tree!r})
+        started = time.perf_counter()
+    """) + imports + "\nprint(time.perf_counter() - started)\n"
+
+    _run(tree, code)  # compile .pyc files first
+    seconds = [float(_run(tree, code).stdout.split()[-1]) for _ in range(runs)]
+
+    cumulative = {}
+    for line in _run(tree, code, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        # Nested imports are indented under their importer; keep the top level only
+        if cumulative_us.strip().isdigit() and not name.startswith("  "):
+            cumulative[name.strip()] = int(cumulative_us) / 1e6
+    slowest = sorted(cumulative.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {"import_s": statistics.median(seconds), "import_min_s": min(seconds), "slowest": slowest}
+
+
+def measure_render(tree, runs):
+    code = textwrap.dedent(f"""
+        import sys, time
+        sys.path.insert(0, {tree!r})
+        started = time.perf_counter()
+        from streamlit.testing.v1 import AppTest
+        at = AppTest.from_file({os.path.join(tree, "appy.py")!r}, default_timeout=120)
+        at.run()
+        assert not at.exception, at.exception
+        print(time.perf_counter() - started)
+    """)
+    _run(tree, code)
+    seconds = [float(_run(tree, code).stdout.split()[-1]) for _ in range(runs)]
+    return {"render_s": statistics.median(seconds), "render_min_s": min(seconds)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trees", nargs="+", default=[ROOT], help="checkouts to measure, e.g. before and after")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="slowest top-level imports to list")
+    parser.add_argument("--render", action="store_true", help="also time the first render of the welcome screen")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    results = {}
+    for tree in args.trees:
+        tree = os.path.abspath(tree)
+        result = measure_imports(tree, args.runs, args.top)
+        if args.render:
+            result.update(measure_render(tree, args.runs))
+        results[tree] = result
+
+        print(f"{tree}")
+        print(f"  appy.py imports: {result['import_s'] * 1000:.0f} ms median, {result['import_min_s'] * 1000:.0f} ms best")
+        if args.render:
+            print(f"  first render:    {result['render_s'] * 1000:.0f} ms median, {result['render_min_s'] * 1000:.0f} ms best")
+        print("  slowest imports (cumulative, -X importtime):")
+        for name, seconds in result["slowest"]:
+            print(f"    {seconds * 1000:8.1f} ms  {name}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Resident memory of N processes serving the same index, heap vs memory-mapped.
+
+Builds a synthetic index, stores it with index_store.save_index, then starts
+N worker processes that each open it (memory_map=True or False), run a few
+queries and report their memory from /proc while all of them are alive.
+RssAnon is private heap; RssFile is page cache mapped into the process and
+shared between workers; Pss splits shared pages evenly between the processes
+mapping them, so summed Pss is the real footprint. Linux only.
+
+    python benchmarks/bench_mmap_rss.py --chunks 100000 --workers 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from fakes import FakeEmbeddings
+from index_store import load_index, save_index
+
+
+def read_memory():
+    memory = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("RssAnon", "RssFile", "VmRSS"):
+                memory[name] = int(value.split()[0])
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    memory["Pss"] = int(line.split()[1])
+    except OSError:
+        pass
+    return memory
+
+
+def worker(path, memory_map, dim, hold):
+    before = read_memory()
+    embeddings = FakeEmbeddings(size=dim, latency=0)
+    vectorstore = load_index(path, embeddings, memory_map=memory_map)
+    rng = np.random.default_rng(os.getpid())
+    for _ in range(20):
+        query = rng.standard_normal(dim).astype(np.float32)
+        vectorstore.similarity_search_by_vector(query.tolist(), k=5)
+    after = read_memory()
+    # Stay alive so every worker's mappings overlap when the parent reads totals
+    print(json.dumps({name: after[name] - before.get(name, 0) for name in after}), flush=True)
+    time.sleep(hold)
+
+
+def build(path, chunks, dim):
+    from langchain_community.vectorstores import FAISS
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((chunks, dim)).astype(np.float32)
+    texts = [f"synthetic chunk {i} " + "lorem ipsum dolor sit amet " * 30 for i in range(chunks)]
+    vectorstore = FAISS.from_embeddings(
+        zip(texts, vectors.tolist()),
+        FakeEmbeddings(size=dim, latency=0),
+        metadatas=[{"source": "synthetic.pdf", "page": i // 4} for i in range(chunks)],
+    )
+    save_index(vectorstore, path)
+
+
+def run(path, workers, memory_map, dim):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", path, "--dim", str(dim),
+             "--memory-map", "1" if memory_map else "0", "--hold", "3"],
+            stdout=subprocess.PIPE, text=True,
+        )
+        for _ in range(workers)
+    ]
+    reports = [json.loads(proc.stdout.readline()) for proc in procs]
+    for proc in procs:
+        proc.wait()
+    return {name: sum(report.get(name, 0) for report in reports) for name in reports[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--memory-map", default="1", help=argparse.SUPPRESS)
+    parser.add_argument("--hold", type=float, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.memory_map == "1", args.dim, args.hold)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index")
+        started = time.perf_counter()
+        build(path, args.chunks, args.dim)
+        size_mb = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path)) / 2 ** 20
+        print(f"built {args.chunks} chunks x {args.dim} dims ({size_mb:.0f} MB on disk) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        for label, memory_map in (("heap", False), ("mmap", True)):
+            totals = run(path, args.workers, memory_map, args.dim)
+            print(f"{label}: {args.workers} workers  "
+                  + "  ".join(f"{name} {value / 1024:7.1f} MB" for name, value in sorted(totals.items())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""
+Offline end-to-end benchmark suite with machine-readable results.
+
+Every remote service is replaced by a deterministic stand-in from fakes.py
+(Gemini chat and embeddings, TTS, speech recognition) with configurable
+latency and failure rates, and the corpus is synthetic PDFs from
+pdf_fixtures.py in several sizes. For each size the suite measures:
+
+    load      pages/s with PyPDFLoader (one file, sequential) and with
+              pdf_loader.load_pdfs (the app's process-pool loader)
+    split     chunks/s for ingest.split_pages
+    build     seconds to embed and build the FAISS index through the
+              embedding scheduler, and to build the BM25 index
+    retrieve  p50/p99 ms per query for vector search and hybrid retrieval
+    e2e       p50/p99 seconds per spoken question: speech recognition,
+              retrieval, streamed generation and sentence-pipelined speech,
+              split into time to first token, to first audio clip and total
+
+Results go to stdout and, with --json, to a file that a later run can compare
+against with --baseline; metrics that got worse by more than --tolerance are
+listed and the exit status is 1.
+
+    python benchmarks/bench_suite.py --json results.json
+    python benchmarks/bench_suite.py --baseline results.json --tolerance 0.2
+    python benchmarks/bench_suite.py --sizes small --queries 50 --e2e-queries 5 --llm-failure-rate 0.1
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark-dummy-key")
+
+import numpy as np
+from langchain_community.document_loaders import PyPDFLoader
+from langchain_community.vectorstores import FAISS  # noqa: F401 - imported here so the first build doesn't pay for it
+
+from bm25 import BM25Index
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeChatModel, FakeEmbeddings, FakeSpeechRecognizer, FakeSpeechSynthesizer
+from hybrid_retrieval import HybridRetriever, QueryEmbedder
+from ingest import split_pages
+from pdf_fixtures import FIXTURE_SIZES, make_fixture
+from pdf_loader import load_pdfs
+from speech_pipeline import SpeechPipeline
+from tutor_chain import build_retrieval_chain
+
+RESULTS_FORMAT_VERSION = 1
+
+
+def _percentiles(seconds, scale=1.0):
+    return float(np.percentile(seconds, 50) * scale), float(np.percentile(seconds, 99) * scale)
+
+
+# Best of `repeat` runs, returning (seconds, result of the last run)
+def _timed(function, repeat=1):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def _snippets(chunks, count, seed):
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(chunks), size=min(count, len(chunks)), replace=False)
+    questions = []
+    for row in rows:
+        words = chunks[row].page_content.split()
+        start = max(0, len(words) // 2 - 6)
+        questions.append("What does it say about " + " ".join(words[start:start + 12]) + "?")
+    return questions
+
+
+def bench_size(name, pages_count, args, fixture_dir):
+    metrics = {}
+    path = make_fixture(fixture_dir, name, pages_count, seed=args.seed)
+
+    seconds, documents = _timed(lambda: PyPDFLoader(path).load(), args.repeat)
+    metrics["pypdfloader_pages_per_s"] = len(documents) / seconds
+    seconds, (pages, errors) = _timed(lambda: load_pdfs([path]), args.repeat)
+    if errors:
+        raise RuntimeError(f"Could not load fixture {path}: {errors}")
+    metrics["load_pdfs_pages_per_s"] = len(pages) / seconds
+
+    seconds, chunks = _timed(lambda: split_pages(pages), args.repeat)
+    metrics["split_chunks_per_s"] = len(chunks) / seconds
+    metrics["chunks"] = len(chunks)
+
+    embeddings = FakeEmbeddings(
+        size=args.dim, latency=args.embed_latency, per_text_latency=args.embed_per_text_latency,
+        failure_rate=args.embed_failure_rate, seed=args.seed,
+    )
+    scheduler = EmbeddingScheduler(embeddings, base_backoff=0.05, max_backoff=1.0)
+    seconds, vectorstore = _timed(lambda: scheduler.build_faiss(chunks))
+    metrics["index_build_s"] = seconds
+    ids = list(vectorstore.index_to_docstore_id.values())
+    texts = [vectorstore.docstore.search(doc_id).page_content for doc_id in ids]
+    seconds, lexical = _timed(lambda: BM25Index.build(ids, texts), args.repeat)
+    metrics["bm25_build_s"] = seconds
+
+    questions = _snippets(chunks, args.queries, args.seed)
+    vector_latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        vectorstore.similarity_search(question, k=5)
+        vector_latencies.append(time.perf_counter() - started)
+    metrics["vector_retrieval_p50_ms"], metrics["vector_retrieval_p99_ms"] = _percentiles(vector_latencies, 1000)
+
+    query_embedder = QueryEmbedder(embeddings.embed_query, deadline_seconds=args.embed_deadline)
+    retriever = HybridRetriever(vectorstore=vectorstore, lexical_index=lexical, query_embedder=query_embedder, k=5)
+    hybrid_latencies = []
+    for question in questions:
+        started = time.perf_counter()
+        retriever.invoke(question)
+        hybrid_latencies.append(time.perf_counter() - started)
+    metrics["hybrid_retrieval_p50_ms"], metrics["hybrid_retrieval_p99_ms"] = _percentiles(hybrid_latencies, 1000)
+
+    metrics.update(bench_end_to_end(vectorstore, lexical, query_embedder, questions[:args.e2e_queries], args))
+    return metrics
+
+
+# Spoken question -> transcript -> retrieval + streamed answer -> pipelined speech
+def bench_end_to_end(vectorstore, lexical, query_embedder, questions, args):
+    recognizer = FakeSpeechRecognizer(latency=args.stt_latency, failure_rate=args.stt_failure_rate, seed=args.seed)
+    llm = FakeChatModel(
+        first_token_latency=args.llm_first_token_latency, token_latency=args.llm_token_latency,
+        failure_rate=args.llm_failure_rate, seed=args.seed,
+    )
+    synthesize = FakeSpeechSynthesizer(
+        latency=args.tts_latency, failure_rate=args.tts_failure_rate, seed=args.seed
+    )
+    chain = build_retrieval_chain(
+        vectorstore, "Ada", "Synthetic benchmark corpus.", llm=llm,
+        lexical_index=lexical, query_embedder=query_embedder,
+    )
+
+    first_token, first_audio, total = [], [], []
+    failures = 0
+    for question in questions:
+        started = time.perf_counter()
+        speech = SpeechPipeline(synthesize)
+        try:
+            transcript = recognizer.recognize_google(question)
+            token_at = audio_at = None
+            for chunk in chain.stream({"input": transcript}):
+                token = chunk.get("answer")
+                if token:
+                    token_at = token_at or time.perf_counter()
+                    speech.feed(token)
+                    if audio_at is None and any(True for _ in speech.ready_clips()):
+                        audio_at = time.perf_counter()
+            speech.finish()
+            for _ in speech.drain():
+                audio_at = audio_at or time.perf_counter()
+        except Exception:
+            failures += 1
+            continue
+        finally:
+            speech.close()
+        finished = time.perf_counter()
+        first_token.append((token_at or finished) - started)
+        first_audio.append((audio_at or finished) - started)
+        total.append(finished - started)
+
+    metrics = {"e2e_failure_rate": failures / len(questions) if questions else 0.0}
+    if total:
+        metrics["e2e_first_token_p50_s"], metrics["e2e_first_token_p99_s"] = _percentiles(first_token)
+        metrics["e2e_first_audio_p50_s"], metrics["e2e_first_audio_p99_s"] = _percentiles(first_audio)
+        metrics["e2e_total_p50_s"], metrics["e2e_total_p99_s"] = _percentiles(total)
+    return metrics
+
+
+# Which way is better for a metric, from its name; None for metrics that are not compared
+def _higher_is_better(metric):
+    if metric.endswith("_per_s"):
+        return True
+    if metric.endswith(("_s", "_ms", "_rate")):
+        return False
+    return None
+
+
+# List (metric, baseline, current, relative change) for metrics worse than tolerance
+def find_regressions(baseline, current, tolerance):
+    regressions = []
+    for size, metrics in current.items():
+        for metric, value in metrics.items():
+            before = baseline.get(size, {}).get(metric)
+            higher_is_better = _higher_is_better(metric)
+            if before is None or higher_is_better is None:
+                continue
+            if not before:
+                # Zero baselines (e.g. no failures) only regress when the metric moves at all
+                change = float("inf") if value and not higher_is_better else 0.0
+            else:
+                change = (value - before) / abs(before)
+                if higher_is_better:
+                    change = -change
+            if change > tolerance:
+                regressions.append((f"{size}.{metric}", before, value, change))
+    return regressions
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", default=list(FIXTURE_SIZES), choices=list(FIXTURE_SIZES))
+    parser.add_argument("--fixture-dir", help="where to keep generated PDFs (default: a temporary directory)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of the CPU-bound stages; the best is reported")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--e2e-queries", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--embed-latency", type=float, default=0.05, help="seconds per embedding request")
+    parser.add_argument("--embed-per-text-latency", type=float, default=0.0)
+    parser.add_argument("--embed-failure-rate", type=float, default=0.0)
+    parser.add_argument("--embed-deadline", type=float, default=2.0, help="hybrid retrieval embedding deadline, seconds")
+    parser.add_argument("--llm-first-token-latency", type=float, default=0.3)
+    parser.add_argument("--llm-token-latency", type=float, default=0.005)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--tts-latency", type=float, default=0.2)
+    parser.add_argument("--tts-failure-rate", type=float, default=0.0)
+    parser.add_argument("--stt-latency", type=float, default=0.3)
+    parser.add_argument("--stt-failure-rate", type=float, default=0.0)
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown per metric")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="sera-bench-") as scratch:
+        fixture_dir = args.fixture_dir or scratch
+        for name in args.sizes:
+            print(f"{name} ({FIXTURE_SIZES[name]} pages)...", file=sys.stderr)
+            results[name] = bench_size(name, FIXTURE_SIZES[name], args, fixture_dir)
+
+    metric_names = sorted({metric for metrics in results.values() for metric in metrics})
+    print(f"{'metric':28}" + "".join(f"{name:>14}" for name in results))
+    for metric in metric_names:
+        row = "".join(f"{results[name].get(metric, float('nan')):14.3f}" for name in results)
+        print(f"{metric:28}{row}")
+
+    document = {
+        "format": RESULTS_FORMAT_VERSION,
+        "created_at": time.time(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = find_regressions(baseline["results"], results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regressions against {baseline.get('git_revision') or args.baseline}:")
+            for metric, before, after, change in regressions:
+                print(f"  {metric}: {before:.4g} -> {after:.4g} ({change:+.0%} worse)")
+            return 1
+        print(f"\nNo regressions beyond {args.tolerance:.0%} against {baseline.get('git_revision') or args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Exercise the pooled TTS HTTP client against a local stub server.
+
+The stub speaks HTTP/1.1 with keep-alive and can be told to be slow, flaky
+or down, so connection reuse, timeouts, retries and the circuit breaker can
+be checked without touching ElevenLabs:
+
+    python benchmarks/bench_tts_client.py --requests 50
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+from tts_client import CircuitBreaker, CircuitOpenError, TTSHttpClient
+
+
+class StubState:
+    mode = "ok"  # ok | slow | flaky | down
+    delay = 0.0
+    connections = 0
+    requests = 0
+    lock = threading.Lock()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle/delayed-ACK stalls
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with StubState.lock:
+            StubState.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with StubState.lock:
+            StubState.requests += 1
+            count = StubState.requests
+        if StubState.mode == "slow":
+            time.sleep(StubState.delay)
+        if StubState.mode == "down" or (StubState.mode == "flaky" and count % 2):
+            status, body = 503, b"unavailable"
+        else:
+            status, body = 200, b"ID3" + b"\x00" * 2048
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except BrokenPipeError:
+            # The client gave up (read-timeout scenario)
+            pass
+
+
+def reset_stub(mode, delay=0.0):
+    with StubState.lock:
+        StubState.mode = mode
+        StubState.delay = delay
+        StubState.connections = 0
+        StubState.requests = 0
+
+
+def timed(label, count, call):
+    started = time.perf_counter()
+    for _ in range(count):
+        call()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<34} {elapsed / count * 1000:7.2f} ms/request, "
+          f"{StubState.connections} connections for {StubState.requests} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/text-to-speech/voice"
+    payload = {"text": "Hello there, let's study photosynthesis."}
+
+    reset_stub("ok")
+    timed("bare requests.post", args.requests, lambda: requests.post(url, json=payload))
+
+    client = TTSHttpClient(backoff_base=0.01, backoff_max=0.05)
+    reset_stub("ok")
+    timed("pooled keep-alive client", args.requests, lambda: client.post(url, json=payload))
+
+    reset_stub("flaky")
+    statuses = [client.post(url, json=payload).status_code for _ in range(10)]
+    print(f"flaky backend, with retries:       {statuses.count(200)}/10 succeeded, {StubState.requests} attempts")
+
+    client = TTSHttpClient(read_timeout=0.2, max_retries=0)
+    reset_stub("slow", delay=1.0)
+    started = time.perf_counter()
+    try:
+        client.post(url, json=payload)
+    except requests.Timeout:
+        pass
+    print(f"stalled backend, read timeout:     gave up after {time.perf_counter() - started:.2f}s")
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=0.5)
+    client = TTSHttpClient(max_retries=0, breaker=breaker)
+    reset_stub("down")
+    fast_failures = 0
+    for _ in range(10):
+        try:
+            client.post(url, json=payload)
+        except CircuitOpenError:
+            fast_failures += 1
+    print(f"down backend, circuit breaker:     {StubState.requests} requests sent, "
+          f"{fast_failures} failed fast, state={breaker.state}")
+    reset_stub("ok")
+    time.sleep(0.6)
+    status = client.post(url, json=payload).status_code
+    print(f"recovered backend after cool-down: status={status}, state={breaker.state}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
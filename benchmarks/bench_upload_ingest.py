@@ -0,0 +1,116 @@
+"""
+Parsing uploads from memory vs. through temporary files.
+
+The app used to write every upload into a fresh tempfile.mkdtemp() directory
+and parse the copies from disk (never deleting them); pdf_loader now parses
+the upload buffers directly. For a multi-PDF upload of synthetic fixtures
+(see pdf_fixtures.py) held in BytesIO objects like Streamlit's UploadedFile,
+this times both routes through pdf_loader.load_pdfs:
+
+    tempfile  write each buffer to a temp directory, then load_pdfs(paths)
+    memory    load_pdfs([PdfBuffer(name, buffer.getbuffer()), ...])
+
+once in-process (--workers 1) and once on the process pool, and reports the
+best-of-N wall time, the time spent writing, and the bytes written to disk.
+Both routes must produce identical pages.
+
+    python benchmarks/bench_upload_ingest.py
+    python benchmarks/bench_upload_ingest.py --files 12 --pages 500 --scratch /var/tmp --json upload.json
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from pdf_fixtures import make_fixture
+from pdf_loader import PDF_WORKERS, PdfBuffer, load_pdfs, warm_pool
+
+
+# What the app did before: one temp directory per upload, parsed from disk
+def ingest_via_tempfiles(uploads, workers, scratch):
+    started = time.perf_counter()
+    temp_dir = tempfile.mkdtemp(dir=scratch)
+    try:
+        paths = []
+        written = 0
+        for name, upload in uploads:
+            path = os.path.join(temp_dir, name)
+            with open(path, "wb") as f:
+                written += f.write(upload.getbuffer())
+                f.flush()
+                os.fsync(f.fileno())
+            paths.append(path)
+        write_seconds = time.perf_counter() - started
+        pages, errors = load_pdfs(paths, max_workers=workers)
+        return time.perf_counter() - started, write_seconds, written, pages, errors
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)  # the benchmark cleans up; the old app didn't
+
+
+def ingest_from_memory(uploads, workers):
+    started = time.perf_counter()
+    pages, errors = load_pdfs([PdfBuffer(name, upload.getbuffer()) for name, upload in uploads], max_workers=workers)
+    return time.perf_counter() - started, 0.0, 0, pages, errors
+
+
+def _best(runs):
+    return min(runs, key=lambda run: run[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=8, help="PDFs per upload")
+    parser.add_argument("--pages", type=int, default=300, help="pages per PDF")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, PDF_WORKERS],
+                        help="pdf_loader worker counts to compare (1 parses in-process)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scratch", help="directory for the temp files (default: the system temp dir)")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="sera-bench-") as fixture_dir:
+        uploads = []
+        for seed in range(args.files):
+            path = make_fixture(fixture_dir, "upload", args.pages, seed=seed)
+            with open(path, "rb") as f:
+                uploads.append((os.path.basename(path), io.BytesIO(f.read())))
+    upload_bytes = sum(upload.getbuffer().nbytes for _, upload in uploads)
+    print(f"{args.files} PDFs x {args.pages} pages, {upload_bytes / 1e6:.1f} MB per upload")
+
+    results = {"files": args.files, "pages": args.pages, "upload_bytes": upload_bytes, "runs": {}}
+    for workers in args.workers:
+        if workers > 1:
+            warm_pool(workers)
+        tempfile_run = _best([ingest_via_tempfiles(uploads, workers, args.scratch) for _ in range(args.repeat)])
+        memory_run = _best([ingest_from_memory(uploads, workers) for _ in range(args.repeat)])
+        if tempfile_run[4] or memory_run[4]:
+            raise RuntimeError(f"Fixtures failed to parse: {tempfile_run[4] or memory_run[4]}")
+        if [page.page_content for page in tempfile_run[3]] != [page.page_content for page in memory_run[3]]:
+            raise RuntimeError("In-memory parsing produced different pages")
+
+        run = {
+            "tempfile_s": tempfile_run[0], "tempfile_write_s": tempfile_run[1], "tempfile_bytes_written": tempfile_run[2],
+            "memory_s": memory_run[0], "memory_bytes_written": memory_run[2],
+            "saved_s": tempfile_run[0] - memory_run[0], "pages": len(memory_run[3]),
+        }
+        results["runs"][str(workers)] = run
+        print(
+            f"workers={workers}: tempfile {run['tempfile_s']:.2f}s (writing {run['tempfile_write_s'] * 1000:.0f} ms, "
+            f"{run['tempfile_bytes_written'] / 1e6:.1f} MB), memory {run['memory_s']:.2f}s (0 MB), "
+            f"saved {run['saved_s'] * 1000:.0f} ms ({run['saved_s'] / run['tempfile_s']:.1%})"
+        )
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Recall@k vs. latency of the approximate index types against the flat baseline.
+
+Embeds a corpus (our own PDFs, or synthetic clustered vectors), builds the
+exact flat index as ground truth, then builds each approximate index type and
+sweeps its search knobs (efSearch for hnsw; nprobe and the re-rank factor
+for ivfpq). For every
+setting it reports build time, serialized index size, mean recall@k and
+single-query p50/p99 latency.
+
+    python benchmarks/eval_index_recall.py --pdf docs/ --k 5
+    python benchmarks/eval_index_recall.py --pdf docs/ --queries questions.txt --json recall.json
+    python benchmarks/eval_index_recall.py --synthetic 100000 --dim 768
+
+With --pdf, chunks are embedded through the embedding cache, so re-running on
+the same documents costs no API calls. Without --queries, held-out snippets of
+sampled chunks stand in for questions.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from index_backend import configure_search, train_index
+
+SWEEPS = {
+    "hnsw": [{"ef_search": value} for value in (16, 32, 64, 128, 256)],
+    "ivfpq": [
+        {"nprobe": nprobe, "k_factor": k_factor}
+        for nprobe in (4, 16, 64)
+        for k_factor in (1, 4, 16)
+    ],
+}
+
+
+def pdf_paths(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(
+                os.path.join(item, name) for name in os.listdir(item) if name.lower().endswith(".pdf")
+            ))
+        else:
+            paths.append(item)
+    return paths
+
+
+def embed_corpus(args):
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    from embedding_scheduler import EmbeddingScheduler
+    from pdf_loader import load_pdfs
+
+    if args.fake_embeddings:
+        from fakes import FakeEmbeddings
+        embeddings = FakeEmbeddings(size=args.dim, latency=0)
+    else:
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        from embedding_cache import CachedEmbeddings, EmbeddingStore
+        embeddings = CachedEmbeddings(
+            GoogleGenerativeAIEmbeddings(model=args.embedding_model), args.embedding_model, EmbeddingStore()
+        )
+
+    pages, errors = load_pdfs(pdf_paths(args.pdf))
+    for path, error in errors.items():
+        print(f"skipped {path}: {error}", file=sys.stderr)
+    splitter = RecursiveCharacterTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+    texts = [doc.page_content for doc in splitter.split_documents(pages)]
+
+    scheduler = EmbeddingScheduler(embeddings)
+    corpus = [None] * len(texts)
+    for start, vectors in scheduler.embed_batches(texts):
+        corpus[start:start + len(vectors)] = vectors
+
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = [embeddings.embed_query(question) for question in questions]
+    else:
+        rng = np.random.default_rng(args.seed)
+        rows = rng.choice(len(texts), size=min(args.num_queries, len(texts)), replace=False)
+        # The middle of a chunk, so the query is related to but not identical with it
+        snippets = [texts[row][len(texts[row]) // 4:len(texts[row]) // 4 + 200] for row in rows]
+        queries = [vector for _, batch in scheduler.embed_batches(snippets) for vector in batch]
+    return np.asarray(corpus, dtype=np.float32), np.asarray(queries, dtype=np.float32)
+
+
+# Gaussian clusters roughly mimic the topical structure of real embeddings
+def synthetic_corpus(args):
+    rng = np.random.default_rng(args.seed)
+    centers = rng.standard_normal((max(1, args.synthetic // 200), args.dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), size=args.synthetic)
+    corpus = centers[labels] + 0.5 * rng.standard_normal((args.synthetic, args.dim)).astype(np.float32)
+    picks = rng.choice(args.synthetic, size=args.num_queries, replace=False)
+    queries = corpus[picks] + 0.3 * rng.standard_normal((args.num_queries, args.dim)).astype(np.float32)
+    return corpus, queries
+
+
+def search_latencies(index, queries, k):
+    latencies = []
+    results = []
+    for query in queries:
+        started = time.perf_counter()
+        _, ids = index.search(query.reshape(1, -1), k)
+        latencies.append(time.perf_counter() - started)
+        results.append(ids[0])
+    return np.asarray(results), np.asarray(latencies) * 1000
+
+
+def recall_at_k(results, truth):
+    hits = [len(set(found[found >= 0]) & set(expected)) / len(expected) for found, expected in zip(results, truth)]
+    return float(np.mean(hits))
+
+
+def evaluate(corpus, queries, k):
+    import faiss
+
+    rows = []
+
+    def measure(label, index, build_seconds, setting=None):
+        results, latencies = search_latencies(index, queries, k)
+        rows.append({
+            "index": label,
+            "setting": setting,
+            "recall_at_k": recall_at_k(results, truth),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "build_s": build_seconds,
+            "size_mb": len(faiss.serialize_index(index)) / 2 ** 20,
+        })
+
+    started = time.perf_counter()
+    flat = faiss.IndexFlatL2(corpus.shape[1])
+    flat.add(corpus)
+    flat_seconds = time.perf_counter() - started
+    _, truth = flat.search(queries, k)
+    measure("flat", flat, flat_seconds)
+
+    for index_type, sweep in SWEEPS.items():
+        started = time.perf_counter()
+        index = train_index(corpus, index_type)
+        index.add(corpus)
+        build_seconds = time.perf_counter() - started
+        for knobs in sweep:
+            configure_search(index, **knobs)
+            measure(index_type, index, build_seconds, " ".join(f"{name}={value}" for name, value in knobs.items()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", nargs="*", default=[], help="PDF files or directories to evaluate on")
+    parser.add_argument("--queries", help="file with one question per line")
+    parser.add_argument("--synthetic", type=int, default=50000, help="synthetic corpus size when no --pdf is given")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--num-queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    parser.add_argument("--embedding-model", default="models/embedding-001")
+    parser.add_argument("--fake-embeddings", action="store_true", help="embed --pdf chunks offline with FakeEmbeddings")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    corpus, queries = embed_corpus(args) if args.pdf else synthetic_corpus(args)
+    print(f"corpus: {len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, k={args.k}")
+    rows = evaluate(corpus, queries, args.k)
+
+    print(f"{'index':6} {'setting':22} {'recall@k':>9} {'p50 ms':>8} {'p99 ms':>8} {'build s':>8} {'size MB':>8}")
+    for row in rows:
+        print(f"{row['index']:6} {row['setting'] or '-':22} {row['recall_at_k']:9.3f} {row['p50_ms']:8.3f} "
+              f"{row['p99_ms']:8.3f} {row['build_s']:8.2f} {row['size_mb']:8.1f}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(corpus), "dim": int(corpus.shape[1]), "k": args.k, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Deterministic local stand-ins for remote services (Gemini chat and embeddings,
+ElevenLabs/gTTS speech and Google speech recognition), for offline
+benchmarks. Each has a configurable latency and failure rate.
+"""
+import hashlib
+import random
+import threading
+import time
+
+from typing import Any, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeRateLimitError(Exception):
+    pass
+
+
+# Hash-seeded unit vectors with configurable per-call latency and failure rate
+class FakeEmbeddings(Embeddings):
+    def __init__(self, size=768, latency=0.05, per_text_latency=0.0, failure_rate=0.0, seed=0):
+        self.size = size
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def _call(self, count):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+        time.sleep(self.latency + self.per_text_latency * count)
+        if failed:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+
+    def embed_documents(self, texts):
+        self._call(len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text):
+        self._call(1)
+        return self._vector(text)
+
+
+# Chat model that streams a deterministic answer built from the prompt's words,
+# after a time-to-first-token delay and with a per-token delay
+class FakeChatModel(BaseChatModel):
+    first_token_latency: float = 0.3
+    token_latency: float = 0.01
+    failure_rate: float = 0.0
+    answer_words: int = 80
+    seed: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages):
+        words = " ".join(str(message.content) for message in messages).split()
+        digest = hashlib.sha256(" ".join(words).encode("utf-8")).digest()
+        rng = random.Random(int.from_bytes(digest[:8], "little") ^ self.seed)
+        picked = [rng.choice(words) for _ in range(self.answer_words)] if words else ["Hmm."]
+        # A sentence every 12 words, so the speech pipeline has something to cut
+        return " ".join(word + ("." if (i + 1) % 12 == 0 else "") for i, word in enumerate(picked)) + "."
+
+    def _wait_or_fail(self):
+        self.calls += 1
+        rng = random.Random(self.calls ^ self.seed)
+        time.sleep(self.first_token_latency)
+        if rng.random() < self.failure_rate:
+            raise FakeRateLimitError("429 Resource has been exhausted (fake)")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        self._wait_or_fail()
+        answer = self._answer(messages)
+        time.sleep(self.token_latency * len(answer.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=answer))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        self._wait_or_fail()
+        for i, word in enumerate(self._answer(messages).split()):
+            if i:
+                time.sleep(self.token_latency)
+            token = word if i == 0 else " " + word
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager is not None:
+                run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+
+# Text to speech: returns fake mp3 bytes after a fixed plus per-character delay
+class FakeSpeechSynthesizer:
+    def __init__(self, latency=0.2, per_char_latency=0.001, failure_rate=0.0, seed=0):
+        self.latency = latency
+        self.per_char_latency = per_char_latency
+        self.failure_rate = failure_rate
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __call__(self, text):
+        with self._lock:
+            self.calls += 1
+            failed = self._random.random() < self.failure_rate
+        time.sleep(self.latency + self.per_char_latency * len(text))
+        if failed:
+            raise ConnectionError("TTS request failed (fake)")
+        return b"ID3" + hashlib.sha256(text.encode("utf-8")).digest() * max(1, len(text) // 8)
+
+
+# Speech recognition with the speech_recognition.Recognizer call shape
+class FakeSpeechRecognizer:
+    def __init__(self, transcript="Can you explain this?", latency=0.5, failure_rate=0.0, seed=0):
+        self.transcript = transcript
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    def recognize_google(self, audio_data, language="en-US"):
+        time.sleep(self.latency)
+        if self._random.random() < self.failure_rate:
+            raise ConnectionError("Speech recognition request failed (fake)")
+        return audio_data if isinstance(audio_data, str) else self.transcript
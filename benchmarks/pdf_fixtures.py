@@ -0,0 +1,110 @@
+"""
+Synthetic PDF fixtures for offline benchmarks.
+
+PDFs are written directly (one Helvetica text stream per page, no external
+dependencies) from seeded random lecture-like text, so the same size and seed
+always give byte-identical files and the same chunks. With boilerplate=True
+pages get a running header, a page-number footer and a copyright line, and
+every DUPLICATE_EVERY-th page reprints a summary box, alternately verbatim
+and with a few words changed, like a textbook's repeated key-equation boxes.
+"""
+import os
+import random
+
+# Fixture name -> page count
+FIXTURE_SIZES = {"small": 5, "medium": 50, "large": 300}
+
+WORDS_PER_PAGE = 350
+WORDS_PER_LINE = 12
+DUPLICATE_EVERY = 10
+
+_VOCABULARY = (
+    "energy entropy enthalpy equilibrium reaction rate constant temperature pressure volume gas ideal "
+    "molecule atom electron orbital bond covalent ionic lattice crystal solution solvent acid base buffer "
+    "cell membrane protein enzyme substrate receptor gene allele mutation selection population species "
+    "force mass acceleration velocity momentum torque friction wave frequency amplitude field charge "
+    "current voltage resistance circuit capacitor matrix vector eigenvalue derivative integral limit "
+    "theorem proof lemma function series convergence probability distribution variance sample estimate "
+    "market demand supply price elasticity utility cost revenue equilibrium policy inflation interest "
+    "the a of and to in is that for it as with by on this we which are be from an at or can these each"
+).split()
+
+
+def synthetic_page_text(rng, words=WORDS_PER_PAGE):
+    picked = [rng.choice(_VOCABULARY) for _ in range(words)]
+    lines = []
+    for start in range(0, len(picked), WORDS_PER_LINE):
+        line = " ".join(picked[start:start + WORDS_PER_LINE])
+        lines.append(line[0].upper() + line[1:] + ".")
+    return "\n".join(lines)
+
+
+def _escape(text):
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+# Page texts with running headers and footers and recurring summary boxes
+def boilerplate_pages(rng, count, title):
+    box = synthetic_page_text(rng, words=160)
+    pages = []
+    for number in range(1, count + 1):
+        body = synthetic_page_text(rng)
+        if number % DUPLICATE_EVERY == 0:
+            reprint = box
+            if number % (2 * DUPLICATE_EVERY) == 0:
+                words = reprint.split(" ")
+                words[5] = words[40] = "variation"
+                reprint = " ".join(words)
+            body = "Summary.\n" + reprint
+        pages.append(
+            f"{title} - Chapter {1 + (number - 1) // 20}\n{body}\n"
+            f"Page {number}\n(c) 2024 Example Press. All rights reserved."
+        )
+    return pages
+
+
+# Write a PDF with one page per string in pages
+def write_pdf(path, pages):
+    count = len(pages)
+    font_id = 3 + 2 * count
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(" ".join(f"{3 + 2 * i} 0 R" for i in range(count)), count),
+    ]
+    for i, text in enumerate(pages):
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> >>"
+        )
+        stream = "BT /F1 10 Tf 12 TL 40 760 Td " + " ".join(
+            f"({_escape(line)}) Tj T*" for line in text.split("\n")
+        ) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    with open(path, "w", encoding="latin-1") as f:
+        f.write(out)
+
+
+# Create (or reuse) the named fixture in directory and return its path
+def make_fixture(directory, name, pages=None, seed=0, boilerplate=False):
+    pages = FIXTURE_SIZES[name] if pages is None else pages
+    path = os.path.join(directory, f"{name}-{pages}p-s{seed}{'-bp' if boilerplate else ''}.pdf")
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        rng = random.Random(f"{name}-{seed}")
+        if boilerplate:
+            texts = boilerplate_pages(rng, pages, f"Course Pack {seed + 1}")
+        else:
+            texts = [synthetic_page_text(rng) for _ in range(pages)]
+        write_pdf(path, texts)
+    return path
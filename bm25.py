@@ -0,0 +1,172 @@
+"""
+In-process BM25 index over document chunks.
+
+The index built at ingest time is stored next to the FAISS index as a CSR
+postings matrix (one .npy array each for term offsets, chunk rows and term
+frequencies, plus the chunk lengths) and a JSON file with the vocabulary and
+docstore ids. Like the vectors, the arrays can be opened memory-mapped and
+shared between sessions.
+
+That base is never modified. Chunks added later go into a small in-memory
+delta with the same scoring, and removed chunks are masked out, so a
+session-private copy (`copy()`) shares the base and only owns its changes.
+"""
+import json
+import os
+import re
+from collections import Counter
+
+import numpy as np
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+VOCAB_FILE = "bm25.json"
+OFFSETS_FILE = "bm25_offsets.npy"
+ROWS_FILE = "bm25_rows.npy"
+TFS_FILE = "bm25_tfs.npy"
+LENGTHS_FILE = "bm25_lengths.npy"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text):
+    return [
+        token for token in _TOKEN.findall(text.lower())
+        if token not in STOPWORDS and (len(token) > 1 or token.isdigit())
+    ]
+
+
+class BM25Index:
+    def __init__(self, vocab, offsets, rows, tfs, lengths, ids):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.rows = rows
+        self.tfs = tfs
+        self.ids = list(ids)
+        self._base_count = len(lengths)
+        self._lengths = [np.asarray(lengths, dtype=np.float32)]
+        self._delta = {}  # term -> {row: tf} for chunks added after the base was built
+        self._deleted = np.zeros(len(self.ids), dtype=bool)
+        self._rows_by_id = {doc_id: row for row, doc_id in enumerate(self.ids)}
+
+    # Build from parallel lists of docstore ids and chunk texts
+    @classmethod
+    def build(cls, ids, texts):
+        postings = {}
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[row] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((row, tf))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for term_id, term in enumerate(terms):
+            offsets[term_id + 1] = offsets[term_id] + len(postings[term])
+        rows = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for term_id, term in enumerate(terms):
+            start, end = offsets[term_id], offsets[term_id + 1]
+            rows[start:end], tfs[start:end] = zip(*postings[term])
+        return cls({term: term_id for term_id, term in enumerate(terms)}, offsets, rows, tfs, lengths, ids)
+
+    def save(self, path):
+        if self._delta or self._deleted.any():
+            raise ValueError("Only a freshly built BM25 index can be saved")
+        os.makedirs(path, exist_ok=True)
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(path, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"terms": terms, "ids": self.ids}, f)
+        np.save(os.path.join(path, OFFSETS_FILE), self.offsets)
+        np.save(os.path.join(path, ROWS_FILE), self.rows)
+        np.save(os.path.join(path, TFS_FILE), self.tfs)
+        np.save(os.path.join(path, LENGTHS_FILE), self._lengths[0])
+
+    @classmethod
+    def load(cls, path, memory_map=True):
+        mmap_mode = "r" if memory_map else None
+        with open(os.path.join(path, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        return cls(
+            {term: term_id for term_id, term in enumerate(vocab["terms"])},
+            np.load(os.path.join(path, OFFSETS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, ROWS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, TFS_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(path, LENGTHS_FILE), mmap_mode=mmap_mode),
+            vocab["ids"],
+        )
+
+    # A copy that shares the (read-only) base and owns its own additions and removals
+    def copy(self):
+        clone = BM25Index.__new__(BM25Index)
+        clone.__dict__.update(self.__dict__)
+        clone.ids = list(self.ids)
+        clone._lengths = list(self._lengths)
+        clone._delta = {term: dict(postings) for term, postings in self._delta.items()}
+        clone._deleted = self._deleted.copy()
+        clone._rows_by_id = dict(self._rows_by_id)
+        return clone
+
+    def __len__(self):
+        return len(self.ids) - int(self._deleted.sum())
+
+    def add(self, ids, texts):
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for i, (doc_id, text) in enumerate(zip(ids, texts)):
+            row = len(self.ids)
+            self.ids.append(doc_id)
+            self._rows_by_id[doc_id] = row
+            counts = Counter(tokenize(text))
+            lengths[i] = sum(counts.values())
+            for term, tf in counts.items():
+                self._delta.setdefault(term, {})[row] = tf
+        self._lengths.append(lengths)
+        self._deleted = np.concatenate([self._deleted, np.zeros(len(texts), dtype=bool)])
+
+    def remove(self, ids):
+        for doc_id in ids:
+            row = self._rows_by_id.pop(doc_id, None)
+            if row is not None:
+                self._deleted[row] = True
+
+    def _postings(self, term):
+        rows = np.empty(0, dtype=np.int32)
+        tfs = np.empty(0, dtype=np.float32)
+        term_id = self.vocab.get(term)
+        if term_id is not None:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            rows, tfs = np.asarray(self.rows[start:end]), np.asarray(self.tfs[start:end])
+        delta = self._delta.get(term)
+        if delta:
+            rows = np.concatenate([rows, np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))])
+            tfs = np.concatenate([tfs, np.fromiter(delta.values(), dtype=np.float32, count=len(delta))])
+        keep = ~self._deleted[rows]
+        return rows[keep], tfs[keep]
+
+    # Top-k (docstore id, score) pairs for a free-text query
+    def search(self, query, k=5):
+        terms = set(tokenize(query))
+        if not terms or not len(self):
+            return []
+        lengths = np.concatenate(self._lengths) if len(self._lengths) > 1 else np.asarray(self._lengths[0])
+        alive = len(self)
+        average_length = float(lengths[~self._deleted].sum()) / alive or 1.0
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in terms:
+            rows, tfs = self._postings(term)
+            if not len(rows):
+                continue
+            idf = np.log(1 + (alive - len(rows) + 0.5) / (len(rows) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[rows] / average_length)
+            scores[rows] += idf * tfs * (BM25_K1 + 1) / (tfs + norm)
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(self.ids[row], float(scores[row])) for row in candidates]
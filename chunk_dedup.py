@@ -0,0 +1,177 @@
+"""
+Ingest-time removal of boilerplate and duplicate chunks.
+
+Textbook PDFs repeat running headers, footers, page numbers and copyright
+lines on every page, and often reprint the same definitions, exercise boxes
+or whole pages. ingest.split_pages runs a ChunkDeduplicator around the
+splitter:
+
+    boilerplate  before splitting, a line in the first or last EDGE_LINES
+                 lines of a page is dropped once the same line (case, spacing
+                 and digits normalized, so "Page 12" matches "Page 13") has
+                 been at the edge of BOILERPLATE_MIN_PAGES pages of that file
+    exact        after splitting, chunks whose normalized text was already
+                 kept from the same file are dropped
+    near         MinHash signatures over word shingles, bucketed with LSH;
+                 a chunk whose estimated Jaccard similarity to a chunk kept
+                 from the same file reaches NEAR_DUPLICATE_THRESHOLD is dropped
+
+Like boilerplate, duplicates are only looked for within a file: a passage
+two uploads share stays in both, so removing one of them from a session
+(session_corpus) never takes the other's copy with it.
+
+Every decision depends only on what came before in (file, page) order, so
+feeding pages in one batch (ingest.build_index) or in many as they are
+parsed (progressive_ingest) keeps exactly the same chunks. Surviving chunks
+keep their source and page metadata; the first occurrence is the one kept.
+The settings are part of the index cache key (ingest.ingest_settings).
+"""
+import hashlib
+import os
+import re
+import zlib
+
+import numpy as np
+from langchain_core.documents import Document
+
+DEDUP_ENABLED = os.getenv("SERA_DEDUP", "1") == "1"
+BOILERPLATE_MIN_PAGES = int(os.getenv("SERA_BOILERPLATE_MIN_PAGES", "3"))
+EDGE_LINES = 3
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("SERA_NEAR_DUPLICATE_THRESHOLD", "0.85"))
+SHINGLE_WORDS = 3
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+_DIGITS = re.compile(r"\d+")
+_SPACE = re.compile(r"\s+")
+
+
+def dedup_settings():
+    if not DEDUP_ENABLED:
+        return None
+    return {
+        "boilerplate_min_pages": BOILERPLATE_MIN_PAGES,
+        "edge_lines": EDGE_LINES,
+        "near_duplicate_threshold": NEAR_DUPLICATE_THRESHOLD,
+        "shingle_words": SHINGLE_WORDS,
+        "minhash_permutations": MINHASH_PERMUTATIONS,
+        "lsh_bands": LSH_BANDS,
+        "scope": "source",
+    }
+
+
+def _normalize_line(line):
+    return _SPACE.sub(" ", _DIGITS.sub("#", line.lower())).strip()
+
+
+def _normalize_text(text):
+    return _SPACE.sub(" ", text.lower()).strip()
+
+
+class ChunkDeduplicator:
+    def __init__(self, boilerplate_min_pages=BOILERPLATE_MIN_PAGES, edge_lines=EDGE_LINES,
+                 threshold=NEAR_DUPLICATE_THRESHOLD, shingle_words=SHINGLE_WORDS,
+                 permutations=MINHASH_PERMUTATIONS, bands=LSH_BANDS, seed=0):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.boilerplate_min_pages = boilerplate_min_pages
+        self.edge_lines = edge_lines
+        self.threshold = threshold
+        self.shingle_words = shingle_words
+        self.bands = bands
+        # Multiply-shift hash functions; uint64 arithmetic wraps, which is what they rely on
+        rng = np.random.default_rng(seed)
+        self._multipliers = rng.integers(1, 2 ** 63, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self._offsets = rng.integers(0, 2 ** 63, size=permutations, dtype=np.uint64)
+        self._edge_counts = {}  # (source, normalized line) -> pages it was at the edge of
+        self._exact = set()  # (source, digest of normalized text) of kept chunks
+        self._buckets = {}  # (source, band, band bytes) -> signatures of kept chunks
+        self.pages = 0
+        self.boilerplate_lines = 0
+        self.boilerplate_chars = 0
+        self.chunks_in = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+    # Pages with their running headers, footers and page numbers removed
+    def clean_pages(self, pages):
+        cleaned = []
+        for page in pages:
+            self.pages += 1
+            source = page.metadata.get("source", "")
+            lines = page.page_content.split("\n")
+            filled = [i for i, line in enumerate(lines) if line.strip()]
+            edges = set(filled[:self.edge_lines] + filled[-self.edge_lines:])
+            dropped = set()
+            for i in sorted(edges):
+                key = (source, _normalize_line(lines[i]))
+                count = self._edge_counts.get(key, 0) + 1
+                self._edge_counts[key] = count
+                if count >= self.boilerplate_min_pages:
+                    dropped.add(i)
+            if not dropped:
+                cleaned.append(page)
+                continue
+            self.boilerplate_lines += len(dropped)
+            self.boilerplate_chars += sum(len(lines[i]) for i in dropped)
+            text = "\n".join(line for i, line in enumerate(lines) if i not in dropped).strip()
+            cleaned.append(Document(page_content=text, metadata=page.metadata))
+        return cleaned
+
+    def _signature(self, text):
+        words = _WORD.findall(text.lower())
+        if len(words) < self.shingle_words:
+            return None
+        shingles = {" ".join(words[i:i + self.shingle_words]) for i in range(len(words) - self.shingle_words + 1)}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+                             dtype=np.uint64, count=len(shingles))
+        values = (self._multipliers[:, None] * hashes[None, :] + self._offsets[:, None]) >> np.uint64(32)
+        return values.min(axis=1)
+
+    def _is_near_duplicate(self, source, signature):
+        rows = len(signature) // self.bands
+        keys = [(source, band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(self.bands)]
+        for key in keys:
+            for kept in self._buckets.get(key, ()):
+                if np.mean(kept == signature) >= self.threshold:
+                    return True
+        for key in keys:
+            self._buckets.setdefault(key, []).append(signature)
+        return False
+
+    # Chunks that are neither exact nor near duplicates of a chunk kept earlier from the same file
+    def filter_chunks(self, chunks):
+        kept = []
+        for chunk in chunks:
+            self.chunks_in += 1
+            source = chunk.metadata.get("source", "")
+            key = (source, hashlib.sha1(_normalize_text(chunk.page_content).encode("utf-8")).digest())
+            if key in self._exact:
+                self.exact_duplicates += 1
+                continue
+            self._exact.add(key)
+            signature = self._signature(chunk.page_content)
+            if signature is not None and self._is_near_duplicate(source, signature):
+                self.near_duplicates += 1
+                continue
+            kept.append(chunk)
+        return kept
+
+    def report(self):
+        chunks_out = self.chunks_in - self.exact_duplicates - self.near_duplicates
+        return {
+            "pages": self.pages,
+            "boilerplate_lines": self.boilerplate_lines,
+            "boilerplate_chars": self.boilerplate_chars,
+            "chunks_in": self.chunks_in,
+            "exact_duplicates": self.exact_duplicates,
+            "near_duplicates": self.near_duplicates,
+            "chunks_out": chunks_out,
+            "dropped_fraction": 1 - chunks_out / self.chunks_in if self.chunks_in else 0.0,
+        }
+
+
+# A deduplicator with the configured settings, or None when SERA_DEDUP=0
+def create_deduplicator():
+    return ChunkDeduplicator() if DEDUP_ENABLED else None
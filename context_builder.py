@@ -0,0 +1,199 @@
+"""
+Token-budgeted assembly of the retrieved context.
+
+The retriever returns RETRIEVER_K chunks, and the splitter overlaps
+neighbouring chunks by up to CHUNK_OVERLAP characters, so a question about
+one passage often gets the same sentences two or three times. Stuffed into
+the prompt verbatim, all of it is paid for in Gemini latency and tokens.
+ContextBuilder sits between the retriever and the prompt:
+
+    merge     chunks from the same source and page are merged: one
+              contained in another is dropped, and a chunk whose start
+              overlaps another's end (at least MIN_OVERLAP_CHARS) is joined
+              onto it; what remains of a page becomes one passage
+    spans     a line (at least MIN_SPAN_CHARS, normalized) that already
+              appeared in an earlier passage is dropped
+    budget    opt-in (SERA_CONTEXT_TOKENS): passages are packed in
+              retrieval order into CONTEXT_TOKEN_BUDGET tokens (estimated
+              at CHARS_PER_TOKEN); the passage that crosses the budget is
+              cut at a sentence or word boundary, the rest are left out
+
+Passages keep the source and page metadata of their best-ranked chunk. The
+savings are logged per query and recorded as a "context" span (see tracing).
+"""
+import logging
+import math
+import os
+import re
+import time
+from collections import namedtuple
+
+from langchain_core.documents import Document
+
+from tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_MERGE = os.getenv("SERA_CONTEXT_MERGE", "1") == "1"
+# Tokens of retrieved context per question; 0 (the default) = merge and dedup only, no limit.
+# Set it well above RETRIEVER_K * CHUNK_SIZE / CHARS_PER_TOKEN, or most questions lose context.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("SERA_CONTEXT_TOKENS", "0"))
+# Rough Gemini tokenization of English prose
+CHARS_PER_TOKEN = 4
+MIN_OVERLAP_CHARS = 20
+MIN_SPAN_CHARS = 40
+# A passage cut to fit the budget keeps at least this much, or is left out
+MIN_PASSAGE_CHARS = 200
+# What create_stuff_documents_chain puts between documents
+DOCUMENT_SEPARATOR = "\n\n"
+
+ContextStats = namedtuple(
+    "ContextStats",
+    ["chunks", "passages", "tokens_in", "tokens_out", "overlap_chars", "duplicate_chars", "cut_chars"],
+)
+
+_SPACE = re.compile(r"\s+")
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _context_tokens(texts):
+    return estimate_tokens(DOCUMENT_SEPARATOR.join(texts))
+
+
+# Length of the longest suffix of left that is a prefix of right, or 0 if shorter than min_chars
+def _overlap(left, right, min_chars=MIN_OVERLAP_CHARS):
+    probe = right[:min_chars]
+    if len(probe) < min_chars:
+        return 0
+    position = left.find(probe, max(0, len(left) - len(right)))
+    while position != -1:
+        if right.startswith(left[position:]):
+            return len(left) - position
+        position = left.find(probe, position + 1)
+    return 0
+
+
+# Cut text to at most limit characters, at the last sentence end or else the last space
+def _cut(text, limit):
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    sentence_ends = [match.end() for match in _SENTENCE_END.finditer(head)]
+    if sentence_ends and sentence_ends[-1] >= limit // 2:
+        return head[:sentence_ends[-1]]
+    space = head.rfind(" ")
+    return head[:space] if space >= limit // 2 else head
+
+
+class ContextBuilder:
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, min_overlap_chars=MIN_OVERLAP_CHARS,
+                 min_span_chars=MIN_SPAN_CHARS, min_passage_chars=MIN_PASSAGE_CHARS):
+        self.token_budget = token_budget
+        self.min_overlap_chars = min_overlap_chars
+        self.min_span_chars = min_span_chars
+        self.min_passage_chars = min_passage_chars
+
+    # Merge one page's chunks (in retrieval order) into as few pieces as possible
+    def _merge_page(self, texts):
+        pieces = []
+        saved = 0
+        for text in texts:
+            if any(text in piece for piece in pieces):
+                saved += len(text)
+                continue
+            saved += sum(len(piece) for piece in pieces if piece in text)
+            pieces = [piece for piece in pieces if piece not in text]
+            pieces.append(text)
+        merged = True
+        while merged:
+            merged = False
+            for i, left in enumerate(pieces):
+                for j, right in enumerate(pieces):
+                    overlap = _overlap(left, right, self.min_overlap_chars) if i != j else 0
+                    if overlap:
+                        saved += overlap
+                        pieces[i] = left + right[overlap:]
+                        del pieces[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return "\n".join(pieces), saved
+
+    # Drop lines already seen in an earlier passage; seen is updated
+    def _drop_seen_lines(self, text, seen):
+        kept = []
+        dropped = 0
+        for line in text.split("\n"):
+            key = _SPACE.sub(" ", line.lower()).strip()
+            if len(key) >= self.min_span_chars:
+                if key in seen:
+                    dropped += len(line) + 1
+                    continue
+                seen.add(key)
+            kept.append(line)
+        return "\n".join(kept).strip(), dropped
+
+    # Returns (passages, ContextStats) for documents in retrieval order
+    def assemble(self, documents):
+        pages = {}  # (source, page) -> [metadata of the best-ranked chunk, texts]
+        for document in documents:
+            key = (document.metadata.get("source"), document.metadata.get("page"))
+            pages.setdefault(key, [document.metadata, []])[1].append(document.page_content)
+
+        overlap_chars = duplicate_chars = cut_chars = 0
+        seen = set()
+        passages = []
+        used = 0
+        for metadata, texts in pages.values():
+            text, saved = self._merge_page(texts)
+            overlap_chars += saved
+            text, dropped = self._drop_seen_lines(text, seen)
+            duplicate_chars += dropped
+            if not text:
+                continue
+            if self.token_budget:
+                separator = len(DOCUMENT_SEPARATOR) if passages else 0
+                room = (self.token_budget - used) * CHARS_PER_TOKEN - separator
+                if len(text) > room:
+                    cut = _cut(text, room) if room >= self.min_passage_chars or not passages else ""
+                    cut_chars += len(text) - len(cut)
+                    text = cut
+                if not text:
+                    continue
+                used += estimate_tokens(text) + (1 if passages else 0)
+            passages.append(Document(page_content=text, metadata={**metadata, "chunks": len(texts)}))
+
+        stats = ContextStats(
+            len(documents), len(passages),
+            _context_tokens([document.page_content for document in documents]),
+            _context_tokens([passage.page_content for passage in passages]),
+            overlap_chars, duplicate_chars, cut_chars,
+        )
+        return passages, stats
+
+    # For the chain: assemble, log the savings and record a "context" span
+    def build(self, documents):
+        started = time.perf_counter()
+        passages, stats = self.assemble(documents)
+        seconds = time.perf_counter() - started
+        saved = stats.tokens_in - stats.tokens_out
+        logger.info(
+            "Context: %d chunks -> %d passages, ~%d -> ~%d tokens (%d saved, %.0f%%; overlap %d, duplicate %d, "
+            "over budget %d chars)",
+            stats.chunks, stats.passages, stats.tokens_in, stats.tokens_out, saved,
+            100 * saved / stats.tokens_in if stats.tokens_in else 0, stats.overlap_chars, stats.duplicate_chars,
+            stats.cut_chars,
+        )
+        record_span("context", seconds, chunks=stats.chunks, passages=stats.passages, tokens_in=stats.tokens_in,
+                    tokens_out=stats.tokens_out, tokens_saved=saved)
+        return passages
+
+
+# A builder with the configured budget, or None when SERA_CONTEXT_MERGE=0
+def create_context_builder():
+    return ContextBuilder() if CONTEXT_MERGE else None
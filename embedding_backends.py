@@ -0,0 +1,146 @@
+"""
+Embedding backends, selected with SERA_EMBEDDING_BACKEND.
+
+    gemini                 GoogleGenerativeAIEmbeddings (remote, the default)
+    hashed                 local hashed n-gram projection: word unigrams and
+                           bigrams plus character trigrams, feature-hashed
+                           with a sign bit into a fixed number of dimensions,
+                           sublinear TF weighting, L2-normalized. Pure NumPy,
+                           no model download, works offline
+    sentence-transformers  a small local transformer (all-MiniLM-L6-v2 by
+                           default), loaded once per process; needs the
+                           optional sentence-transformers package
+
+Local backends set `local = True`, which makes the embedding scheduler skip
+its API rate limiting. Every backend has its own model name, so embedding
+and index cache entries from different backends never mix.
+"""
+import os
+import re
+import threading
+import zlib
+from collections import Counter
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_BACKEND = os.getenv("SERA_EMBEDDING_BACKEND", "gemini")
+GEMINI_EMBEDDING_MODEL = "models/embedding-001"
+HASHED_EMBEDDING_DIM = int(os.getenv("SERA_HASHED_EMBEDDING_DIM", "768"))
+LOCAL_EMBEDDING_MODEL = os.getenv("SERA_LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+
+# Remember the bucket of this many distinct features across calls
+FEATURE_CACHE_SIZE = 500_000
+
+EMBEDDING_BACKENDS = ("gemini", "hashed", "sentence-transformers")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+class HashedNgramEmbeddings(Embeddings):
+    local = True
+
+    def __init__(self, dim=HASHED_EMBEDDING_DIM):
+        self.dim = dim
+        self.model_name = f"hashed-ngram-v1-{dim}"
+        self._buckets = {}  # feature -> signed bucket (bucket + 1, negated for a minus sign)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _features(text):
+        words = _WORD.findall(text.lower())
+        features = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        for word in words:
+            padded = f"<{word}>"
+            features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def _signed_bucket(self, feature):
+        code = self._buckets.get(feature)
+        if code is None:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            code = (digest % self.dim) + 1
+            if digest >> 31:
+                code = -code
+            with self._lock:
+                if len(self._buckets) >= FEATURE_CACHE_SIZE:
+                    self._buckets.clear()
+                self._buckets[feature] = code
+        return code
+
+    # Vectorized: per-text feature counts become (row, bucket, weight) triples scattered in one go
+    def _embed(self, texts):
+        rows, codes, counts = [], [], []
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            rows.extend([row] * len(features))
+            codes.extend(self._signed_bucket(feature) for feature in features)
+            counts.extend(features.values())
+
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if codes:
+            codes = np.asarray(codes, dtype=np.int64)
+            weights = (1.0 + np.log(np.asarray(counts, dtype=np.float32))) * np.sign(codes)
+            np.add.at(matrix, (np.asarray(rows), np.abs(codes) - 1), weights)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms > 0, norms, 1.0)
+        return matrix
+
+    def embed_documents(self, texts):
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text):
+        return self._embed([text])[0].tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    local = True
+
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=64):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "SERA_EMBEDDING_BACKEND=sentence-transformers needs the sentence-transformers package "
+                "(pip install sentence-transformers)"
+            ) from e
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def embed_documents(self, texts):
+        vectors = self.model.encode(
+            list(texts), batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        )
+        return vectors.astype(np.float32).tolist()
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# Create the configured backend, returning (embeddings, model_name)
+def create_embeddings(backend=None):
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "gemini":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+        return GoogleGenerativeAIEmbeddings(model=GEMINI_EMBEDDING_MODEL), GEMINI_EMBEDDING_MODEL
+    if backend == "hashed":
+        embeddings = HashedNgramEmbeddings()
+        return embeddings, embeddings.model_name
+    if backend == "sentence-transformers":
+        embeddings = SentenceTransformerEmbeddings()
+        return embeddings, embeddings.model_name
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
+
+
+# Model name the configured backend will report, without loading it
+def embedding_model_name(backend=None):
+    backend = backend or EMBEDDING_BACKEND
+    if backend == "gemini":
+        return GEMINI_EMBEDDING_MODEL
+    if backend == "hashed":
+        return f"hashed-ngram-v1-{HASHED_EMBEDDING_DIM}"
+    if backend == "sentence-transformers":
+        return LOCAL_EMBEDDING_MODEL
+    raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {EMBEDDING_BACKENDS}")
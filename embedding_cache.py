@@ -0,0 +1,144 @@
+"""
+Persistent per-chunk embedding cache.
+
+Wraps any LangChain embeddings object and stores every vector in SQLite as a
+float32 blob keyed by (embedding model, SHA-256 of the chunk text). Chunks
+that were embedded before, by any session and for any document set, are
+served from disk; only unseen chunks are sent to the underlying API.
+Recent query embeddings are also kept in a small in-memory LRU, so a question
+embedded once per turn (answer cache lookup, then retrieval) costs one call.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_PATH = os.getenv(
+    "SERA_EMBEDDING_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "sera", "embeddings.sqlite3"),
+)
+QUERY_CACHE_SIZE = 256
+
+
+def _text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash))"
+        )
+        self._conn.commit()
+
+    # Return {text_hash: vector} for the hashes that are already stored
+    def get_many(self, model, text_hashes):
+        found = {}
+        unique = list(dict.fromkeys(text_hashes))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            with self._lock:
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+            for text_hash, blob in rows:
+                found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return found
+
+    def put_many(self, model, items):
+        rows = [
+            (model, text_hash, np.asarray(vector, dtype=np.float32).tobytes())
+            for text_hash, vector in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector) VALUES (?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def count(self, model=None):
+        with self._lock:
+            if model is None:
+                return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)
+            ).fetchone()[0]
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, underlying, model_name, store):
+        self.underlying = underlying
+        self.model_name = model_name
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._queries = OrderedDict()
+
+    # Local backends (embedding_backends) need no rate limiting
+    @property
+    def local(self):
+        return getattr(self.underlying, "local", False)
+
+    def embed_documents(self, texts):
+        hashes = [_text_hash(text) for text in texts]
+        cached = self.store.get_many(self.model_name, hashes)
+
+        # Embed each unseen text once, even if it repeats within the batch
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            # Round through float32 so fresh and cached vectors are identical
+            vectors = np.asarray(vectors, dtype=np.float32).tolist()
+            new_items = list(zip(missing.keys(), vectors))
+            self.store.put_many(self.model_name, new_items)
+            cached.update(new_items)
+
+        with self._stats_lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [list(cached[text_hash]) for text_hash in hashes]
+
+    # Queries are embedded with a different task type, so they bypass the store
+    def embed_query(self, text):
+        with self._stats_lock:
+            if text in self._queries:
+                self._queries.move_to_end(text)
+                return self._queries[text]
+        vector = self.underlying.embed_query(text)
+        with self._stats_lock:
+            self._queries[text] = vector
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+        return vector
+
+    def stats(self):
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,204 @@
+"""
+Batched, concurrent, rate-limited embedding of document chunks.
+
+Chunks are grouped into batches that are embedded concurrently on a thread
+pool. Every request first takes a token from a shared token bucket, and
+failed batches (429s, timeouts, transient errors) are retried with
+exponential backoff and full jitter; anything else (a bad API key, an invalid
+request) fails the build at once. Finished batches are appended to the
+FAISS index in submission order as soon as they land, so the index grows
+incrementally and the result is identical to a sequential build. Local
+(CPU) embedding backends skip the token bucket and use larger batches. Approximate
+index types (index_backend) need the full corpus to train, so those are
+built once every batch has landed.
+"""
+import logging
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from tracing import record_span, span
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = int(os.getenv("SERA_EMBED_BATCH_SIZE", "64"))
+EMBED_CONCURRENCY = int(os.getenv("SERA_EMBED_CONCURRENCY", "4"))
+EMBED_REQUESTS_PER_SECOND = float(os.getenv("SERA_EMBED_RPS", "10"))
+EMBED_MAX_RETRIES = int(os.getenv("SERA_EMBED_MAX_RETRIES", "5"))
+LOCAL_EMBED_BATCH_SIZE = 256
+
+# HTTP statuses, and exception class names (Google API core, requests, httpx),
+# worth retrying; anything else is raised on the first failure
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError", "BadGateway",
+    "GatewayTimeout", "DeadlineExceeded", "Aborted", "ConnectionError", "ConnectError", "Timeout",
+    "ConnectTimeout", "ReadTimeout", "TimeoutException",
+}
+# Google API errors read "429 Resource has been exhausted ..."
+_STATUS_PREFIX = re.compile(r"^(\d{3}) ")
+
+BatchMetric = namedtuple("BatchMetric", ["index", "size", "latency", "attempts"])
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    # Block until a token is available, then take it
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+# Whether an embedding error (or one it was raised from) is a rate limit, server error or timeout
+def is_transient_error(error):
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in TRANSIENT_ERROR_NAMES:
+            return True
+        status = getattr(error, "status_code", None) or getattr(error, "code", None)
+        if isinstance(status, int) and status in TRANSIENT_STATUSES:
+            return True
+        match = _STATUS_PREFIX.match(str(error))
+        if match and int(match.group(1)) in TRANSIENT_STATUSES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+class EmbeddingScheduler:
+    def __init__(self, embeddings, batch_size=None, max_concurrency=EMBED_CONCURRENCY,
+                 requests_per_second=EMBED_REQUESTS_PER_SECOND, max_retries=EMBED_MAX_RETRIES,
+                 base_backoff=1.0, max_backoff=30.0):
+        local = getattr(embeddings, "local", False)
+        self.embeddings = embeddings
+        self.batch_size = batch_size or (LOCAL_EMBED_BATCH_SIZE if local else EMBED_BATCH_SIZE)
+        self.max_concurrency = max_concurrency
+        self.bucket = None if local else TokenBucket(requests_per_second, capacity=max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.metrics = []
+        self.elapsed = 0.0
+
+    def _embed_batch(self, index, texts):
+        attempt = 0
+        while True:
+            attempt += 1
+            if self.bucket is not None:
+                self.bucket.acquire()
+            started = time.perf_counter()
+            try:
+                vectors = self.embeddings.embed_documents(texts)
+            except Exception as e:
+                if attempt > self.max_retries or not is_transient_error(e):
+                    raise
+                delay = random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1)))
+                logger.warning("Embedding batch %d failed (attempt %d), retrying in %.1fs: %s",
+                               index, attempt, delay, e)
+                time.sleep(delay)
+                continue
+            latency = time.perf_counter() - started
+            logger.debug("Embedding batch %d: %d chunks in %.3fs", index, len(texts), latency)
+            return vectors, BatchMetric(index, len(texts), latency, attempt)
+
+    # Yield (start_offset, vectors) per batch, in order, as soon as each is ready
+    def embed_batches(self, texts):
+        self.metrics = []
+        started = time.perf_counter()
+        consumer_seconds = 0.0
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as pool:
+            futures = [pool.submit(self._embed_batch, index, batch) for index, batch in enumerate(batches)]
+            try:
+                for index, future in enumerate(futures):
+                    vectors, metric = future.result()
+                    self.metrics.append(metric)
+                    handed_over = time.perf_counter()
+                    yield index * self.batch_size, vectors
+                    consumer_seconds += time.perf_counter() - handed_over
+            finally:
+                for future in futures:
+                    future.cancel()
+                self.elapsed = time.perf_counter() - started
+                # Time the caller spent on each batch (e.g. adding it to FAISS) is its own stage
+                record_span("embed", self.elapsed - consumer_seconds, chunks=sum(m.size for m in self.metrics),
+                            batches=len(self.metrics), retries=sum(m.attempts - 1 for m in self.metrics))
+
+    # Embed documents and build the FAISS index incrementally as batches land
+    # index_type=None follows SERA_INDEX_TYPE (see index_backend); ValueError if documents is empty
+    def build_faiss(self, documents, on_progress=None, index_type=None):
+        from langchain_community.vectorstores import FAISS
+
+        from index_backend import build_vectorstore, choose_index_type, index_type_of
+
+        if not documents:
+            raise ValueError("No documents to index")
+        texts = [doc.page_content for doc in documents]
+        metadatas = [doc.metadata for doc in documents]
+        if choose_index_type(len(texts), index_type) != "flat":
+            # Approximate indexes are trained on the whole corpus, so collect every vector first
+            all_vectors = [None] * len(texts)
+            for start, vectors in self.embed_batches(texts):
+                all_vectors[start:start + len(vectors)] = vectors
+                if on_progress is not None:
+                    on_progress(start + len(vectors), len(texts))
+            with span("faiss_build", chunks=len(texts)) as trace:
+                vectorstore = build_vectorstore(texts, all_vectors, metadatas, self.embeddings, index_type)
+                trace.set(index_type=index_type_of(vectorstore.index))
+            return vectorstore
+
+        vectorstore = None
+        build_seconds = 0.0
+        for start, vectors in self.embed_batches(texts):
+            end = start + len(vectors)
+            text_embeddings = list(zip(texts[start:end], vectors))
+            added = time.perf_counter()
+            if vectorstore is None:
+                vectorstore = FAISS.from_embeddings(text_embeddings, self.embeddings,
+                                                    metadatas=metadatas[start:end])
+            else:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas[start:end])
+            build_seconds += time.perf_counter() - added
+            if on_progress is not None:
+                on_progress(end, len(texts))
+        record_span("faiss_build", build_seconds, chunks=len(texts), index_type="flat")
+        return vectorstore
+
+    def report(self):
+        latencies = [metric.latency for metric in self.metrics]
+        chunks = sum(metric.size for metric in self.metrics)
+        return {
+            "batches": len(self.metrics),
+            "chunks": chunks,
+            "seconds": self.elapsed,
+            "chunks_per_second": chunks / self.elapsed if self.elapsed else 0.0,
+            "batch_latency_p50": _percentile(latencies, 0.5),
+            "batch_latency_p95": _percentile(latencies, 0.95),
+            "retries": sum(metric.attempts - 1 for metric in self.metrics),
+        }
@@ -0,0 +1,147 @@
+"""
+Hybrid BM25 + vector retrieval with a deadline on the query embedding.
+
+The query embedding (a remote call) is started first; while it is in flight
+the BM25 index is searched locally. If the embedding arrives within the
+deadline, the lexical and vector rankings are merged with reciprocal rank
+fusion (each chunk scores sum(1 / (RRF_K + rank)) over the lists it appears
+in), which lets exact terms such as formula names and glossary entries
+surface even when their embeddings are unremarkable. If the embedding is
+late or fails, the lexical results are returned on their own, so answers keep
+flowing while the embedding API is slow or down.
+
+QueryEmbedder shares one in-flight embedding per question between callers
+(the answer cache lookup, then the retriever), and the deadline counts from
+when the first caller started it.
+
+Without a lexical index the retriever is vector-only. With `lock` set, the
+index lookups (but not the wait for the query embedding) hold that lock, for
+indexes that are still being appended to (see progressive_ingest).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import nullcontext
+from typing import Any
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logger = logging.getLogger(__name__)
+
+RETRIEVAL_MODE = os.getenv("SERA_RETRIEVAL", "hybrid")  # "hybrid" or "vector"
+EMBED_DEADLINE_SECONDS = float(os.getenv("SERA_EMBED_DEADLINE_MS", "2000")) / 1000
+RRF_K = 60
+# Candidates taken from each ranking before fusion
+FUSION_FETCH_K = 20
+
+# How queries were answered, across all sessions
+retrieval_stats = {"hybrid": 0, "lexical_only": 0}
+_stats_lock = threading.Lock()
+
+
+# Merge ranked lists of ids with reciprocal rank fusion, best first
+def reciprocal_rank_fusion(rankings, rrf_k=RRF_K):
+    scores = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (rrf_k + rank + 1)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+class QueryEmbedder:
+    def __init__(self, embed_query, deadline_seconds=EMBED_DEADLINE_SECONDS, max_workers=8):
+        self.embed_query = embed_query
+        self.deadline = deadline_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="query-embed")
+        self._inflight = {}  # text -> (future, started)
+        self._lock = threading.Lock()
+        self.timeouts = 0
+        self.failures = 0
+
+    def _start(self, text):
+        with self._lock:
+            pending = self._inflight.get(text)
+            if pending is None:
+                future = self._pool.submit(self.embed_query, text)
+                pending = self._inflight[text] = (future, time.monotonic())
+                future.add_done_callback(lambda _: self._forget(text, future))
+            return pending
+
+    def _forget(self, text, future):
+        with self._lock:
+            if self._inflight.get(text, (None,))[0] is future:
+                del self._inflight[text]
+
+    # The query's embedding, or TimeoutError once the deadline since the first request has passed
+    def embed(self, text):
+        future, started = self._start(text)
+        remaining = max(0.0, self.deadline - (time.monotonic() - started))
+        try:
+            return future.result(timeout=remaining)
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise TimeoutError(f"Query embedding took longer than {self.deadline:.1f}s")
+        except Exception:
+            with self._lock:
+                self.failures += 1
+            raise
+
+    # Start embedding in the background without waiting
+    def prefetch(self, text):
+        self._start(text)
+
+
+class HybridRetriever(BaseRetriever):
+    vectorstore: Any
+    lexical_index: Any
+    query_embedder: Any
+    k: int = 5
+    fetch_k: int = FUSION_FETCH_K
+    lock: Any = None
+
+    def _count(self, name):
+        with _stats_lock:
+            retrieval_stats[name] += 1
+
+    def _guard(self):
+        return self.lock if self.lock is not None else nullcontext()
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> list[Document]:
+        self.query_embedder.prefetch(query)
+        lexical = []
+        if self.lexical_index is not None:
+            with self._guard():
+                lexical = [doc_id for doc_id, _ in self.lexical_index.search(query, self.fetch_k)]
+
+        try:
+            vector = self.query_embedder.embed(query)
+        except Exception as e:
+            if self.lexical_index is None:
+                raise
+            logger.warning("Answering from the lexical index only: %s", e)
+            self._count("lexical_only")
+            with self._guard():
+                return self._documents(lexical[:self.k])
+
+        with self._guard():
+            semantic = [
+                doc.id for doc, _ in self.vectorstore.similarity_search_with_score_by_vector(vector, k=self.fetch_k)
+            ]
+            if self.lexical_index is None:
+                return self._documents(semantic[:self.k])
+            self._count("hybrid")
+            return self._documents(reciprocal_rank_fusion([semantic, lexical])[:self.k])
+
+    def _documents(self, ids):
+        documents = []
+        for doc_id in ids:
+            doc = self.vectorstore.docstore.search(doc_id)
+            if isinstance(doc, Document):
+                documents.append(doc)
+        return documents
@@ -0,0 +1,183 @@
+"""
+FAISS index types for large corpora.
+
+Small corpora keep LangChain's exact flat L2 index. Larger ones switch to
+approximate indexes whose search cost grows sub-linearly:
+
+    hnsw    HNSW graph over float16 scalar-quantized vectors (half the vector
+            memory of flat plus the graph links; recall is usually > 0.99
+            at the default efSearch)
+    ivfpq   inverted file with product-quantized codes; coarse quantizer and
+            codebooks are trained on the corpus itself. PQ alone loses too
+            much recall on clustered embeddings, so candidates are re-ranked
+            against 8-bit scalar-quantized copies of the vectors (about 3.5x
+            smaller than flat at 768 dims, PQ codes included)
+
+SERA_INDEX_TYPE picks one explicitly or "auto" chooses by chunk count. Search
+knobs (efSearch, nprobe, re-rank factor) are applied again whenever an index is loaded, so
+they can be tuned without rebuilding. Use benchmarks/eval_index_recall.py to
+measure recall@k against the flat baseline before changing the thresholds.
+"""
+import logging
+import math
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPE = os.getenv("SERA_INDEX_TYPE", "auto")  # auto, flat, hnsw or ivfpq
+INDEX_HNSW_MIN_CHUNKS = int(os.getenv("SERA_INDEX_HNSW_MIN_CHUNKS", "10000"))
+INDEX_IVFPQ_MIN_CHUNKS = int(os.getenv("SERA_INDEX_IVFPQ_MIN_CHUNKS", "200000"))
+HNSW_M = int(os.getenv("SERA_INDEX_HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("SERA_INDEX_HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("SERA_INDEX_HNSW_EF_SEARCH", "64"))
+IVF_NPROBE = int(os.getenv("SERA_INDEX_IVF_NPROBE", "16"))
+# Candidates re-ranked per result; 0 builds plain IVF-PQ without the SQ8 copy
+REFINE_K_FACTOR = int(os.getenv("SERA_INDEX_REFINE_K_FACTOR", "16"))
+PQ_MAX_BITS = 8
+# Below this many vectors the quantizers can't be trained meaningfully
+IVFPQ_MIN_TRAINING = 1000
+
+INDEX_TYPES = ("flat", "hnsw", "ivfpq")
+
+
+# Settings that change what gets built; part of the index cache key
+def index_settings():
+    return {
+        "index_type": INDEX_TYPE,
+        "hnsw_min_chunks": INDEX_HNSW_MIN_CHUNKS,
+        "ivfpq_min_chunks": INDEX_IVFPQ_MIN_CHUNKS,
+        "hnsw_m": HNSW_M,
+        "refine": REFINE_K_FACTOR > 0,
+    }
+
+
+# Resolve "auto" (or an explicit type) for a corpus of count chunks
+def choose_index_type(count, index_type=None):
+    index_type = index_type or INDEX_TYPE
+    if index_type == "auto":
+        if count >= INDEX_IVFPQ_MIN_CHUNKS:
+            index_type = "ivfpq"
+        elif count >= INDEX_HNSW_MIN_CHUNKS:
+            index_type = "hnsw"
+        else:
+            index_type = "flat"
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}; expected auto or one of {INDEX_TYPES}")
+    if index_type == "ivfpq" and count < IVFPQ_MIN_TRAINING:
+        logger.info("Only %d chunks; using hnsw instead of ivfpq", count)
+        index_type = "hnsw"
+    return index_type
+
+
+# Number of PQ sub-quantizers: the most that still leaves >= 8 dims each
+def _pq_subquantizers(dim):
+    for m in range(dim // 8, 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+# Bits per PQ code: 8 unless the corpus is too small to train 256 centroids
+def _pq_bits(count):
+    return max(4, min(PQ_MAX_BITS, int(math.log2(max(count, 1) / 39))))
+
+
+def _ivf_lists(count):
+    # ~4*sqrt(n) lists, with enough points per list to train the coarse quantizer
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+# Create an empty (untrained) index of the given type
+def create_index(index_type, dim, count):
+    import faiss
+
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    else:
+        quantizer = faiss.IndexFlatL2(dim)
+        index = faiss.IndexIVFPQ(quantizer, dim, _ivf_lists(count), _pq_subquantizers(dim), _pq_bits(count))
+        if REFINE_K_FACTOR > 0:
+            refine = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit)
+            index = faiss.IndexRefine(index, refine)
+    configure_search(index)
+    return index
+
+
+# The index doing the approximate search, looking through a re-ranking wrapper
+def _base_index(index):
+    import faiss
+
+    if isinstance(index, faiss.IndexRefine):
+        return faiss.downcast_index(index.base_index)
+    return index
+
+
+# Apply search-time knobs; safe to call on any index type
+def configure_search(index, ef_search=None, nprobe=None, k_factor=None):
+    import faiss
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexHNSW):
+        base.hnsw.efSearch = ef_search or HNSW_EF_SEARCH
+    elif isinstance(base, faiss.IndexIVF):
+        base.nprobe = min(nprobe or IVF_NPROBE, base.nlist)
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = k_factor or REFINE_K_FACTOR or 1
+    return index
+
+
+def index_type_of(index):
+    import faiss
+
+    index = _base_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivfpq"
+    return "flat"
+
+
+# Build and train an index over an (n, dim) float32 matrix, without adding it
+def train_index(vectors, index_type=None):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dim = vectors.shape
+    index_type = choose_index_type(count, index_type)
+    index = create_index(index_type, dim, count)
+    if not index.is_trained:
+        if index_type == "ivfpq":
+            # k-means only needs a sample; cap it to keep training time bounded
+            ivf = _base_index(index)
+            sample = min(count, max(ivf.nlist * 64, (1 << ivf.pq.nbits) * 64))
+            rows = np.random.default_rng(0).choice(count, size=sample, replace=False)
+            index.train(vectors[np.sort(rows)])
+        else:
+            index.train(vectors)
+    return index
+
+
+# Stored vectors of an index, decoded (approximate for quantized index types)
+def reconstruct_vectors(index):
+    import faiss
+
+    base = _base_index(index)
+    if isinstance(base, faiss.IndexIVF) and not isinstance(index, faiss.IndexRefine):
+        base.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+# Build a LangChain FAISS vectorstore over precomputed vectors with the chosen index type
+def build_vectorstore(texts, vectors, metadatas, embeddings, index_type=None, ids=None):
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    index = train_index(vectors, index_type)
+    vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vectorstore.add_embeddings(zip(texts, vectors.tolist()), metadatas=metadatas, ids=ids)
+    logger.info("Built %s index over %d chunks", index_type_of(index), len(texts))
+    return vectorstore
@@ -0,0 +1,183 @@
+"""
+Content-addressed on-disk cache for built FAISS indexes.
+
+Each entry lives in its own directory named after a SHA-256 key computed from
+the raw PDF bytes plus every setting that influences the resulting index
+(splitter parameters, embedding model, cache format version). A cache hit
+loads the saved FAISS index and chunk store straight from disk (memory-mapped
+by default, see index_store) instead of re-parsing, re-splitting and
+re-embedding the documents.
+
+Invalidation: entries are never updated in place. Changing the PDFs or any of
+the ingest settings produces a different key, so stale entries are simply no
+longer looked up and age out through LRU eviction once the cache exceeds its
+byte budget. Bump CACHE_FORMAT_VERSION whenever the pipeline changes in a way
+the settings don't capture; `invalidate()` and `clear()` drop entries by hand.
+Removing an entry that sessions still have memory-mapped is safe on POSIX
+systems: the mapped files stay readable until they are unmapped.
+
+index_store (and with it LangChain and FAISS) is imported on first load or
+store, so computing keys stays cheap at app start-up.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+INDEX_CACHE_DIR = os.getenv(
+    "SERA_INDEX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "sera", "indexes"),
+)
+INDEX_CACHE_MAX_BYTES = int(os.getenv("SERA_INDEX_CACHE_MAX_MB", "2048")) * 1024 * 1024
+
+# Bump when the on-disk layout or the ingestion pipeline changes in a way that
+# makes previously cached indexes stale.
+CACHE_FORMAT_VERSION = 3  # 3: chunks carry their file's content digest
+
+META_FILE = "meta.json"
+
+
+def content_digest(buffer):
+    return hashlib.sha256(buffer).hexdigest()
+
+
+# Build a cache key from the PDFs' content digests and the ingest settings
+def cache_key_from_digests(digests, settings):
+    # Per-file digests are sorted so the same bundle uploaded in a different
+    # order still hits the same entry.
+    key = hashlib.sha256()
+    key.update(f"format-v{CACHE_FORMAT_VERSION}\n".encode())
+    key.update(json.dumps(settings, sort_keys=True).encode())
+    for digest in sorted(digests):
+        key.update(b"\n" + digest.encode())
+    return key.hexdigest()
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class IndexCache:
+    def __init__(self, cache_dir=INDEX_CACHE_DIR, max_bytes=INDEX_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def contains(self, key):
+        return os.path.exists(os.path.join(self.entry_dir(key), META_FILE))
+
+    # Load a cached vectorstore, returning (vectorstore, meta) or None on a miss.
+    # memory_map=None follows SERA_INDEX_STORAGE (see index_store).
+    def load(self, key, embeddings, memory_map=None):
+        path = self.entry_dir(key)
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        from index_store import load_index
+
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            vectorstore = load_index(path, embeddings, memory_map=memory_map)
+        except Exception as e:
+            logger.warning("Dropping unreadable index cache entry %s: %s", key, e)
+            self.invalidate(key)
+            return None
+
+        # Touch the entry so LRU eviction sees it as recently used
+        now = time.time()
+        try:
+            os.utime(meta_path, (now, now))
+        except OSError:
+            pass
+        return vectorstore, meta
+
+    # The BM25 index saved with an entry, or None
+    def load_lexical(self, key, memory_map=None):
+        path = self.entry_dir(key)
+        if not os.path.exists(os.path.join(path, META_FILE)):
+            return None
+        from index_store import load_lexical_index
+
+        try:
+            return load_lexical_index(path, memory_map=memory_map)
+        except Exception as e:
+            logger.warning("Could not read the lexical index of cache entry %s: %s", key, e)
+            return None
+
+    # Persist a vectorstore and its metadata under the given key; True on success
+    def store(self, key, vectorstore, meta):
+        final_path = self.entry_dir(key)
+        tmp_path = os.path.join(self.cache_dir, f".tmp-{key}-{uuid.uuid4().hex}")
+        from index_store import save_index
+
+        try:
+            save_index(vectorstore, tmp_path)
+            meta = dict(meta, key=key, created_at=time.time())
+            # meta.json is written last: its presence marks a complete entry
+            with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            with self._lock:
+                if os.path.exists(final_path):
+                    # Another session finished building the same corpus first
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                else:
+                    os.replace(tmp_path, final_path)
+        except Exception as e:
+            logger.warning("Could not write index cache entry %s: %s", key, e)
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.cache_dir):
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    # List (key, size_bytes, last_access) for every complete entry
+    def entries(self):
+        result = []
+        for name in os.listdir(self.cache_dir):
+            meta_path = os.path.join(self.cache_dir, name, META_FILE)
+            if name.startswith(".") or not os.path.exists(meta_path):
+                continue
+            try:
+                last_access = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            result.append((name, _dir_size(os.path.join(self.cache_dir, name)), last_access))
+        return result
+
+    # Remove least recently used entries until the cache fits its byte budget
+    def evict(self):
+        with self._lock:
+            entries = sorted(self.entries(), key=lambda entry: entry[2])
+            total = sum(size for _, size, _ in entries)
+            while entries and total > self.max_bytes:
+                key, size, _ = entries.pop(0)
+                shutil.rmtree(self.entry_dir(key), ignore_errors=True)
+                total -= size
+                logger.info("Evicted index cache entry %s (%d bytes)", key, size)
@@ -0,0 +1,202 @@
+"""
+Process-wide registry of shared, read-only document indexes.
+
+Sessions that upload the same documents share one in-memory index instead of
+holding identical copies. Indexes are keyed by the same content hash as the
+on-disk index cache. A session holds an IndexLease; the lease keeps the entry
+alive through a reference count and is released explicitly (new session) or
+when the session state is garbage-collected. Entries nobody holds stay around
+for quick re-attachment until the registry exceeds its memory budget, at
+which point the least recently used idle entries are dropped. Concurrent
+builds of the same corpus are coalesced: one caller builds, the others wait
+for its result.
+
+Background ingests (progressive_ingest) are shared the same way: the first
+session to upload new materials starts one, later sessions join it through
+an IngestLease, and it is cancelled only once every session has let go.
+"""
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import namedtuple
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+INDEX_REGISTRY_MEMORY_BYTES = int(os.getenv("SERA_INDEX_REGISTRY_MEMORY_MB", "4096")) * 1024 * 1024
+
+# What the registry shares: the vectorstore, ingest metadata (page count, samples) and BM25 index
+SharedIndex = namedtuple("SharedIndex", ["vectorstore", "meta", "lexical"], defaults=[None])
+
+
+# Rough private (heap) size of a FAISS vectorstore: vectors plus chunk text.
+# Memory-mapped indexes live in the shared page cache, so only their id and
+# metadata tables count.
+def estimate_index_bytes(vectorstore):
+    from index_store import is_memory_mapped
+
+    index = vectorstore.index
+    if is_memory_mapped(vectorstore):
+        return index.ntotal * 256
+    size = index.ntotal * index.d * 4
+    docs = getattr(vectorstore.docstore, "_dict", {})
+    size += sum(len(doc.page_content) for doc in docs.values())
+    return size
+
+
+class _Entry:
+    def __init__(self, value, size_bytes):
+        self.value = value
+        self.size_bytes = size_bytes
+        self.refcount = 0
+        self.last_used = time.monotonic()
+
+
+class IndexLease:
+    def __init__(self, registry, key, value):
+        self.key = key
+        self.value = value
+        self._finalizer = weakref.finalize(self, registry._release, key)
+
+    @property
+    def vectorstore(self):
+        return self.value.vectorstore
+
+    @property
+    def meta(self):
+        return self.value.meta
+
+    @property
+    def lexical(self):
+        return self.value.lexical
+
+    # Safe to call more than once; also runs automatically when the lease is collected
+    def release(self):
+        self._finalizer()
+
+
+class IngestLease:
+    def __init__(self, registry, key, job):
+        self.key = key
+        self.job = job
+        self._finalizer = weakref.finalize(self, registry._leave_ingest, key, job)
+
+    # Safe to call more than once; also runs automatically when the lease is collected
+    def release(self):
+        self._finalizer()
+
+
+class IndexRegistry:
+    def __init__(self, memory_budget_bytes=INDEX_REGISTRY_MEMORY_BYTES):
+        self.memory_budget = memory_budget_bytes
+        self._entries = {}
+        self._building = {}
+        self._ingests = {}  # key -> [background ingest job, sessions attached]
+        self._lock = threading.Lock()
+
+    # Attach to the index for key, calling build() -> SharedIndex if nobody has it yet
+    def acquire(self, key, build):
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refcount += 1
+                    entry.last_used = time.monotonic()
+                    return IndexLease(self, key, entry.value)
+                pending = self._building.get(key)
+                if pending is None:
+                    pending = self._building[key] = Future()
+                    owner = True
+                else:
+                    owner = False
+
+            if not owner:
+                # Another session is building the same corpus; wait for it and retry. If
+                # that build failed (or its session stopped), this session builds it itself.
+                pending.result()
+                continue
+
+            try:
+                value = build()
+            except BaseException:
+                with self._lock:
+                    del self._building[key]
+                # The error (maybe a Streamlit stop) belongs to this session; waiters just retry
+                pending.set_result(None)
+                raise
+
+            with self._lock:
+                entry = _Entry(value, estimate_index_bytes(value.vectorstore))
+                entry.refcount = 1
+                self._entries[key] = entry
+                del self._building[key]
+                self._evict_locked()
+            pending.set_result(None)
+            return IndexLease(self, key, value)
+
+    def _release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.monotonic()
+            self._evict_locked()
+
+    # Drop least recently used idle entries until the registry fits its budget
+    def _evict_locked(self):
+        total = sum(entry.size_bytes for entry in self._entries.values())
+        if total <= self.memory_budget:
+            return
+        idle = sorted(
+            (item for item in self._entries.items() if item[1].refcount == 0),
+            key=lambda item: item[1].last_used,
+        )
+        for key, entry in idle:
+            if total <= self.memory_budget:
+                break
+            del self._entries[key]
+            total -= entry.size_bytes
+            logger.info("Evicted shared index %s (%d bytes)", key, entry.size_bytes)
+
+    # Join the background ingest of key, starting one with start() -> job if none
+    # is running (or the last one failed); None if the index is already in memory
+    # or being built by acquire()
+    def join_ingest(self, key, start):
+        with self._lock:
+            if key in self._entries or key in self._building:
+                return None
+            running = self._ingests.get(key)
+            if running is None or running[0].failed:
+                running = self._ingests[key] = [start(), 0]
+            running[1] += 1
+            return IngestLease(self, key, running[0])
+
+    def _leave_ingest(self, key, job):
+        with self._lock:
+            running = self._ingests.get(key)
+            if running is None or running[0] is not job:
+                return
+            running[1] -= 1
+            if running[1]:
+                return
+            del self._ingests[key]
+        # Nobody is waiting for it any more; a finished job ignores this
+        job.cancel()
+
+    # True while some session holds a lease on key
+    def in_use(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry.refcount > 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexes": len(self._entries),
+                "in_use": sum(1 for entry in self._entries.values() if entry.refcount),
+                "sessions": sum(entry.refcount for entry in self._entries.values()),
+                "bytes": sum(entry.size_bytes for entry in self._entries.values()),
+            }
@@ -0,0 +1,177 @@
+"""
+On-disk format for built indexes, openable memory-mapped.
+
+A stored index is a directory holding:
+
+    index.faiss    the FAISS index, written with faiss.write_index
+    chunks.bin     every chunk's text, UTF-8, back to back
+    offsets.npy    int64 start offsets into chunks.bin (one extra end offset)
+    chunks.json    docstore ids and chunk metadata, in index order
+    bm25*          the chunks' BM25 index (see bm25)
+
+With memory_map=True the index is opened with FAISS's mmap read flags and chunk
+text is sliced out of a memory-mapped chunks.bin on demand, so the vectors
+and text live in the OS page cache. Every session and worker process that
+opens the same directory shares those pages instead of holding a private heap
+copy. Memory-mapped indexes are read-only: copy_to_memory makes a private,
+writable copy before anything is added or deleted.
+"""
+import json
+import mmap
+import os
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+from bm25 import BM25Index
+from index_backend import configure_search
+
+INDEX_STORAGE = os.getenv("SERA_INDEX_STORAGE", "mmap")  # "mmap" or "memory"
+
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "offsets.npy"
+CHUNKS_META_FILE = "chunks.json"
+
+
+def _mmap_read_flags(faiss):
+    # IO_FLAG_MMAP_IFC maps flat vector storage without copying (faiss >= 1.8)
+    return getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+
+class ReadOnlyIndexError(Exception):
+    pass
+
+
+class MmapDocstore(Docstore):
+    # Read-only docstore backed by a memory-mapped chunks.bin
+    memory_mapped = True
+
+    def __init__(self, path, ids, metadatas):
+        self._file = open(os.path.join(path, CHUNKS_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._text = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._offsets = np.load(os.path.join(path, OFFSETS_FILE), mmap_mode="r")
+        self._rows = {doc_id: row for row, doc_id in enumerate(ids)}
+        self._metadatas = metadatas
+
+    def __len__(self):
+        return len(self._rows)
+
+    def search(self, search):
+        row = self._rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return Document(
+            id=search,
+            page_content=self._text[start:end].decode("utf-8"),
+            metadata=dict(self._metadatas[row]),
+        )
+
+    def delete(self, ids):
+        raise ReadOnlyIndexError("Memory-mapped docstores are read-only; edit a copy_to_memory() copy instead")
+
+    # Chunk metadata without decoding its text
+    def metadata(self, search):
+        return self._metadatas[self._rows[search]]
+
+    # Iterate (id, Document) pairs in index order
+    def items(self):
+        for doc_id in self._rows:
+            yield doc_id, self.search(doc_id)
+
+
+# Write a LangChain FAISS vectorstore to path in the format above
+def save_index(vectorstore, path):
+    import faiss
+
+    os.makedirs(path, exist_ok=True)
+    faiss.write_index(vectorstore.index, os.path.join(path, INDEX_FILE))
+
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+    offsets = [0]
+    metadatas = []
+    texts = []
+    with open(os.path.join(path, CHUNKS_FILE), "wb") as f:
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            encoded = doc.page_content.encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+            metadatas.append(doc.metadata)
+            texts.append(doc.page_content)
+    BM25Index.build(ids, texts).save(path)
+    np.save(os.path.join(path, OFFSETS_FILE), np.asarray(offsets, dtype=np.int64))
+    with open(os.path.join(path, CHUNKS_META_FILE), "w", encoding="utf-8") as f:
+        json.dump({"ids": ids, "metadatas": metadatas}, f)
+
+
+# Open a stored index as a LangChain FAISS vectorstore
+def load_index(path, embeddings, memory_map=None):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    if memory_map is None:
+        memory_map = INDEX_STORAGE == "mmap"
+
+    with open(os.path.join(path, CHUNKS_META_FILE), "r", encoding="utf-8") as f:
+        chunk_meta = json.load(f)
+    ids, metadatas = chunk_meta["ids"], chunk_meta["metadatas"]
+    index_to_docstore_id = dict(enumerate(ids))
+
+    if memory_map:
+        index = faiss.read_index(os.path.join(path, INDEX_FILE), _mmap_read_flags(faiss))
+        docstore = MmapDocstore(path, ids, metadatas)
+    else:
+        index = faiss.read_index(os.path.join(path, INDEX_FILE))
+        mapped = MmapDocstore(path, ids, metadatas)
+        docstore = InMemoryDocstore(dict(mapped.items()))
+    configure_search(index)
+    return FAISS(embeddings, index, docstore, index_to_docstore_id)
+
+
+# Open the BM25 index stored with an index, or None for entries written without one
+def load_lexical_index(path, memory_map=None):
+    if memory_map is None:
+        memory_map = INDEX_STORAGE == "mmap"
+    try:
+        return BM25Index.load(path, memory_map=memory_map)
+    except FileNotFoundError:
+        return None
+
+
+# Build a BM25 index over a vectorstore's chunks, in index order
+def build_lexical_index(vectorstore):
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    return BM25Index.build(ids, [vectorstore.docstore.search(doc_id).page_content for doc_id in ids])
+
+
+def is_memory_mapped(vectorstore):
+    return getattr(vectorstore.docstore, "memory_mapped", False)
+
+
+# (docstore id, metadata) for every chunk, in index order
+def chunk_metadata(vectorstore):
+    docstore = vectorstore.docstore
+    for position in range(len(vectorstore.index_to_docstore_id)):
+        doc_id = vectorstore.index_to_docstore_id[position]
+        if is_memory_mapped(vectorstore):
+            yield doc_id, docstore.metadata(doc_id)
+        else:
+            yield doc_id, docstore.search(doc_id).metadata
+
+
+# Private, writable in-memory copy of a (possibly shared or memory-mapped) vectorstore
+def copy_to_memory(vectorstore):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    # clone_index would keep viewing the mapped pages; a serialize round trip owns its memory
+    index = configure_search(faiss.deserialize_index(faiss.serialize_index(vectorstore.index)))
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(len(vectorstore.index_to_docstore_id))]
+    docstore = InMemoryDocstore({doc_id: vectorstore.docstore.search(doc_id) for doc_id in ids})
+    return FAISS(vectorstore.embeddings, index, docstore, dict(enumerate(ids)))
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+"""
+Ingestion pipeline: PDFs -> pages -> chunks -> embeddings -> FAISS + BM25.
+
+The Streamlit app runs it for uploads, and the command line runs it headless
+to pre-build indexes (for example the semester's course packs, overnight).
+Both write to the same content-addressed index cache (index_cache) with the
+same ingest settings, so a corpus built here is a cache hit the moment a
+student uploads the same PDFs, and the app opens it memory-mapped instead of
+embedding anything.
+
+    python ingest.py course-packs/                  # one index per directory of PDFs
+    python ingest.py course-packs/ --recursive      # ... and per subdirectory
+    python ingest.py notes/ --group file            # one index per PDF
+    python ingest.py course-packs/ --force          # rebuild entries that already exist
+
+A corpus is the set of PDFs a student would upload together: with the default
+`--group directory`, every directory's PDFs form one corpus. PDFs are parsed
+in parallel by the pdf_loader process pool and chunks are embedded in
+concurrent batches by the embedding scheduler (or locally, see
+embedding_backends). Running headers and footers and duplicate chunks are
+dropped before embedding (see chunk_dedup). Throughput and the dedup savings
+are printed per corpus and in total.
+"""
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from collections import namedtuple
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from chunk_dedup import create_deduplicator, dedup_settings
+from embedding_backends import embedding_model_name
+from embedding_scheduler import EmbeddingScheduler
+from index_backend import index_settings, index_type_of
+from index_cache import cache_key_from_digests, content_digest
+from pdf_loader import load_pdfs
+from tracing import get_metrics_registry, span
+
+logger = logging.getLogger(__name__)
+
+# Ingestion settings; all of them feed into the index cache key
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+EMBEDDING_MODEL = embedding_model_name()
+
+# Outcome of ingesting one corpus from the command line
+IngestReport = namedtuple(
+    "IngestReport",
+    ["name", "key", "files", "pages", "chunks", "parse_seconds", "embed_seconds", "total_seconds",
+     "index_bytes", "cached", "errors", "dedup"],
+    defaults=[None],
+)
+
+
+def ingest_settings():
+    return {
+        "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP,
+        "embedding_model": EMBEDDING_MODEL,
+        "index": index_settings(),
+        "dedup": dedup_settings(),
+    }
+
+
+# Split pages into chunks; with a deduplicator (chunk_dedup), boilerplate lines
+# are stripped from the pages first and duplicate chunks dropped afterwards
+def split_pages(pages, deduplicator=None):
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP
+    )
+    if deduplicator is not None:
+        with span("boilerplate", pages=len(pages)) as trace:
+            lines_before = deduplicator.boilerplate_lines
+            pages = deduplicator.clean_pages(pages)
+            trace.set(lines=deduplicator.boilerplate_lines - lines_before)
+    with span("split", pages=len(pages)) as trace:
+        chunks = text_splitter.split_documents(pages)
+        trace.set(chunks=len(chunks))
+    if deduplicator is not None:
+        with span("dedup", chunks=len(chunks)) as trace:
+            chunks = deduplicator.filter_chunks(chunks)
+            trace.set(kept=len(chunks))
+    return chunks
+
+
+# Split a stream of page batches (e.g. pdf_loader.iter_pdf_pages) into chunk
+# groups, yielding (pages, chunks): the first group as soon as it has
+# first_size chunks, later ones once they have group_size
+def iter_chunk_groups(page_batches, first_size, group_size, deduplicator=None):
+    pages, chunks = [], []
+    target = first_size
+    for batch in page_batches:
+        pages.extend(batch)
+        chunks.extend(split_pages(batch, deduplicator))
+        if len(chunks) >= target:
+            yield pages, chunks
+            pages, chunks = [], []
+            target = group_size
+    if pages:
+        yield pages, chunks
+
+
+# Get a sample of content to confirm processing
+def extract_sample_texts(all_pages):
+    sample_texts = []
+    for i, page in enumerate(all_pages[:5]):  # Just look at first 5 pages
+        # Extract just the first 100 chars from each page
+        sample = page.page_content[:100].replace('\n', ' ').strip()
+        if sample:
+            sample_texts.append(sample + "...")
+    return sample_texts[:2]
+
+
+# Split, deduplicate and embed parsed pages into a vectorstore, returning (vectorstore, meta, scheduler);
+# ValueError if the pages hold no text (e.g. scanned, image-only PDFs)
+def build_index(pages, embeddings, on_progress=None):
+    deduplicator = create_deduplicator()
+    splits = split_pages(pages, deduplicator)
+    if not splits:
+        raise ValueError("Could not extract any content from the PDFs")
+    scheduler = EmbeddingScheduler(embeddings)
+    vectorstore = scheduler.build_faiss(splits, on_progress=on_progress)
+    meta = {
+        "total_pages": len(pages),
+        "sample_texts": extract_sample_texts(pages),
+        "index_type": index_type_of(vectorstore.index),
+        "dedup": deduplicator.report() if deduplicator is not None else None,
+    }
+    return vectorstore, meta, scheduler
+
+
+# Index cache key for PDFs on disk; matches the key the app computes for the same uploads
+def corpus_cache_key(paths):
+    digests = []
+    for path in paths:
+        with open(path, "rb") as f:
+            digests.append(content_digest(f.read()))
+    return cache_key_from_digests(digests, ingest_settings())
+
+
+# Parse, embed and store one corpus in the index cache unless it is there already
+def ingest_corpus(name, paths, index_cache, embeddings, force=False):
+    started = time.perf_counter()
+    key = corpus_cache_key(paths)
+    if index_cache.contains(key) and not force:
+        return IngestReport(name, key, len(paths), 0, 0, 0.0, 0.0, time.perf_counter() - started, 0, True, {})
+    if force:
+        index_cache.invalidate(key)
+
+    pages, errors = load_pdfs(paths)
+    parse_seconds = time.perf_counter() - started
+    if not pages:
+        return IngestReport(name, None, len(paths), 0, 0, parse_seconds, 0.0, parse_seconds, 0, False, errors)
+
+    try:
+        vectorstore, meta, scheduler = build_index(pages, embeddings)
+    except ValueError as e:
+        errors = dict(errors, **{name: str(e)})
+        return IngestReport(name, None, len(paths), len(pages), 0, parse_seconds, 0.0,
+                            time.perf_counter() - started, 0, False, errors)
+    embed_seconds = time.perf_counter() - started - parse_seconds
+    if not index_cache.store(key, vectorstore, meta):
+        errors = dict(errors, **{name: "could not write the index cache entry"})
+        key = None
+    index_bytes = sum(size for entry_key, size, _ in index_cache.entries() if entry_key == key)
+    return IngestReport(
+        name, key, len(paths), len(pages), vectorstore.index.ntotal, parse_seconds, embed_seconds,
+        time.perf_counter() - started, index_bytes, False, errors, meta["dedup"],
+    )
+
+
+# Map corpus name -> sorted PDF paths for the given files and directories
+def find_corpora(roots, group="directory", recursive=False):
+    corpora = {}
+    for root in roots:
+        if os.path.isfile(root):
+            corpora.setdefault(os.path.dirname(root) or ".", []).append(root)
+            continue
+        directories = [root]
+        if recursive:
+            directories += sorted(
+                os.path.join(parent, name) for parent, names, _ in os.walk(root) for name in names
+            )
+        for directory in directories:
+            paths = sorted(glob.glob(os.path.join(directory, "*.pdf")) + glob.glob(os.path.join(directory, "*.PDF")))
+            if paths:
+                corpora.setdefault(directory, []).extend(paths)
+    if group == "file":
+        return {path: [path] for paths in corpora.values() for path in paths}
+    return {name: sorted(set(paths)) for name, paths in corpora.items()}
+
+
+# One-line summary of a ChunkDeduplicator report
+def format_dedup_report(dedup):
+    return (
+        f"dropped {dedup['boilerplate_lines']} boilerplate lines, {dedup['exact_duplicates']} duplicate and "
+        f"{dedup['near_duplicates']} near-duplicate chunks ({dedup['chunks_in']} -> {dedup['chunks_out']} chunks, "
+        f"{dedup['dropped_fraction']:.1%} fewer to embed and store)"
+    )
+
+
+def _print_report(report):
+    if report.cached:
+        print(f"{report.name}: already indexed ({report.files} files, key {report.key[:12]})")
+        return
+    for path, error in report.errors.items():
+        print(f"{report.name}: error in {path}: {error}", file=sys.stderr)
+    if report.key is None:
+        print(f"{report.name}: nothing indexed")
+        return
+    print(
+        f"{report.name}: {report.files} files, {report.pages} pages, {report.chunks} chunks in "
+        f"{report.total_seconds:.1f}s ({report.pages / report.parse_seconds if report.parse_seconds else 0:.1f} pages/s "
+        f"parse, {report.chunks / report.embed_seconds if report.embed_seconds else 0:.1f} chunks/s embed + index), "
+        f"{report.index_bytes / 1e6:.1f} MB, key {report.key[:12]}"
+    )
+    if report.dedup:
+        print(f"{report.name}: {format_dedup_report(report.dedup)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="PDF files or directories of PDFs")
+    parser.add_argument("--group", choices=["directory", "file"], default="directory",
+                        help="index each directory's PDFs together (what a student uploads at once) or each PDF alone")
+    parser.add_argument("--recursive", action="store_true", help="also ingest subdirectories")
+    parser.add_argument("--force", action="store_true", help="rebuild corpora that are already in the cache")
+    parser.add_argument("--cache-dir", help="index cache directory (default: SERA_INDEX_CACHE_DIR)")
+    parser.add_argument("--metrics", help="write per-stage timings (see tracing) to this JSON file")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+
+    from embedding_backends import create_embeddings
+    from embedding_cache import CachedEmbeddings, EmbeddingStore
+    from index_cache import IndexCache
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    corpora = find_corpora(args.paths, args.group, args.recursive)
+    if not corpora:
+        parser.error("no PDFs found")
+    index_cache = IndexCache(args.cache_dir) if args.cache_dir else IndexCache()
+    embeddings, model_name = create_embeddings()
+    embeddings = CachedEmbeddings(embeddings, model_name, EmbeddingStore())
+
+    started = time.perf_counter()
+    reports = []
+    for name, paths in corpora.items():
+        report = ingest_corpus(name, paths, index_cache, embeddings, force=args.force)
+        _print_report(report)
+        reports.append(report)
+    elapsed = time.perf_counter() - started
+
+    built = [report for report in reports if not report.cached and report.key]
+    pages = sum(report.pages for report in built)
+    chunks = sum(report.chunks for report in built)
+    stats = embeddings.stats()
+    print(
+        f"Built {len(built)} of {len(reports)} corpora ({len(reports) - len(built)} cached or failed): "
+        f"{pages} pages, {chunks} chunks in {elapsed:.1f}s "
+        f"({pages / elapsed if elapsed else 0:.1f} pages/s, {chunks / elapsed if elapsed else 0:.1f} chunks/s); "
+        f"embedding cache {stats['hits']} hits, {stats['misses']} misses"
+    )
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            f.write(get_metrics_registry().to_json())
+    evicted = [report.name for report in built if not index_cache.contains(report.key)]
+    if evicted:
+        print(
+            f"Warning: {len(evicted)} corpora were evicted to stay within the index cache budget; "
+            f"raise SERA_INDEX_CACHE_MAX_MB to keep them all", file=sys.stderr
+        )
+    return 1 if any(report.errors for report in reports) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
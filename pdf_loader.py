@@ -0,0 +1,373 @@
+"""
+Parallel PDF loading.
+
+Text extraction is CPU-bound pure Python, so instead of calling
+PyPDFLoader(path).load() file by file on the Streamlit script thread, the
+files are cut into work units (a whole small file, or a range of pages of a
+large one) and parsed across a process pool. Results are merged back in
+(file, page) order and produce the same page Documents PyPDFLoader would.
+
+Sources are paths or PdfBuffer(name, data) for PDFs that are already in
+memory, such as Streamlit uploads. Buffers are parsed in place through a
+read-only stream over a memoryview; for the process pool each one is copied
+once into a shared memory segment that workers attach to by name. Nothing is
+written to disk unless shared memory is too small for the upload, in which
+case the buffer is spilled to a temporary directory that is removed as soon
+as parsing finishes.
+
+Every page carries its file's SHA-256 content digest (the one the index cache
+keys on) as "digest" metadata, so chunks can be matched to a file by content
+whatever name it was uploaded under.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+from langchain_core.documents import Document
+
+from tracing import record_span
+
+logger = logging.getLogger(__name__)
+
+# 0 means "one worker per CPU"
+PDF_WORKERS = int(os.getenv("SERA_PDF_WORKERS", "0")) or os.cpu_count() or 1
+PDF_PAGES_PER_UNIT = int(os.getenv("SERA_PDF_PAGES_PER_UNIT", "25"))
+
+# Where shared memory is a filesystem (Linux), keep this much of it free
+SHM_DIR = "/dev/shm"
+SHM_HEADROOM_BYTES = 64 * 1024 * 1024
+# pypdf reads a few bytes at a time; buffer them in C rather than per call in Python
+STREAM_BUFFER_SIZE = 64 * 1024
+DIGEST_READ_SIZE = 1024 * 1024
+
+# A PDF held in memory; name becomes the pages' "source", data is any bytes-like object
+PdfBuffer = namedtuple("PdfBuffer", ["name", "data"])
+# A PdfBuffer copied into shared memory, as handed to pool workers
+_SharedPdf = namedtuple("_SharedPdf", ["shm_name", "size"])
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+# Read-only, seekable raw file object over a buffer, so pypdf can parse it without a copy
+class _BufferStream(io.RawIOBase):
+    def __init__(self, data):
+        with memoryview(data) as view:
+            self._view = view.cast("B")
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = max(0, min(len(buffer), len(self._view) - self._position))
+        buffer[:count] = self._view[self._position:self._position + count]
+        self._position += count
+        return count
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        if offset < 0:
+            raise ValueError("negative seek position")
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+    def close(self):
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+def _pdf_reader(source):
+    # PyPDFLoader itself is built on pypdf; PyPDF2 is the legacy name
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        from PyPDF2 import PdfReader
+    return PdfReader(source)
+
+
+def _buffer_stream(data):
+    return io.BufferedReader(_BufferStream(data), STREAM_BUFFER_SIZE)
+
+
+def _source_name(source):
+    return source.name if isinstance(source, PdfBuffer) else source
+
+
+# Open a path, PdfBuffer or _SharedPdf; buffers and segments are released on exit
+@contextmanager
+def _open_pdf(source):
+    if isinstance(source, PdfBuffer):
+        with _buffer_stream(source.data) as stream:
+            yield _pdf_reader(stream)
+    elif isinstance(source, _SharedPdf):
+        segment = shared_memory.SharedMemory(name=source.shm_name)
+        try:
+            with _buffer_stream(segment.buf[:source.size]) as stream:
+                yield _pdf_reader(stream)
+        finally:
+            segment.close()
+    else:
+        yield _pdf_reader(source)
+
+
+# SHA-256 of a source's bytes, matching index_cache.content_digest
+def source_digest(source):
+    if isinstance(source, PdfBuffer):
+        return hashlib.sha256(source.data).hexdigest()
+    digest = hashlib.sha256()
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(DIGEST_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _page_count(source):
+    with _open_pdf(source) as reader:
+        return len(reader.pages)
+
+
+# Worker entry point: extract the text of pages [start, end) of one file
+def _parse_pages(source, start, end):
+    with _open_pdf(source) as reader:
+        return [(page_number, reader.pages[page_number].extract_text().strip())
+                for page_number in range(start, end)]
+
+
+# Split every file into page ranges of at most pages_per_unit pages
+def plan_work_units(sources, pages_per_unit=PDF_PAGES_PER_UNIT):
+    units = []
+    page_counts = {}
+    errors = {}
+    for source in sources:
+        name = _source_name(source)
+        try:
+            page_count = _page_count(source)
+        except Exception as e:
+            errors[name] = str(e)
+            continue
+        page_counts[name] = page_count
+        for start in range(0, page_count, pages_per_unit):
+            units.append((source, start, min(start + pages_per_unit, page_count)))
+    return units, page_counts, errors
+
+
+def _shared_memory_free():
+    if not os.path.isdir(SHM_DIR):
+        return None  # not a filesystem here; the OS backs segments with the page file
+    return shutil.disk_usage(SHM_DIR).free - SHM_HEADROOM_BYTES
+
+
+# Make the in-memory sources openable by pool workers: each PdfBuffer is copied
+# into a shared memory segment, or, if shared memory is short, spilled to a
+# scratch file. Yields {name: worker source}; segments and files are removed on exit.
+@contextmanager
+def _worker_sources(sources):
+    mapped = {}
+    segments = []
+    scratch = None
+    available = _shared_memory_free()
+    try:
+        for source in sources:
+            if not isinstance(source, PdfBuffer):
+                continue
+            with memoryview(source.data) as view, view.cast("B") as data:
+                size = data.nbytes
+                if size and (available is None or size <= available):
+                    segment = shared_memory.SharedMemory(create=True, size=size)
+                    segments.append(segment)
+                    segment.buf[:size] = data
+                    mapped[source.name] = _SharedPdf(segment.name, size)
+                    if available is not None:
+                        available -= size
+                else:
+                    if scratch is None:
+                        scratch = tempfile.TemporaryDirectory(prefix="sera-pdf-")
+                    path = os.path.join(scratch.name, f"{len(mapped)}.pdf")
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    mapped[source.name] = path
+        yield mapped
+    finally:
+        for segment in segments:
+            segment.close()
+            segment.unlink()
+        if scratch is not None:
+            scratch.cleanup()
+
+
+# Process-wide pool; "spawn" because the Streamlit server is multi-threaded
+def get_pool(max_workers=PDF_WORKERS):
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != max_workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            _pool_workers = max_workers
+        return _pool
+
+
+def _warm_worker():
+    _pdf_reader  # the worker has imported this module, and with it LangChain
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        import PyPDF2  # noqa: F401
+    return os.getpid()
+
+
+# Start the pool's worker processes ahead of the first upload; returns their pids
+def warm_pool(max_workers=PDF_WORKERS):
+    pool = get_pool(max_workers)
+    return {future.result() for future in [pool.submit(_warm_worker) for _ in range(max_workers)]}
+
+
+# Drop a pool whose workers died so the next ingest starts a fresh one
+def _discard_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+# Parse work units in-process or on the pool, yielding (position, pages, error)
+# per unit as it finishes. Units of a file already in errors are skipped in-process.
+def _parse_units(units, errors, max_workers):
+    if max_workers <= 1 or len(units) <= 1:
+        for position, (source, start, end) in enumerate(units):
+            if _source_name(source) in errors:
+                yield position, None, None
+                continue
+            try:
+                pages, error = _parse_pages(source, start, end), None
+            except Exception as e:
+                pages, error = None, str(e)
+            yield position, pages, error
+        return
+
+    pool = get_pool(max_workers)
+    sources = list({_source_name(source): source for source, _, _ in units}.values())
+    with _worker_sources(sources) as shared:
+        futures = {
+            pool.submit(_parse_pages, shared.get(_source_name(source), source), start, end): position
+            for position, (source, start, end) in enumerate(units)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    pages, error = future.result(), None
+                except BrokenProcessPool as e:
+                    _discard_pool(pool)
+                    pages, error = None, str(e)
+                except Exception as e:
+                    pages, error = None, str(e)
+                yield futures[future], pages, error
+        finally:
+            # The consumer may stop early (e.g. a cancelled ingest); don't leave work queued
+            for future in futures:
+                future.cancel()
+
+
+def _page_documents(name, pages, total_pages, digest):
+    return [
+        Document(
+            page_content=text,
+            metadata={"source": name, "page": page_number, "total_pages": total_pages, "digest": digest},
+        )
+        for page_number, text in sorted(pages)
+    ]
+
+
+# Load all PDFs (paths or PdfBuffers), returning (pages, errors) where errors
+# maps path or buffer name -> message.
+# on_progress(done_units, total_units) is called from the calling thread.
+def load_pdfs(sources, max_workers=PDF_WORKERS, pages_per_unit=PDF_PAGES_PER_UNIT, on_progress=None):
+    started = time.perf_counter()
+    units, page_counts, errors = plan_work_units(sources, pages_per_unit)
+    results = {}
+    done = 0
+
+    for position, unit_pages, error in _parse_units(units, errors, max_workers):
+        name = _source_name(units[position][0])
+        if error is not None:
+            # A broken page range only drops its own file, like the old per-file try/except
+            errors.setdefault(name, error)
+        elif unit_pages is not None:
+            results.setdefault(name, []).extend(unit_pages)
+        done += 1
+        if on_progress is not None:
+            on_progress(done, len(units))
+
+    pages = []
+    for source in sources:
+        name = _source_name(source)
+        if name in errors or name not in results:
+            continue
+        pages.extend(_page_documents(name, results[name], page_counts[name], source_digest(source)))
+    for name, message in errors.items():
+        logger.warning("Error loading PDF %s: %s", name, message)
+    record_span("pdf_parse", time.perf_counter() - started, files=len(sources), pages=len(pages), errors=len(errors),
+                in_memory_files=sum(isinstance(source, PdfBuffer) for source in sources))
+    return pages, errors
+
+
+# Stream the pages of a plan from plan_work_units: yields each unit's page
+# Documents in (file, page) order as soon as it and every unit before it are
+# parsed. Unlike load_pdfs a failed page range can't take back pages already
+# yielded; it is recorded in errors and the rest of its file is still loaded.
+def iter_pdf_pages(units, page_counts, errors, max_workers=PDF_WORKERS):
+    started = time.perf_counter()
+    finished = {}
+    next_position = 0
+    yielded = 0
+    consumer_seconds = 0.0
+    digests = {}
+    try:
+        for position, unit_pages, error in _parse_units(units, {}, max_workers):
+            source = units[position][0]
+            name = _source_name(source)
+            if error is not None:
+                errors.setdefault(name, error)
+                logger.warning("Error loading PDF %s: %s", name, error)
+            if name not in digests:
+                digests[name] = source_digest(source)
+            finished[position] = _page_documents(name, unit_pages or [], page_counts[name], digests[name])
+            while next_position in finished:
+                pages = finished.pop(next_position)
+                next_position += 1
+                if pages:
+                    yielded += len(pages)
+                    handed_over = time.perf_counter()
+                    yield pages
+                    consumer_seconds += time.perf_counter() - handed_over
+    finally:
+        # Time the caller spent on the pages (splitting, embedding) is its own stage
+        record_span("pdf_parse", time.perf_counter() - started - consumer_seconds, files=len(page_counts),
+                    pages=yielded, errors=len(errors))
@@ -0,0 +1,231 @@
+"""
+Progressive ingestion: chat while the rest of the corpus is still indexing.
+
+ingest.build_index returns only once every page has been parsed, split,
+embedded and added to FAISS. Here the same stages run as a generator
+pipeline on a background thread:
+
+    pages       pdf_loader.iter_pdf_pages, in (file, page) order as page
+                ranges come back from the worker pool
+    chunks      ingest.iter_chunk_groups, deduplicated as they go (chunk_dedup);
+                a small first group, then groups big enough to keep the
+                embedding scheduler's batches busy
+    embeddings  EmbeddingScheduler.embed_batches
+    appends     a flat FAISS index and a BM25 index, batch by batch
+
+Queries search whatever has been appended so far. FAISS and BM25Index can't
+be read while they grow, so appends and index lookups share the job's lock;
+pass it to the retriever (build_retrieval_chain(..., lock=job.lock)). The app
+unlocks chat once PROGRESSIVE_MIN_CHUNKS chunks are searchable and shows
+`progress()` until the job is done.
+
+Sessions uploading the same new materials share one job through the index
+registry (IndexRegistry.join_ingest), which cancels it only once no session
+is waiting for it. When everything is in, the index is stored in the index cache just as a
+blocking ingest would store it, rebuilt as an approximate index if the
+corpus is large enough for one. `shared_index()` then opens the cached copy,
+so the session moves to the same shared, memory-mapped index a later upload
+of these PDFs gets.
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import closing
+
+from chunk_dedup import create_deduplicator
+from embedding_scheduler import EmbeddingScheduler
+from index_backend import build_vectorstore, choose_index_type, index_type_of, reconstruct_vectors
+from index_registry import SharedIndex
+from ingest import extract_sample_texts, iter_chunk_groups
+from pdf_loader import PDF_WORKERS, iter_pdf_pages, plan_work_units
+from tracing import bind_context, record_span
+
+logger = logging.getLogger(__name__)
+
+PROGRESSIVE_INGEST = os.getenv("SERA_PROGRESSIVE_INGEST", "1") == "1"
+# Chat unlocks once this many chunks (at least one) are searchable
+PROGRESSIVE_MIN_CHUNKS = max(1, int(os.getenv("SERA_PROGRESSIVE_MIN_CHUNKS", "64")))
+
+IngestProgress = namedtuple(
+    "IngestProgress", ["pages_indexed", "total_pages", "chunks_indexed", "fraction", "done", "error"]
+)
+
+
+class ProgressiveIngest:
+    def __init__(self, cache_key, sources, embeddings, index_cache, min_chunks=PROGRESSIVE_MIN_CHUNKS,
+                 max_workers=PDF_WORKERS):
+        self.cache_key = cache_key
+        self.id = uuid.uuid4().hex
+        self.sources = sources
+        self.embeddings = embeddings
+        self.index_cache = index_cache
+        self.min_chunks = max(1, min_chunks)
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.vectorstore = None
+        self.lexical = None
+        self.meta = None
+        self.errors = {}
+        self.error = None
+        self.total_pages = 0
+        self.pages_indexed = 0
+        self.chunks_indexed = 0
+        self.sample_texts = []
+        self.deduplicator = create_deduplicator()
+        self.stored = False
+        self.seconds = None
+        self.thread = threading.Thread(target=bind_context(self._run), name="progressive-ingest", daemon=True)
+        self._searchable = threading.Event()
+        self._done = threading.Event()
+        self._cancelled = threading.Event()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def _run(self):
+        started = time.perf_counter()
+        try:
+            units, page_counts, self.errors = plan_work_units(self.sources)
+            self.total_pages = sum(page_counts.values())
+            scheduler = EmbeddingScheduler(self.embeddings)
+            pages = iter_pdf_pages(units, page_counts, self.errors, self.max_workers)
+            groups = iter_chunk_groups(pages, self.min_chunks, scheduler.batch_size * scheduler.max_concurrency,
+                                       self.deduplicator)
+            with closing(pages), closing(groups):
+                for group_pages, chunks in groups:
+                    if not self.sample_texts:
+                        self.sample_texts = extract_sample_texts(group_pages)
+                    if not self._append(scheduler, group_pages, chunks):
+                        return
+            if self.vectorstore is None:
+                raise ValueError("Could not extract any content from the PDFs")
+            self._store()
+        except Exception as e:
+            logger.exception("Progressive ingest of %s failed", self.cache_key)
+            self.error = str(e)
+        finally:
+            self.seconds = time.perf_counter() - started
+            self._searchable.set()
+            self._done.set()
+
+    # Embed one chunk group and append it batch by batch; False if cancelled
+    def _append(self, scheduler, pages, chunks):
+        from langchain_community.vectorstores import FAISS
+
+        from bm25 import BM25Index
+
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        pages_before = self.pages_indexed
+        pages_appended = set()
+        build_seconds = 0.0
+        with closing(scheduler.embed_batches(texts)) as batches:
+            for start, vectors in batches:
+                if self._cancelled.is_set():
+                    return False
+                end = start + len(vectors)
+                added = time.perf_counter()
+                with self.lock:
+                    if self.vectorstore is None:
+                        self.vectorstore = FAISS.from_embeddings(
+                            list(zip(texts[start:end], vectors)), self.embeddings, metadatas=metadatas[start:end]
+                        )
+                        self.lexical = BM25Index.build(
+                            list(self.vectorstore.index_to_docstore_id.values()), texts[start:end]
+                        )
+                    else:
+                        ids = self.vectorstore.add_embeddings(
+                            zip(texts[start:end], vectors), metadatas=metadatas[start:end]
+                        )
+                        self.lexical.add(ids, texts[start:end])
+                    self.chunks_indexed += end - start
+                pages_appended.update((metadata["source"], metadata["page"]) for metadata in metadatas[start:end])
+                self.pages_indexed = pages_before + len(pages_appended)
+                build_seconds += time.perf_counter() - added
+                if self.chunks_indexed >= self.min_chunks:
+                    self._searchable.set()
+        record_span("faiss_build", build_seconds, chunks=len(texts), index_type="flat")
+        if self._cancelled.is_set():
+            return False
+        # Pages without any text have no chunks but are done all the same
+        self.pages_indexed = pages_before + len(pages)
+        return True
+
+    # Store the finished index in the cache, as ingest.build_index would have built it
+    def _store(self):
+        vectorstore = self.vectorstore
+        index_type = choose_index_type(vectorstore.index.ntotal)
+        if index_type != "flat":
+            ids = [vectorstore.index_to_docstore_id[position] for position in range(vectorstore.index.ntotal)]
+            chunks = [vectorstore.docstore.search(doc_id) for doc_id in ids]
+            vectorstore = build_vectorstore(
+                [chunk.page_content for chunk in chunks], reconstruct_vectors(vectorstore.index),
+                [chunk.metadata for chunk in chunks], self.embeddings, index_type, ids=ids,
+            )
+        self.meta = {
+            "total_pages": self.pages_indexed,
+            "sample_texts": self.sample_texts,
+            "index_type": index_type_of(vectorstore.index),
+            "dedup": self.deduplicator.report() if self.deduplicator is not None else None,
+        }
+        self.stored = self.index_cache.store(self.cache_key, vectorstore, self.meta)
+        if not self.stored:
+            self.vectorstore = vectorstore
+
+    # The finished index for the registry: the memory-mapped cache entry if it was stored
+    def shared_index(self):
+        from index_store import build_lexical_index
+
+        if self.stored:
+            cached = self.index_cache.load(self.cache_key, self.embeddings)
+            if cached is not None:
+                return SharedIndex(cached[0], self.meta, self.index_cache.load_lexical(self.cache_key))
+        return SharedIndex(self.vectorstore, self.meta, build_lexical_index(self.vectorstore))
+
+    # Key for per-session caches (the retrieval chain) while the index is still growing;
+    # unique to this job, so a cancelled job's partial index is never handed to a new one
+    def chain_key(self):
+        return f"{self.cache_key}:progressive:{self.id}"
+
+    def progress(self):
+        if self.meta is not None:
+            fraction = 1.0
+        else:
+            fraction = self.pages_indexed / self.total_pages if self.total_pages else 0.0
+        return IngestProgress(
+            self.pages_indexed, self.total_pages, self.chunks_indexed, fraction, self.done, self.error
+        )
+
+    # True once chat can start: enough chunks are searchable (or the job has ended)
+    @property
+    def searchable(self):
+        return self._searchable.is_set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    # Ended without storing a complete index (an error, or cancelled)
+    @property
+    def failed(self):
+        return self.done and self.meta is None
+
+    def wait_searchable(self, timeout=None):
+        return self._searchable.wait(timeout)
+
+    # Stop after the current batch; what is indexed stays searchable but isn't cached
+    def cancel(self):
+        self._cancelled.set()
+
+
+# Start ingesting sources (paths or pdf_loader.PdfBuffers) on a daemon thread.
+# thread_hook(thread) is called before the thread starts, e.g. to attach a Streamlit script context.
+def start_progressive_ingest(cache_key, sources, embeddings, index_cache, thread_hook=None, **kwargs):
+    job = ProgressiveIngest(cache_key, sources, embeddings, index_cache, **kwargs)
+    if thread_hook is not None:
+        thread_hook(job.thread)
+    return job.start()
@@ -0,0 +1,208 @@
+"""
+A session's document collection, editable after the initial ingest.
+
+A session starts out on the shared, read-only index from the registry. The
+first time documents are added or removed it switches to a private in-memory
+copy (copy-on-write). From then on edits only touch the changed documents:
+new files are parsed, split and embedded on their own and appended to the
+index, and removals drop one document's chunks by id. Nothing else is
+re-ingested, so the conversation survives. Chunks are matched to the session's
+files by the content digest pdf_loader puts on every page, not by the name the
+shared index was built from: another session, or ingest.py, may have built it
+from the same bytes under other names.
+
+Flat and IVF indexes remove ids in place. HNSW and re-ranked IVF-PQ indexes
+can't, so a removal from those rebuilds the index from the stored vectors
+(no re-embedding).
+
+The BM25 index (bm25) follows the same edits; its private copy shares the
+read-only base built at ingest and only holds the changes.
+
+The corpus key follows the content: it is derived from the per-file digests
+exactly like the index cache key, so an edited corpus gets the key a fresh
+ingest of the same files would have.
+"""
+import logging
+import os
+import uuid
+from collections import OrderedDict, namedtuple
+
+from index_cache import cache_key_from_digests
+from index_store import chunk_metadata, copy_to_memory
+
+logger = logging.getLogger(__name__)
+
+# One uploaded file: content digest, docstore ids of its chunks, page count, sample snippets
+CorpusDocument = namedtuple("CorpusDocument", ["digest", "chunk_ids", "total_pages", "sample_texts"])
+
+
+def source_name(metadata):
+    return os.path.basename(metadata.get("source", ""))
+
+
+# Short snippets from the first chunks of a document, like extract_sample_texts does for pages
+def _sample_texts(chunks):
+    samples = []
+    for chunk in chunks[:5]:
+        sample = chunk.page_content[:100].replace("\n", " ").strip()
+        if sample:
+            samples.append(sample + "...")
+    return samples[:2]
+
+
+def _empty_vectorstore(embeddings, dim):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+
+    return FAISS(embeddings, faiss.IndexFlatL2(dim), InMemoryDocstore(), {})
+
+
+class SessionCorpus:
+    def __init__(self, vectorstore, documents, settings, sample_texts=None, lexical=None):
+        self.vectorstore = vectorstore
+        self.lexical = lexical
+        self.documents = documents
+        self.settings = settings
+        self._sample_texts = sample_texts
+        self._private_id = None
+        self._incomplete = False
+
+    # Wrap a shared index; digests maps this session's file names -> content digest
+    @classmethod
+    def from_shared(cls, vectorstore, meta, digests, settings, lexical=None):
+        names_by_digest = {}
+        for name, digest in digests.items():
+            names_by_digest.setdefault(digest, []).append(name)
+        chunk_ids = OrderedDict((name, []) for name in digests)
+        pages = {name: set() for name in digests}
+        page_totals = {}
+        chunk_digests = {}
+        for doc_id, metadata in chunk_metadata(vectorstore):
+            source = source_name(metadata)
+            names = names_by_digest.get(metadata.get("digest"), [])
+            # The same bytes uploaded twice under different names: keep the stored name if it is one of them
+            name = source if source in names or not names else names[0]
+            chunk_ids.setdefault(name, []).append(doc_id)
+            pages.setdefault(name, set()).add(metadata.get("page"))
+            chunk_digests.setdefault(name, metadata.get("digest", ""))
+            if "total_pages" in metadata:
+                page_totals[name] = metadata["total_pages"]
+        documents = OrderedDict(
+            (name, CorpusDocument(digests.get(name, chunk_digests.get(name, "")), ids,
+                                  page_totals.get(name, len(pages[name])), []))
+            for name, ids in chunk_ids.items()
+        )
+        return cls(vectorstore, documents, settings, sample_texts=meta.get("sample_texts"), lexical=lexical)
+
+    @property
+    def private(self):
+        return self._private_id is not None
+
+    @property
+    def pdf_names(self):
+        return list(self.documents)
+
+    @property
+    def total_pages(self):
+        return sum(document.total_pages for document in self.documents.values())
+
+    def sample_texts(self):
+        if self._sample_texts is not None:
+            return self._sample_texts
+        samples = [sample for document in self.documents.values() for sample in document.sample_texts]
+        return samples[:2]
+
+    def corpus_key(self):
+        key = cache_key_from_digests([document.digest for document in self.documents.values()], self.settings)
+        # An incomplete index must not share answers with the complete corpus of the same files
+        return f"{key}:incomplete:{self._private_id}" if self._incomplete else key
+
+    # Switch to a private copy that is never shared by key, for an index that
+    # doesn't hold all of its documents (a failed or cancelled ingest)
+    def detach(self):
+        self._ensure_private()
+        self._incomplete = True
+
+    # Key for per-session caches (the retrieval chain): a private index must not be shared by key
+    def chain_key(self):
+        key = self.corpus_key()
+        return f"{key}:{self._private_id}" if self.private else key
+
+    def contains(self, name, digest):
+        document = self.documents.get(name)
+        return document is not None and document.digest == digest
+
+    def _ensure_private(self):
+        if not self.private:
+            self.vectorstore = copy_to_memory(self.vectorstore)
+            if self.lexical is not None:
+                self.lexical = self.lexical.copy()
+            self._private_id = uuid.uuid4().hex
+            # Samples of the original upload no longer describe an edited corpus
+            for name, document in self.documents.items():
+                if not document.sample_texts:
+                    chunks = [self.vectorstore.docstore.search(doc_id) for doc_id in document.chunk_ids[:5]]
+                    self.documents[name] = document._replace(sample_texts=_sample_texts(chunks))
+            self._sample_texts = None
+
+    # Embed one new file's chunks and append them; replaces an older file of the same name
+    def add(self, name, digest, chunks, total_pages, scheduler):
+        self._ensure_private()
+        if name in self.documents:
+            self.remove(name)
+        texts = [chunk.page_content for chunk in chunks]
+        metadatas = [chunk.metadata for chunk in chunks]
+        chunk_ids = []
+        try:
+            for start, vectors in scheduler.embed_batches(texts):
+                end = start + len(vectors)
+                chunk_ids.extend(self.vectorstore.add_embeddings(
+                    zip(texts[start:end], vectors), metadatas=metadatas[start:end]
+                ))
+        except BaseException:
+            # No document entry will own the batches already added; take them out again
+            if chunk_ids:
+                self._delete_chunks(chunk_ids)
+            raise
+        if self.lexical is not None:
+            self.lexical.add(chunk_ids, texts)
+        self.documents[name] = CorpusDocument(digest, chunk_ids, total_pages, _sample_texts(chunks))
+        logger.info("Added %s (%d chunks) to the session corpus", name, len(chunk_ids))
+
+    # Drop one file's chunks by id
+    def remove(self, name):
+        self._ensure_private()
+        document = self.documents.pop(name)
+        if not document.chunk_ids:
+            return
+        if self.lexical is not None:
+            self.lexical.remove(document.chunk_ids)
+        self._delete_chunks(document.chunk_ids)
+        logger.info("Removed %s (%d chunks) from the session corpus", name, len(document.chunk_ids))
+
+    def _delete_chunks(self, chunk_ids):
+        try:
+            self.vectorstore.delete(chunk_ids)
+        except RuntimeError:
+            # The index type doesn't support remove_ids (nothing was changed); rebuild without them
+            self._rebuild_without(set(chunk_ids))
+
+    def _rebuild_without(self, removed):
+        from index_backend import build_vectorstore, index_type_of, reconstruct_vectors
+
+        vectorstore = self.vectorstore
+        vectors = reconstruct_vectors(vectorstore.index)
+        keep = [
+            position for position in range(len(vectorstore.index_to_docstore_id))
+            if vectorstore.index_to_docstore_id[position] not in removed
+        ]
+        ids = [vectorstore.index_to_docstore_id[position] for position in keep]
+        chunks = [vectorstore.docstore.search(doc_id) for doc_id in ids]
+        if not ids:
+            self.vectorstore = _empty_vectorstore(vectorstore.embeddings, vectorstore.index.d)
+            return
+        self.vectorstore = build_vectorstore(
+            [chunk.page_content for chunk in chunks], vectors[keep], [chunk.metadata for chunk in chunks],
+            vectorstore.embeddings, index_type=index_type_of(vectorstore.index), ids=ids,
+        )
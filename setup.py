@@ -6,13 +6,16 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=[
-        "streamlit>=1.24.0",
+        "streamlit>=1.37.0",
         "python-dotenv>=1.0.0",
-        "langchain>=0.0.267",
-        "langchain-community>=0.0.13",
-        "langchain-google-genai>=0.0.5",
+        "langchain>=0.3.0",
+        "langchain-community>=0.3.0",
+        "langchain-core>=0.3.0",
+        "langchain-google-genai>=2.0.0",
         "google-generativeai>=0.3.1",
         "faiss-cpu>=1.7.4",
+        "numpy>=1.24.0",
+        "pypdf>=3.9.0",
         "PyPDF2>=3.0.0",
         "SpeechRecognition>=3.10.0",
         "elevenlabs>=0.2.24",
@@ -20,7 +23,7 @@ setup(
         "pyaudio>=0.2.13",
         "requests>=2.31.0",
     ],
-    python_requires=">=3.8",
+    python_requires=">=3.9",
     description="An interactive AI-powered voice assistant for studying from PDF materials",
     author="AI Study Buddy Team",
     author_email="example@example.com",
@@ -30,7 +33,6 @@ setup(
         "Intended Audience :: Education",
         "License :: OSI Approved :: MIT License",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 3.8",
         "Programming Language :: Python :: 3.9",
     ],
 )
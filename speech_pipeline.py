@@ -0,0 +1,114 @@
+"""
+Sentence-pipelined speech synthesis.
+
+The answer text is cut into sentences as it is produced, each sentence is
+synthesized on a small thread pool, and the finished clips are handed back
+strictly in sentence order so they can be queued for sequential playback.
+The first clip is ready roughly one sentence after generation starts instead
+of after the whole answer has been written and synthesized.
+"""
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+TTS_PIPELINE_WORKERS = int(os.getenv("SERA_TTS_PIPELINE_WORKERS", "3"))
+# Very short sentences are merged with the next one to avoid choppy audio
+MIN_SENTENCE_CHARS = int(os.getenv("SERA_TTS_MIN_SENTENCE_CHARS", "40"))
+
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+|\n{2,}")
+_ABBREVIATIONS = {"e.g.", "i.e.", "etc.", "vs.", "dr.", "mr.", "mrs.", "ms.", "prof.", "fig.", "eq.", "no.", "p.", "pp."}
+
+
+class SentenceSegmenter:
+    def __init__(self, min_chars=MIN_SENTENCE_CHARS):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def _is_abbreviation(self, text, end):
+        words = text[:end].split()
+        return bool(words) and words[-1].lower() in _ABBREVIATIONS
+
+    # Add streamed text; return the sentences it completed
+    def feed(self, text):
+        self._buffer += text
+        sentences = []
+        search_from = 0
+        while True:
+            match = _SENTENCE_END.search(self._buffer, search_from)
+            if match is None:
+                break
+            end = match.end()
+            candidate = self._buffer[:end].strip()
+            if self._is_abbreviation(self._buffer, match.start() + len(match.group().rstrip())) or \
+                    len(candidate) < self.min_chars:
+                search_from = end
+                continue
+            sentences.append(candidate)
+            self._buffer = self._buffer[end:]
+            search_from = 0
+        return sentences
+
+    # Return whatever is left once the text is complete
+    def flush(self):
+        remainder = self._buffer.strip()
+        self._buffer = ""
+        return [remainder] if remainder else []
+
+
+class SpeechPipeline:
+    # prepare(sentence, index) can rewrite each sentence before synthesis
+    def __init__(self, synthesize, prepare=None, max_workers=TTS_PIPELINE_WORKERS):
+        self.synthesize = synthesize
+        self.prepare = prepare
+        self.segmenter = SentenceSegmenter()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts")
+        self._futures = []
+        self._next = 0
+        # Number of clips handed out so far
+        self.delivered = 0
+
+    def submit(self, sentence):
+        if self.prepare is not None:
+            sentence = self.prepare(sentence, len(self._futures))
+        self._futures.append(self._pool.submit(self.synthesize, sentence))
+
+    # Add streamed answer text, synthesizing every sentence it completes
+    def feed(self, text):
+        for sentence in self.segmenter.feed(text):
+            self.submit(sentence)
+
+    # Synthesize the trailing partial sentence once the answer is complete
+    def finish(self):
+        for sentence in self.segmenter.flush():
+            self.submit(sentence)
+
+    def _take(self, future):
+        self._next += 1
+        try:
+            clip = future.result()
+        except Exception as e:
+            logger.warning("Speech synthesis failed for one sentence: %s", e)
+            return None
+        if clip is not None:
+            self.delivered += 1
+        return clip
+
+    # Yield clips that are already finished, stopping at the first one that isn't
+    def ready_clips(self):
+        while self._next < len(self._futures) and self._futures[self._next].done():
+            clip = self._take(self._futures[self._next])
+            if clip is not None:
+                yield clip
+
+    # Yield all remaining clips in order, waiting for each one
+    def drain(self):
+        while self._next < len(self._futures):
+            clip = self._take(self._futures[self._next])
+            if clip is not None:
+                yield clip
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,6 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Repo modules, and the benchmark fakes and PDF fixtures
+sys.path[:0] = [ROOT, os.path.join(ROOT, "benchmarks")]
@@ -0,0 +1,37 @@
+from langchain_core.documents import Document
+
+from chunk_dedup import ChunkDeduplicator
+
+PASSAGE = ("The first law of thermodynamics states that the change in internal energy of a closed system "
+           "equals the heat added to it minus the work it does on its surroundings.")
+
+
+def chunk(source, text, page=0):
+    return Document(page_content=text, metadata={"source": source, "page": page})
+
+
+def test_duplicates_within_a_file_are_dropped():
+    deduplicator = ChunkDeduplicator()
+
+    kept = deduplicator.filter_chunks([
+        chunk("a.pdf", PASSAGE),
+        chunk("a.pdf", PASSAGE.upper(), page=4),
+        chunk("a.pdf", PASSAGE.replace("surroundings", "environment"), page=9),
+    ])
+
+    assert [document.metadata["page"] for document in kept] == [0]
+    assert deduplicator.exact_duplicates == 1
+    assert deduplicator.near_duplicates == 1
+
+
+def test_a_passage_shared_by_two_files_is_kept_in_both():
+    deduplicator = ChunkDeduplicator()
+
+    kept = deduplicator.filter_chunks([
+        chunk("a.pdf", PASSAGE),
+        chunk("b.pdf", PASSAGE),
+        chunk("b.pdf", PASSAGE.replace("surroundings", "environment"), page=1),
+    ])
+
+    assert [document.metadata["source"] for document in kept] == ["a.pdf", "b.pdf"]
+    assert deduplicator.report()["chunks_out"] == 2
@@ -0,0 +1,12 @@
+import pytest
+
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeEmbeddings
+
+
+@pytest.mark.parametrize("index_type", ["flat", None])
+def test_build_faiss_rejects_an_empty_corpus(index_type):
+    scheduler = EmbeddingScheduler(FakeEmbeddings(size=8, latency=0.0))
+
+    with pytest.raises(ValueError, match="No documents"):
+        scheduler.build_faiss([], index_type=index_type)
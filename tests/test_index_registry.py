@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+from langchain_core.documents import Document
+
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeEmbeddings
+from index_registry import IndexRegistry, SharedIndex
+
+
+class BuildStopped(BaseException):
+    pass
+
+
+def shared_index():
+    documents = [Document(page_content=f"chunk {i}", metadata={"source": "a.pdf", "page": i}) for i in range(3)]
+    vectorstore = EmbeddingScheduler(FakeEmbeddings(size=8, latency=0.0)).build_faiss(documents)
+    return SharedIndex(vectorstore, {"total_pages": 3})
+
+
+def test_waiters_build_themselves_when_the_first_build_fails():
+    registry = IndexRegistry()
+    building = threading.Event()
+    release = threading.Event()
+
+    def failing_build():
+        building.set()
+        release.wait()
+        raise BuildStopped()
+
+    def first():
+        with pytest.raises(BuildStopped):
+            registry.acquire("key", failing_build)
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    building.wait()
+    leases = []
+    waiter = threading.Thread(target=lambda: leases.append(registry.acquire("key", shared_index)))
+    waiter.start()
+    release.set()
+    thread.join()
+    waiter.join()
+
+    assert len(leases) == 1
+    assert leases[0].vectorstore.index.ntotal == 3
+    assert registry.in_use("key")
@@ -0,0 +1,34 @@
+import os
+
+from fakes import FakeEmbeddings
+from index_cache import IndexCache
+from ingest import find_corpora, ingest_corpus
+from pdf_fixtures import make_fixture
+
+
+def write_blank_pdf(path, pages=3):
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=612, height=792)
+    with open(path, "wb") as f:
+        writer.write(f)
+
+
+def test_a_corpus_without_text_does_not_stop_the_batch(tmp_path):
+    scanned, notes = tmp_path / "a-scanned", tmp_path / "b-notes"
+    scanned.mkdir()
+    notes.mkdir()
+    write_blank_pdf(str(scanned / "scan.pdf"))
+    make_fixture(str(notes), "notes", 4)
+    index_cache = IndexCache(str(tmp_path / "cache"))
+    embeddings = FakeEmbeddings(size=16, latency=0.0)
+
+    reports = [ingest_corpus(name, paths, index_cache, embeddings)
+               for name, paths in find_corpora([str(scanned), str(notes)]).items()]
+
+    assert [os.path.basename(report.name) for report in reports] == ["a-scanned", "b-notes"]
+    assert reports[0].key is None
+    assert "Could not extract any content" in reports[0].errors[reports[0].name]
+    assert reports[1].key is not None and index_cache.contains(reports[1].key)
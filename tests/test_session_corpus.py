@@ -0,0 +1,75 @@
+import io
+
+import pytest
+
+from embedding_scheduler import EmbeddingScheduler
+from fakes import FakeEmbeddings
+from index_cache import content_digest
+from ingest import ingest_settings, split_pages
+from pdf_fixtures import make_fixture
+from pdf_loader import PdfBuffer, load_pdfs
+from session_corpus import SessionCorpus
+
+
+@pytest.fixture(scope="module")
+def pdfs(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("pdfs")
+    contents = []
+    for seed in range(2):
+        with open(make_fixture(str(directory), "corpus", 6, seed=seed), "rb") as f:
+            contents.append(f.read())
+    return contents
+
+
+def build_shared(names, contents, embeddings):
+    pages, errors = load_pdfs([PdfBuffer(name, io.BytesIO(data).getbuffer()) for name, data in zip(names, contents)],
+                              max_workers=1)
+    assert not errors
+    return EmbeddingScheduler(embeddings).build_faiss(split_pages(pages)), pages
+
+
+def test_shared_index_is_matched_to_this_sessions_names_by_content(pdfs):
+    embeddings = FakeEmbeddings(size=16, latency=0.0)
+    vectorstore, _ = build_shared(["first.pdf", "second.pdf"], pdfs, embeddings)
+    digests = {"mine-a.pdf": content_digest(pdfs[0]), "mine-b.pdf": content_digest(pdfs[1])}
+
+    corpus = SessionCorpus.from_shared(vectorstore, {}, digests, ingest_settings())
+
+    assert corpus.pdf_names == ["mine-a.pdf", "mine-b.pdf"]
+    assert all(document.chunk_ids for document in corpus.documents.values())
+    assert corpus.documents["mine-a.pdf"].digest == digests["mine-a.pdf"]
+    assert corpus.total_pages == 12
+
+    removed = set(corpus.documents["mine-a.pdf"].chunk_ids)
+    corpus.remove("mine-a.pdf")
+    remaining = set(corpus.vectorstore.index_to_docstore_id.values())
+    assert corpus.pdf_names == ["mine-b.pdf"]
+    assert not removed & remaining
+    assert remaining == set(corpus.documents["mine-b.pdf"].chunk_ids)
+
+
+class FailingScheduler:
+    def __init__(self, scheduler, batches):
+        self.scheduler = scheduler
+        self.batches = batches
+
+    def embed_batches(self, texts):
+        for count, batch in enumerate(self.scheduler.embed_batches(texts)):
+            if count == self.batches:
+                raise RuntimeError("embedding backend unavailable")
+            yield batch
+
+
+def test_failed_add_leaves_no_vectors_behind(pdfs):
+    embeddings = FakeEmbeddings(size=16, latency=0.0)
+    vectorstore, _ = build_shared(["first.pdf"], pdfs[:1], embeddings)
+    corpus = SessionCorpus.from_shared(vectorstore, {}, {"first.pdf": content_digest(pdfs[0])}, ingest_settings())
+    _, pages = build_shared(["second.pdf"], pdfs[1:], embeddings)
+    chunks = split_pages(pages)
+    scheduler = EmbeddingScheduler(embeddings, batch_size=4)
+
+    with pytest.raises(RuntimeError):
+        corpus.add("second.pdf", content_digest(pdfs[1]), chunks, 6, FailingScheduler(scheduler, batches=2))
+
+    assert corpus.pdf_names == ["first.pdf"]
+    assert set(corpus.vectorstore.index_to_docstore_id.values()) == set(corpus.documents["first.pdf"].chunk_ids)
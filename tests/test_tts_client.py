@@ -0,0 +1,172 @@
+"""
+TTSHttpClient against a local stub HTTP server: retries on 429/5xx, timeouts,
+the circuit breaker's open/half-open/closed cycle and connection reuse.
+"""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from tts_client import CircuitBreaker, CircuitOpenError, TTSHttpClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.requests += 1
+            status, delay = self.server.script.pop(0) if self.server.script else (200, 0.0)
+        time.sleep(delay)
+        body = b"ID3" + b"\x00" * 64 if status == 200 else b"error"
+        self.send_response(status)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = 0
+    server.script = []  # (status, delay) per request; 200 once it runs out
+    server.url = f"http://127.0.0.1:{server.server_port}/v1/text-to-speech"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_client(**kwargs):
+    breaker = CircuitBreaker(
+        failure_threshold=kwargs.pop("failure_threshold", 3), reset_seconds=kwargs.pop("reset_seconds", 30)
+    )
+    kwargs.setdefault("backoff_base", 0.0)
+    return TTSHttpClient(breaker=breaker, **kwargs)
+
+
+def test_reuses_pooled_connection(stub):
+    client = make_client()
+    for _ in range(5):
+        assert client.post(stub.url, json={"text": "hi"}).status_code == 200
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_transient_statuses(stub, status):
+    stub.script = [(status, 0.0), (status, 0.0)]
+    client = make_client(max_retries=2)
+    assert client.post(stub.url, json={}).status_code == 200
+    assert stub.requests == 3
+    assert client.breaker.failures == 0
+
+
+def test_gives_up_after_max_retries(stub):
+    stub.script = [(503, 0.0)] * 3
+    client = make_client(max_retries=2)
+    assert client.post(stub.url, json={}).status_code == 503
+    assert stub.requests == 3
+    assert client.breaker.failures == 1
+
+
+def test_client_errors_are_not_retried(stub):
+    stub.script = [(400, 0.0)]
+    client = make_client(max_retries=2)
+    assert client.post(stub.url, json={}).status_code == 400
+    assert stub.requests == 1
+    assert client.breaker.failures == 0
+
+
+def test_read_timeout_is_retried_then_raised(stub):
+    stub.script = [(200, 0.5), (200, 0.5)]
+    client = make_client(max_retries=1, read_timeout=0.1)
+    with pytest.raises(requests.Timeout):
+        client.post(stub.url, json={})
+    assert stub.requests == 2
+    assert client.breaker.failures == 1
+
+
+def test_breaker_opens_half_opens_and_closes(stub):
+    stub.script = [(503, 0.0)] * 2
+    client = make_client(max_retries=0, failure_threshold=2, reset_seconds=0.2)
+    client.post(stub.url, json={})
+    assert client.breaker.state == "closed"
+    client.post(stub.url, json={})
+    assert client.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        client.post(stub.url, json={})
+    assert stub.requests == 2
+
+    time.sleep(0.25)
+    assert client.breaker.state == "half-open"
+    assert client.post(stub.url, json={}).status_code == 200
+    assert client.breaker.state == "closed"
+    assert client.breaker.failures == 0
+
+
+def test_failed_trial_reopens_breaker(stub):
+    stub.script = [(503, 0.0)] * 3
+    client = make_client(max_retries=0, failure_threshold=2, reset_seconds=0.2)
+    client.post(stub.url, json={})
+    client.post(stub.url, json={})
+    time.sleep(0.25)
+    assert client.post(stub.url, json={}).status_code == 503
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.post(stub.url, json={})
+
+
+def test_half_open_lets_one_trial_through(stub):
+    stub.script = [(503, 0.0), (200, 0.3)]
+    client = make_client(max_retries=0, failure_threshold=1, reset_seconds=0.1)
+    client.post(stub.url, json={})
+    time.sleep(0.15)
+    trial = threading.Thread(target=client.post, args=(stub.url,), kwargs={"json": {}})
+    trial.start()
+    time.sleep(0.1)
+    with pytest.raises(CircuitOpenError):
+        client.post(stub.url, json={})
+    trial.join()
+    assert client.breaker.state == "closed"
+
+
+def test_unexpected_error_in_trial_does_not_leave_breaker_stuck(stub, monkeypatch):
+    stub.script = [(503, 0.0)]
+    client = make_client(max_retries=0, failure_threshold=1, reset_seconds=0.1)
+    client.post(stub.url, json={})
+    time.sleep(0.15)
+
+    def broken_post(*args, **kwargs):
+        raise ValueError("not a requests error")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(client.session, "post", broken_post)
+        with pytest.raises(ValueError):
+            client.post(stub.url, json={})
+    assert client.breaker.state == "open"
+
+    time.sleep(0.15)
+    assert client.post(stub.url, json={}).status_code == 200
+    assert client.breaker.state == "closed"
@@ -0,0 +1,24 @@
+import time
+
+from tts_hedge import TTS_HEDGE_DEFAULT_MS, HedgedSynthesizer
+
+
+def test_failed_primary_calls_are_not_recorded():
+    hedger = HedgedSynthesizer(min_samples=5)
+    for _ in range(10):
+        assert hedger.synthesize(lambda: None, lambda: b"fallback") == b"fallback"
+    assert hedger.histograms["primary"].count == 0
+    assert hedger.deadline_ms() == TTS_HEDGE_DEFAULT_MS
+
+
+def test_successful_primary_calls_set_the_deadline():
+    hedger = HedgedSynthesizer(min_samples=5)
+
+    def primary():
+        time.sleep(0.03)
+        return b"primary"
+
+    for _ in range(5):
+        assert hedger.synthesize(primary, lambda: b"fallback") == b"primary"
+    assert hedger.histograms["primary"].count == 5
+    assert hedger.deadline_ms() < TTS_HEDGE_DEFAULT_MS
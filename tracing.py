@@ -0,0 +1,248 @@
+"""
+Lightweight per-stage tracing and metrics.
+
+Each pipeline stage (PDF parsing, splitting, embedding, FAISS build,
+retrieval, generation, TTS preparation and synthesis, speech recognition) is
+timed as a span that carries sizes such as pages, chunks, tokens or audio
+bytes:
+
+    with span("split", pages=len(pages)) as s:
+        chunks = splitter.split_documents(pages)
+        s.set(chunks=len(chunks))
+
+or, when the duration was measured elsewhere, `record_span(stage, seconds,
+**sizes)`. Finished spans go to the process-wide MetricsRegistry, which keeps
+a latency histogram, error count and size totals per stage, and exports them
+as Prometheus text or JSON (`start_metrics_server` serves both over HTTP when
+SERA_METRICS_PORT is set). After `set_current_recorder(recorder)` spans also go
+to that SpanRecorder, which is how one Streamlit session sees only its own
+spans; `bind_context(fn)` carries the current recorder into worker threads.
+"""
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("SERA_TRACING", "1") == "1"
+METRICS_PORT = int(os.getenv("SERA_METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("SERA_METRICS_HOST", "127.0.0.1")
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Most recent durations kept per stage for percentiles
+RECENT_SAMPLES = 1024
+
+SpanRecord = namedtuple("SpanRecord", ["stage", "seconds", "sizes", "error", "finished_at"])
+
+_current_recorder = contextvars.ContextVar("sera_span_recorder", default=None)
+
+
+class StageMetrics:
+    def __init__(self):
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.total_seconds = 0.0
+        self.errors = 0
+        self.sizes = {}
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, record):
+        self.bucket_counts[int(np.searchsorted(LATENCY_BUCKETS, record.seconds))] += 1
+        self.count += 1
+        self.total_seconds += record.seconds
+        self.recent.append(record.seconds)
+        if record.error:
+            self.errors += 1
+        for name, value in record.sizes.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.sizes[name] = self.sizes.get(name, 0) + value
+
+
+def _summary(seconds):
+    if not seconds:
+        return {"p50": 0.0, "p95": 0.0, "p99": 0.0}
+    p50, p95, p99 = np.percentile(seconds, [50, 95, 99])
+    return {"p50": float(p50), "p95": float(p95), "p99": float(p99)}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, record):
+        with self._lock:
+            self._stages.setdefault(record.stage, StageMetrics()).observe(record)
+
+    def snapshot(self):
+        with self._lock:
+            stages = {}
+            for stage, metrics in sorted(self._stages.items()):
+                stages[stage] = dict(
+                    count=metrics.count,
+                    errors=metrics.errors,
+                    total_seconds=metrics.total_seconds,
+                    buckets=dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                                     np.cumsum(metrics.bucket_counts).tolist())),
+                    sizes=dict(metrics.sizes),
+                    **_summary(list(metrics.recent)),
+                )
+            return stages
+
+    def to_json(self):
+        return json.dumps({"generated_at": time.time(), "stages": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        stages = self.snapshot()
+        lines = [
+            "# HELP sera_stage_duration_seconds Time spent per pipeline stage",
+            "# TYPE sera_stage_duration_seconds histogram",
+        ]
+        for stage, metrics in stages.items():
+            for bound, count in metrics["buckets"].items():
+                lines.append(f'sera_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'sera_stage_duration_seconds_sum{{stage="{stage}"}} {metrics["total_seconds"]:.6f}')
+            lines.append(f'sera_stage_duration_seconds_count{{stage="{stage}"}} {metrics["count"]}')
+        lines += ["# HELP sera_stage_errors_total Spans that ended in an exception",
+                  "# TYPE sera_stage_errors_total counter"]
+        lines += [f'sera_stage_errors_total{{stage="{stage}"}} {metrics["errors"]}' for stage, metrics in stages.items()]
+        lines += ["# HELP sera_stage_size_total Sizes carried by spans (pages, chunks, tokens, bytes, ...)",
+                  "# TYPE sera_stage_size_total counter"]
+        for stage, metrics in stages.items():
+            for name, total in sorted(metrics["sizes"].items()):
+                lines.append(f'sera_stage_size_total{{stage="{stage}",size="{name}"}} {total}')
+        return "\n".join(lines) + "\n"
+
+
+# Recent spans of one session (or any other scope), newest last
+class SpanRecorder:
+    def __init__(self, max_spans=500):
+        self._spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._spans.append(record)
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    # Per-stage count, total and percentiles of the recorded spans
+    def summary(self):
+        by_stage = {}
+        for record in self.spans():
+            by_stage.setdefault(record.stage, []).append(record.seconds)
+        return {
+            stage: dict(count=len(seconds), total_seconds=float(sum(seconds)), **_summary(seconds))
+            for stage, seconds in sorted(by_stage.items())
+        }
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+_metrics_registry = MetricsRegistry()
+
+
+def get_metrics_registry():
+    return _metrics_registry
+
+
+def _finish(stage, seconds, sizes, error=None):
+    record = SpanRecord(stage, seconds, sizes, error, time.time())
+    _metrics_registry.observe(record)
+    recorder = _current_recorder.get()
+    if recorder is not None:
+        recorder.add(record)
+    logger.debug("%s took %.3fs %s", stage, seconds, sizes)
+    return record
+
+
+class Span:
+    def __init__(self, stage, sizes):
+        self.stage = stage
+        self.sizes = sizes
+        self.started = None
+
+    # Add or update sizes while the span is open
+    def set(self, **sizes):
+        self.sizes.update(sizes)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if TRACING_ENABLED:
+            _finish(self.stage, time.perf_counter() - self.started, self.sizes,
+                    exc_type.__name__ if exc_type is not None else None)
+        return False
+
+
+def span(stage, **sizes):
+    return Span(stage, sizes)
+
+
+# Record a span whose duration was measured by the caller; error names a failure
+def record_span(stage, seconds, error=None, **sizes):
+    if TRACING_ENABLED:
+        _finish(stage, seconds, sizes, error)
+
+
+# Make recorder current for the rest of this thread's run (e.g. one Streamlit script run)
+def set_current_recorder(recorder):
+    _current_recorder.set(recorder)
+
+
+# Wrap fn so it runs with the caller's recorder, e.g. on a thread pool
+def bind_context(fn):
+    context = contextvars.copy_context()
+
+    def bound(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return bound
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        registry = get_metrics_registry()
+        if self.path.startswith("/metrics.json"):
+            body, content_type = registry.to_json(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logger.debug("metrics: " + format, *args)
+
+
+# Serve /metrics (Prometheus text) and /metrics.json from a daemon thread; None if port is 0
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Could not start the metrics server on %s:%d: %s", host, port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    logger.info("Serving metrics on http://%s:%d/metrics", host, server.server_port)
+    return server
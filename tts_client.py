@@ -0,0 +1,152 @@
+"""
+Shared HTTP client for the ElevenLabs TTS backend.
+
+One process-wide requests.Session with a connection pool keeps TLS
+connections alive between clips. Every request has connect/read timeouts, is
+retried a bounded number of times with jittered exponential backoff, and goes
+through a circuit breaker: after repeated failures the breaker opens and calls
+fail immediately with CircuitOpenError, so callers can switch to gTTS without
+waiting on a struggling API. After a cool-down one trial request is let
+through to probe for recovery.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TTS_CONNECT_TIMEOUT = float(os.getenv("SERA_TTS_CONNECT_TIMEOUT", "3.05"))
+TTS_READ_TIMEOUT = float(os.getenv("SERA_TTS_READ_TIMEOUT", "20"))
+TTS_MAX_RETRIES = int(os.getenv("SERA_TTS_MAX_RETRIES", "2"))
+TTS_POOL_SIZE = int(os.getenv("SERA_TTS_POOL_SIZE", "10"))
+TTS_BREAKER_FAILURES = int(os.getenv("SERA_TTS_BREAKER_FAILURES", "3"))
+TTS_BREAKER_RESET_SECONDS = float(os.getenv("SERA_TTS_BREAKER_RESET_SECONDS", "30"))
+
+# Statuses worth retrying, and statuses that count against the breaker
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+FAILURE_STATUSES = RETRY_STATUSES | {401, 403}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=TTS_BREAKER_FAILURES, reset_seconds=TTS_BREAKER_RESET_SECONDS):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half-open"
+            return "open"
+
+    # Raise CircuitOpenError unless a request may go through right now
+    def before_request(self):
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._trial_in_flight:
+                raise CircuitOpenError("ElevenLabs circuit is open; using fallback TTS")
+            # Half-open: let a single trial request probe the backend
+            self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("Opening TTS circuit after %d consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+
+class TTSHttpClient:
+    def __init__(self, connect_timeout=TTS_CONNECT_TIMEOUT, read_timeout=TTS_READ_TIMEOUT,
+                 max_retries=TTS_MAX_RETRIES, pool_size=TTS_POOL_SIZE, breaker=None,
+                 backoff_base=0.25, backoff_max=2.0):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.session = requests.Session()
+        # Retries are handled below so they can use jitter and feed the breaker
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff(self, attempt, response=None):
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(self.backoff_max, float(retry_after)))
+        time.sleep(delay)
+
+    def post(self, url, **kwargs):
+        self.breaker.before_request()
+        kwargs.setdefault("timeout", self.timeout)
+        attempt = 0
+        recorded = False
+        try:
+            while True:
+                try:
+                    response = self.session.post(url, **kwargs)
+                except requests.RequestException as e:
+                    transient = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                    if transient and attempt < self.max_retries:
+                        self._backoff(attempt)
+                        attempt += 1
+                        continue
+                    self.breaker.record_failure()
+                    recorded = True
+                    raise
+
+                if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                    response.close()
+                    self._backoff(attempt, response)
+                    attempt += 1
+                    continue
+
+                if response.status_code in FAILURE_STATUSES:
+                    self.breaker.record_failure()
+                else:
+                    self.breaker.record_success()
+                recorded = True
+                return response
+        finally:
+            # Anything else that escapes (a bad URL, an interrupt) still counts as a
+            # failure, so a half-open trial can't stay in flight for good
+            if not recorded:
+                self.breaker.record_failure()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_tts_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TTSHttpClient()
+        return _client
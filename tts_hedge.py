@@ -0,0 +1,152 @@
+"""
+Hedged speech synthesis.
+
+The primary backend (ElevenLabs) is started first. If it hasn't produced a
+clip within the hedge deadline, the fallback (gTTS) is started in parallel
+and whichever returns a usable clip first wins. Worst-case latency becomes
+roughly deadline + fallback latency instead of primary timeout + fallback.
+
+Unless a fixed deadline is configured, it follows a high percentile of the
+primary's observed latency, so hedging only kicks in for the slow tail.
+Python threads can't be killed, so the losing request is cancelled if it
+hasn't started and otherwise left to finish in the background; its result
+is discarded (but still lands in the audio cache) and its latency is still
+recorded so the histograms aren't biased towards winners. Only calls that
+produce a clip are recorded: failures and the instant refusals of an open
+circuit breaker would otherwise drag the percentile down to TTS_HEDGE_MIN_MS
+and hedge nearly every request after an outage.
+"""
+import bisect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+logger = logging.getLogger(__name__)
+
+TTS_HEDGE_ENABLED = os.getenv("SERA_TTS_HEDGE", "1") == "1"
+# 0 means "derive the deadline from the primary's latency histogram"
+TTS_HEDGE_DEADLINE_MS = float(os.getenv("SERA_TTS_HEDGE_DEADLINE_MS", "0"))
+TTS_HEDGE_PERCENTILE = float(os.getenv("SERA_TTS_HEDGE_PERCENTILE", "0.9"))
+TTS_HEDGE_DEFAULT_MS = 1500.0
+TTS_HEDGE_MIN_MS = 200.0
+TTS_HEDGE_MAX_MS = 5000.0
+
+# Bucket upper bounds in milliseconds, roughly log-spaced
+LATENCY_BUCKETS_MS = [25, 50, 100, 200, 300, 500, 750, 1000, 1500, 2000, 3000, 5000, 7500, 10000, 20000, 60000]
+
+
+class LatencyHistogram:
+    def __init__(self, bounds=LATENCY_BUCKETS_MS):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            self.counts[bisect.bisect_left(self.bounds, ms)] += 1
+            self.count += 1
+            self.total_ms += ms
+
+    # Upper bound of the bucket holding the given percentile
+    def percentile(self, fraction):
+        with self._lock:
+            if not self.count:
+                return None
+            target = fraction * self.count
+            running = 0
+            for index, bucket_count in enumerate(self.counts):
+                running += bucket_count
+                if running >= target:
+                    return self.bounds[index] if index < len(self.bounds) else self.bounds[-1] * 2
+        return None
+
+
+class HedgedSynthesizer:
+    def __init__(self, deadline_ms=TTS_HEDGE_DEADLINE_MS, percentile=TTS_HEDGE_PERCENTILE,
+                 min_samples=20, max_workers=8):
+        self.fixed_deadline_ms = deadline_ms
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.histograms = {"primary": LatencyHistogram(), "fallback": LatencyHistogram()}
+        self.hedges = 0
+        self.wins = {"primary": 0, "fallback": 0}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tts-hedge")
+
+    def deadline_ms(self):
+        if self.fixed_deadline_ms:
+            return self.fixed_deadline_ms
+        primary = self.histograms["primary"]
+        if primary.count < self.min_samples:
+            return TTS_HEDGE_DEFAULT_MS
+        return min(TTS_HEDGE_MAX_MS, max(TTS_HEDGE_MIN_MS, primary.percentile(self.percentile)))
+
+    # Run produce(), recording its latency only if it produced a clip
+    def _timed(self, name, produce):
+        started = time.perf_counter()
+        result = produce()
+        if result:
+            self.histograms[name].record(time.perf_counter() - started)
+        return result
+
+    def _win(self, name, result):
+        with self._lock:
+            self.wins[name] += 1
+        return result
+
+    # Run primary(), hedging with fallback() if it is slower than the deadline
+    def synthesize(self, primary, fallback):
+        futures = {self._pool.submit(self._timed, "primary", primary): "primary"}
+        done, _ = wait(futures, timeout=self.deadline_ms() / 1000)
+
+        if not done:
+            with self._lock:
+                self.hedges += 1
+            futures[self._pool.submit(self._timed, "fallback", fallback)] = "fallback"
+
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.warning("%s TTS backend failed: %s", futures[future], e)
+                    result = None
+                if result:
+                    for other in pending:
+                        other.cancel()
+                    return self._win(futures[future], result)
+            if not pending and "fallback" not in futures.values():
+                # The primary failed before the deadline; fall back right away
+                result = self._timed("fallback", fallback)
+                return self._win("fallback", result) if result else None
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "deadline_ms": self.deadline_ms(),
+                "hedges": self.hedges,
+                "primary_wins": self.wins["primary"],
+                "fallback_wins": self.wins["fallback"],
+                "primary_p50_ms": self.histograms["primary"].percentile(0.5),
+                "fallback_p50_ms": self.histograms["fallback"].percentile(0.5),
+            }
+
+
+_hedger = None
+_hedger_lock = threading.Lock()
+
+
+def get_hedged_synthesizer():
+    global _hedger
+    with _hedger_lock:
+        if _hedger is None:
+            _hedger = HedgedSynthesizer()
+        return _hedger
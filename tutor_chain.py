@@ -0,0 +1,151 @@
+"""
+Construction of the tutor's retrieval chain.
+
+The prompt template is parsed once per process. A chain (LLM client,
+retriever, prompt with the student's details filled in, stuff-documents and
+retrieval chains) only needs to be built once per combination of corpus,
+student and model settings; appy.py caches the result across reruns so a
+question only pays for retrieval and generation. With a BM25 index and a
+query embedder the retriever is hybrid (see hybrid_retrieval); an index that
+is still growing is searched under its lock (see progressive_ingest). The
+retrieved chunks are merged and packed into a token budget before they are
+stuffed into the prompt (see context_builder). Retrieval and generation are
+traced as stages (see tracing) through a callback handler attached to the
+chain.
+"""
+import threading
+import time
+from operator import itemgetter
+
+from langchain.chains import create_retrieval_chain
+from langchain.chains.combine_documents import create_stuff_documents_chain
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableLambda
+
+from context_builder import create_context_builder
+from hybrid_retrieval import RETRIEVAL_MODE, HybridRetriever
+from tracing import record_span
+
+TUTOR_MODEL = "gemini-2.0-flash"
+TUTOR_TEMPERATURE = 0.7
+RETRIEVER_K = 5
+
+# Create prompt template with explicit PDF info
+SYSTEM_TEMPLATE = """You are a friendly and helpful tutor who speaks naturally like a real teacher.
+                
+                PDF INFORMATION: {pdf_info}
+                
+                Use the following context from the PDFs to answer the student's question:  
+                {context}
+                
+                You ALWAYS have access to the PDFs that were uploaded. If you don't find the exact answer in the context, 
+                try to provide information based on what you do see in the context. Only if you truly can't find anything 
+                related should you politely say so and offer to discuss related concepts.
+                
+                Your tone should be warm, encouraging, and conversational - like a supportive teacher who wants to see their students succeed.
+                Use examples, analogies, and a touch of humor where appropriate to make complex concepts easier to understand.
+                
+                Keep your responses fairly concise so they can be comfortably spoken back to the user.
+                Use contractions (don't, can't, etc.) and casual phrases like a real teacher would use.
+                Break up long sentences into shorter ones. Vary your sentence structure.
+                
+                Sometimes use interjections like "Hmm," "Well," "You know," "So," etc. to sound more natural.
+                Occasionally refer to the student by name.
+                
+                Remember that you're speaking to {user_name}, so address them personally and be encouraging.
+                """
+
+USER_TEMPLATE = "{input}"
+
+TUTOR_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SYSTEM_TEMPLATE),
+    ("human", USER_TEMPLATE)
+])
+
+
+# Records "retrieval" and "generation" spans for every run of the chain
+class StageTracer(BaseCallbackHandler):
+    def __init__(self):
+        self._runs = {}  # run id -> [started, first token time, tokens, sizes]
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, **sizes):
+        with self._lock:
+            self._runs[run_id] = [time.perf_counter(), None, 0, sizes]
+
+    def _end(self, run_id):
+        with self._lock:
+            return self._runs.pop(run_id, None)
+
+    def _fail(self, stage, run_id, error):
+        run = self._end(run_id)
+        if run is not None:
+            record_span(stage, time.perf_counter() - run[0], error=type(error).__name__, **run[3])
+
+    def on_retriever_start(self, serialized, query, *, run_id, **kwargs):
+        self._start(run_id, query_chars=len(query))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        run = self._end(run_id)
+        if run is not None:
+            record_span("retrieval", time.perf_counter() - run[0], documents=len(documents), **run[3])
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._fail("retrieval", run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, prompt_chars=sum(len(str(m.content)) for batch in messages for m in batch))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None:
+                run[1] = run[1] or time.perf_counter()
+                run[2] += 1
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._end(run_id)
+        if run is None:
+            return
+        finished = time.perf_counter()
+        started, first_token, tokens, sizes = run
+        generations = [generation for batch in response.generations for generation in batch]
+        answer = "".join(generation.text for generation in generations)
+        usage = getattr(getattr(generations[0], "message", None), "usage_metadata", None) if generations else None
+        # Reported output tokens if the model gives them, else streamed chunks, else a word count
+        tokens = (usage or {}).get("output_tokens") or tokens or len(answer.split())
+        record_span("generation_first_token", (first_token or finished) - started)
+        record_span("generation", finished - started, tokens=tokens, answer_chars=len(answer), **sizes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._fail("generation", run_id, error)
+
+
+_stage_tracer = StageTracer()
+
+
+def build_retrieval_chain(vectorstore, user_name, pdf_info, model=TUTOR_MODEL,
+                          temperature=TUTOR_TEMPERATURE, k=RETRIEVER_K, llm=None,
+                          lexical_index=None, query_embedder=None, lock=None, context_builder=None):
+    if llm is None:
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(model=model, temperature=temperature)
+
+    hybrid = RETRIEVAL_MODE == "hybrid" and lexical_index is not None
+    if query_embedder is not None and (hybrid or lock is not None):
+        retriever = HybridRetriever(
+            vectorstore=vectorstore, lexical_index=lexical_index if hybrid else None,
+            query_embedder=query_embedder, k=k, lock=lock
+        )
+    else:
+        retriever = vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": k}
+        )
+    context_builder = context_builder or create_context_builder()
+    if context_builder is not None:
+        retriever = itemgetter("input") | retriever | RunnableLambda(context_builder.build)
+    prompt = TUTOR_PROMPT.partial(user_name=user_name, pdf_info=pdf_info)
+    document_chain = create_stuff_documents_chain(llm, prompt)
+    return create_retrieval_chain(retriever, document_chain).with_config(callbacks=[_stage_tracer])
@@ -0,0 +1,85 @@
+"""
+Background warm-up for a fresh app process.
+
+appy.py imports only light modules at start-up so the welcome screen renders
+quickly. While the student types their name and picks PDFs, a daemon thread
+imports the heavy modules (LangChain, FAISS, pypdf, the Gemini client, ...)
+and runs initializers such as creating the embeddings client and starting the
+PDF worker processes, so the first upload and the first question don't pay
+for them. It is best-effort: failures are logged, and every code path still
+imports what it needs on first use.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv("SERA_WARMUP", "1") == "1"
+
+# Imported in this order; the app's own modules pull in most of their dependencies
+WARMUP_MODULES = (
+    "numpy",
+    "faiss",
+    "langchain_core.documents",
+    "langchain_community.vectorstores",
+    "langchain.text_splitter",
+    "langchain.chains",
+    "pypdf",
+    "ingest",
+    "progressive_ingest",
+    "index_store",
+    "session_corpus",
+    "hybrid_retrieval",
+    "tutor_chain",
+    "embedding_backends",
+    "embedding_cache",
+    "langchain_google_genai",
+    "requests",
+    "tts_client",
+    "speech_recognition",
+)
+
+
+class Warmup:
+    def __init__(self, modules=WARMUP_MODULES, initializers=()):
+        self.modules = modules
+        self.initializers = initializers
+        self.errors = {}
+        self.seconds = None
+        self.thread = threading.Thread(target=self._run, name="warmup", daemon=True)
+
+    def _run(self):
+        started = time.perf_counter()
+        steps = [(name, lambda name=name: importlib.import_module(name)) for name in self.modules]
+        for name, step in steps + list(self.initializers):
+            try:
+                step()
+            except Exception as e:
+                # Optional dependencies (e.g. an unused embedding backend) may be missing
+                self.errors[name] = str(e)
+                logger.debug("Warm-up step %s failed: %s", name, e)
+        self.seconds = time.perf_counter() - started
+        logger.info("Warm-up finished in %.2fs (%d steps failed)", self.seconds, len(self.errors))
+
+
+# Run the warm-up on a daemon thread; initializers are (name, callable) pairs run after the imports.
+# thread_hook(thread) is called before the thread starts, e.g. to attach a Streamlit script context.
+def start_warmup(initializers=(), modules=WARMUP_MODULES, thread_hook=None):
+    warmup = Warmup(modules, initializers)
+    if thread_hook is not None:
+        thread_hook(warmup.thread)
+    warmup.thread.start()
+    return warmup
+
+
+def warm_pdf_workers():
+    from pdf_loader import warm_pool
+    warm_pool()
+
+
+def warm_tts_client():
+    from tts_client import get_tts_client
+    get_tts_client()